@@ -0,0 +1,124 @@
+"""Adaptive sampling: stop sampling a pixel once its color is known precisely enough.
+
+Pixels are sampled in rounds of ``min_samples`` samples. After every round the
+running mean and variance of the luminance of every pixel give a confidence
+interval of its mean, and pixels whose interval is narrower than the tolerance
+stop. The error is measured after gamma correction, where it is visible, so
+dark pixels need a smaller absolute error than bright ones. Flat pixels such as
+the sky converge after the first round, noisy pixels on glass and diffuse
+surfaces keep sampling up to ``max_samples``.
+"""
+
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from raytracer.image import save_image
+
+# Rec. 709 weights of the color channels in the luminance
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722])
+# quantile of the normal distribution of a 95% confidence interval
+Z = 1.96
+# lower bound of the luminance dividing the error, avoids dividing by 0 in black
+MIN_LUMINANCE = 1e-4
+# A pixel stops once all pixels within this distance are below the tolerance.
+# The variance estimated from a few samples is often too small, e.g. if all of
+# them missed a light path, and the neighbours catch most of these pixels.
+BLOCK_RADIUS = 1
+
+# Draws n samples of each pixel (i, j), returns the sum of their colors as a
+# (len(i), 3) array and the sum of their squared luminance as a (len(i),) array.
+DrawSamples = Callable[[np.ndarray, np.ndarray, int], tuple[np.ndarray, np.ndarray]]
+
+
+def error(sums: np.ndarray, luminance_sq: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Half width of the confidence interval of the gamma corrected mean luminance.
+
+    Args:
+        sums: (n, 3) sum of the sampled colors of every pixel.
+        luminance_sq: (n,) sum of the squared luminance of the samples.
+        counts: (n,) number of samples, at least 2.
+    """
+    mean = sums @ LUMINANCE / counts
+    variance = np.maximum(luminance_sq / counts - mean * mean, 0.0)
+    variance *= counts / (counts - 1)
+    linear = Z * np.sqrt(variance / counts)
+    # the derivative of the gamma correction sqrt(x) turns linear into visible error
+    return linear / (2.0 * np.sqrt(np.maximum(mean, MIN_LUMINANCE)))
+
+
+def block_max(errors: np.ndarray, radius: int = BLOCK_RADIUS) -> np.ndarray:
+    """Maximum of every (2 radius + 1)^2 block around a pixel of a 2d array."""
+    rows, cols = errors.shape
+    padded = np.pad(errors, radius)
+    return np.max(
+        [
+            padded[r : r + rows, c : c + cols]
+            for r in range(2 * radius + 1)
+            for c in range(2 * radius + 1)
+        ],
+        axis=0,
+    )
+
+
+def render_tile(
+    sample: DrawSamples,
+    rows: range,
+    cols: range,
+    min_samples: int,
+    max_samples: int,
+    tolerance: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sample the pixels rows x cols until their blocks converge.
+
+    Args:
+        sample: draws the samples of a set of pixels.
+        rows: rows of the pixels.
+        cols: columns of the pixels.
+        min_samples: samples of every pixel and of every round, at least 2.
+        max_samples: samples after which a pixel stops even if it has not converged.
+        tolerance: maximum error of the mean in the gamma corrected color, e.g.,
+            1 / 256 for one step of an 8 bit image.
+
+    Returns:
+        The (rows, cols, 3) mean colors and the (rows, cols) number of samples.
+    """
+    if min_samples < 2:
+        raise ValueError(f"The variance needs {min_samples=} >= 2.")
+
+    shape = (len(rows), len(cols))
+    j, i = np.meshgrid(rows, cols, indexing="ij")
+    i, j = i.ravel(), j.ravel()
+    sums = np.zeros((len(i), 3))
+    luminance_sq = np.zeros(len(i))
+    counts = np.zeros(len(i), dtype=np.int64)
+
+    # all active pixels got the same rounds, hence have the same number of samples
+    active = np.arange(len(i))
+    n, done = min(min_samples, max_samples), 0
+    while len(active):
+        s, sq = sample(i[active], j[active], n)
+        sums[active] += s
+        luminance_sq[active] += sq
+        counts[active] += n
+        done += n
+        if done >= max_samples:
+            break
+
+        errors = np.zeros(shape)
+        errors.flat[active] = error(sums[active], luminance_sq[active], counts[active])
+        active = active[block_max(errors).flat[active] > tolerance]
+        n = min(min_samples, max_samples - done)
+
+    return (sums / counts[:, None]).reshape(*shape, 3), counts.reshape(shape)
+
+
+def save_spp_map(path: Path, spp_map: np.ndarray) -> None:
+    """Save the samples per pixel as raw counts to .npy or else as a gray image."""
+    path = Path(path)
+    if path.suffix == ".npy":
+        np.save(path, spp_map)
+        return
+    gray = spp_map / max(int(spp_map.max()), 1)
+    save_image(path, np.repeat(gray[..., None], 3, axis=2))
@@ -0,0 +1,87 @@
+"""Benchmark suite to track the performance of the ray tracer over time.
+
+It combines micro-benchmarks of the hot operations with end-to-end renders of
+the scenes in ``raytracer.scenes`` and reports everything as one JSON document,
+which makes runs of different commits easy to diff. Run it with
+``raytracer bench``.
+"""
+
+import os
+import platform
+import sys
+from typing import Optional
+
+import numpy as np
+
+from raytracer.benchmarks import micro, render
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size in bytes of this process and its finished children.
+
+    Returns:
+        The larger of both, None where the resource module is not available.
+    """
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # macOS reports bytes, Linux and the BSDs kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run(
+    micro_number: int = 10_000,
+    scene_names: Optional[list[str]] = None,
+    modes: Optional[list[str]] = None,
+    image_width: int = 64,
+    samples_per_pixel: int = 8,
+    seed: int = 0,
+    workers: Optional[list[int]] = None,
+    backends: Optional[list[str]] = None,
+) -> dict:
+    """Run all benchmarks.
+
+    Args:
+        micro_number: calls per micro-benchmark, 0 skips them.
+        scene_names: scenes to render, all of scenes.SCENES if None.
+        modes: render modes of render.MODES, all if None.
+        image_width: width of the rendered images.
+        samples_per_pixel: camera rays per pixel of the rendered images.
+        seed: seed of the renders and of the micro-benchmarks.
+        workers: numbers of workers rendering tiles, [1] if None.
+        backends: kinds of workers of parallel.BACKENDS, ["process"] if None.
+
+    Returns:
+        A JSON serializable report.
+    """
+    report: dict = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "micro_us_per_call": micro.run(micro_number, seed) if micro_number else {},
+        "render": [
+            result.to_dict()
+            for result in render.run(
+                scene_names,
+                modes,
+                image_width=image_width,
+                samples_per_pixel=samples_per_pixel,
+                seed=seed,
+                workers=workers,
+                backends=backends,
+            )
+        ],
+    }
+    report["peak_rss_bytes"] = peak_rss()
+    return report
@@ -0,0 +1,74 @@
+"""Micro-benchmarks of the operations on the per-ray hot path."""
+
+import io
+import math
+import random
+import timeit
+from typing import Any, Callable
+
+import numpy as np
+
+from raytracer import scenes
+from raytracer.bvh import BVH
+from raytracer.color import write_color
+from raytracer.definitions import vec3
+from raytracer.definitions.material import Dialetric, Lambertian, Metal
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.hitable import Sphere
+from raytracer.sampling import RandomSampler
+
+
+def _cases() -> dict[str, Callable[[], Any]]:
+    """The timed operations, each set up to hit its typical branch."""
+    ray = Ray(Point(Vec3(0.0, 0.0, 0.0)), Vec3(0.1, -0.05, -1.0))
+    sphere = Sphere(Point(Vector([0, 0, -1])), 0.5)
+    world = scenes.four_spheres()
+    frozen = world.freeze()
+    bvh = BVH.from_world(scenes.random_spheres())
+    normal, point = Vec3(0.0, 0.0, 1.0), Point(Vec3(0.0, 0.0, -0.5))
+    lambertian = Lambertian(Color(Vector([0.5, 0.5, 0.5])))
+    metal = Metal(Color(Vector([0.8, 0.6, 0.2])), fuzz=0.3)
+    dialetric = Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5)
+    color = Color(Vector([0.2, 0.4, 0.6]))
+    out = io.StringIO()
+    sampler = RandomSampler(np.random.default_rng(0))
+
+    return {
+        "Sphere.hit": lambda: sphere.hit(ray, 0.0001, math.inf),
+        "Sphere.intersect": lambda: sphere.intersect(ray, 0.0001, math.inf),
+        "World.hit[four_spheres]": lambda: world.hit(ray, 0.0001, math.inf),
+        "World.intersect[four_spheres]": lambda: world.intersect(ray, 0.0001, math.inf),
+        "FrozenWorld.hit[four_spheres]": lambda: frozen.hit(ray, 0.0001, math.inf),
+        "BVH.hit[random_spheres]": lambda: bvh.hit(ray, 0.0001, math.inf),
+        "Lambertian.scatter": lambda: lambertian.scatter(ray, normal, point, True),
+        "Metal.scatter": lambda: metal.scatter(ray, normal, point, True),
+        "Dialetric.scatter": lambda: dialetric.scatter(ray, normal, point, True),
+        "write_color": lambda: (out.seek(0), write_color(out, color)),
+        "Vec3.random_unit_vector": Vec3.random_unit_vector,
+        "RandomSampler.unit_vector": sampler.unit_vector,
+        "RandomSampler.square": sampler.square,
+    }
+
+
+def run(number: int = 10_000, seed: int = 0) -> dict[str, float]:
+    """Time every micro-benchmark.
+
+    Args:
+        number: number of calls per operation.
+        seed: seed of the random numbers drawn by the scatter functions.
+
+    Returns:
+        Microseconds per call for every operation, the Vector arithmetic of
+        vec3.benchmark is reported as "<type>.<operation>".
+    """
+    random.seed(seed)
+    timings = {
+        name: timeit.timeit(case, number=number) / number * 1e6
+        for name, case in _cases().items()
+    }
+    for operation, by_type in vec3.benchmark(number).items():
+        for kind, us in by_type.items():
+            timings[f"{kind}.{operation}"] = us
+    return timings
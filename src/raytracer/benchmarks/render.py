@@ -0,0 +1,118 @@
+"""End-to-end render benchmarks of the canonical scenes at fixed seeds."""
+
+import time
+from dataclasses import asdict, dataclass
+
+from raytracer import scenes
+from raytracer.raytracer import RayTracer
+
+# modes of RayTracer compared on every scene
+MODES = {
+    "scalar": {},
+    "bvh": {"bvh": True},
+    "wavefront": {"wavefront": True},
+}
+
+
+@dataclass
+class RenderResult:
+    """Throughput of rendering a scene.
+
+    Attributes:
+        scene: name of the scene in scenes.SCENES.
+        mode: name of the mode in MODES.
+        width: image width in pixels.
+        height: image height in pixels.
+        samples_per_pixel: camera rays per pixel.
+        seed: seed of the render.
+        workers: number of workers rendering tiles.
+        backend: kind of the workers in parallel.BACKENDS.
+        seconds: wall time of the render, excluding writing the image.
+        samples: number of camera rays.
+        rays: number of traced rays, the camera ray and one ray per bounce of
+            every path.
+        samples_per_second: samples / seconds.
+        rays_per_second: rays / seconds.
+    """
+
+    scene: str
+    mode: str
+    width: int
+    height: int
+    samples_per_pixel: int
+    seed: int
+    workers: int
+    backend: str
+    seconds: float
+    samples: int
+    rays: int
+    samples_per_second: float
+    rays_per_second: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def run_one(
+    scene: str,
+    mode: str,
+    image_width: int = 64,
+    samples_per_pixel: int = 8,
+    seed: int = 0,
+    workers: int = 1,
+    backend: str = "process",
+) -> RenderResult:
+    """Render a scene in the given mode and measure its throughput."""
+    world = scenes.SCENES[scene]()
+    tracer = RayTracer(
+        16 / 9,
+        image_width,
+        samples_per_pixel=samples_per_pixel,
+        seed=seed,
+        workers=workers,
+        backend=backend,
+        **MODES[mode],
+    )
+
+    start = time.perf_counter()
+    tracer.render_framebuffer(world)
+    seconds = time.perf_counter() - start
+
+    samples = int(tracer.path_lengths.sum())
+    bounces = int(tracer.path_lengths @ range(len(tracer.path_lengths)))
+    return RenderResult(
+        scene=scene,
+        mode=mode,
+        width=tracer.image_width,
+        height=tracer.image_height,
+        samples_per_pixel=samples_per_pixel,
+        seed=seed,
+        workers=tracer.workers,
+        backend=backend,
+        seconds=seconds,
+        samples=samples,
+        rays=samples + bounces,
+        samples_per_second=samples / seconds,
+        rays_per_second=(samples + bounces) / seconds,
+    )
+
+
+def run(
+    scene_names: list[str] | None = None,
+    modes: list[str] | None = None,
+    workers: list[int] | None = None,
+    backends: list[str] | None = None,
+    **kwargs,
+) -> list[RenderResult]:
+    """Render every combination of scenes, modes, workers and backends.
+
+    Renders of a scene and mode on increasing numbers of workers give the
+    scaling curve of every backend. See run_one for kwargs.
+    """
+    return [
+        run_one(scene, mode, workers=n, backend=backend, **kwargs)
+        for scene in scene_names or list(scenes.SCENES)
+        for mode in modes or list(MODES)
+        for backend in backends or ["process"]
+        for n in workers or [1]
+    ]
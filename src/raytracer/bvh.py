@@ -0,0 +1,475 @@
+"""Bounding volume hierarchy over the axis-aligned bounds of hittables.
+
+The tree is built top-down with a binned surface area heuristic (SAH) and stored
+flattened in depth-first order: the first child of an interior node directly
+follows its parent, the index of the second child is stored with the node.
+
+Primitives which are much larger than the rest of the scene, e.g., the ground
+sphere of ``raytracer.main``, would inflate the bounds of every node on their path
+to the root. They are kept out of the tree and tested before traversing it, which
+also gives the traversal a tight ``t_max`` to start with.
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from raytracer.definitions.aabb import AABB, surface_area
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.world import World, lights_of
+from raytracer.hitable import Hit, Hittable, Record
+from raytracer.stats import COLLECTOR
+
+_logger = logging.getLogger(__name__)
+
+MAX_LEAF_SIZE = 4
+SAH_BINS = 16
+# relative cost of traversing a node compared to intersecting a primitive
+TRAVERSAL_COST = 0.5
+# primitives with a surface area larger than this factor times the median are
+# not put into the tree
+LARGE_PRIMITIVE_FACTOR = 100.0
+# bits per axis of the Morton codes of build_linear
+MORTON_BITS = 10
+
+
+@dataclass
+class BVHNodes:
+    """Flattened nodes of a bounding volume hierarchy.
+
+    Attributes:
+        lower: (n, 3) minimum corner of every node.
+        upper: (n, 3) maximum corner of every node.
+        second_child: (n,) index of the second child of interior nodes, -1 for leaves.
+        axis: (n,) axis along which an interior node was split.
+        start: (n,) offset of a leaf's primitives in order.
+        count: (n,) number of primitives of a leaf, 0 for interior nodes.
+        order: primitive indices referenced by the leaves.
+    """
+
+    lower: np.ndarray
+    upper: np.ndarray
+    second_child: np.ndarray
+    axis: np.ndarray
+    start: np.ndarray
+    count: np.ndarray
+    order: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.count)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            a.nbytes
+            for a in (
+                self.lower,
+                self.upper,
+                self.second_child,
+                self.axis,
+                self.start,
+                self.count,
+                self.order,
+            )
+        )
+
+    def depth(self) -> int:
+        depth, stack = 0, [(0, 1)]
+        while stack:
+            node, d = stack.pop()
+            depth = max(depth, d)
+            if self.count[node] == 0:
+                stack.append((node + 1, d + 1))
+                stack.append((int(self.second_child[node]), d + 1))
+        return depth
+
+
+def build(
+    lower: np.ndarray,
+    upper: np.ndarray,
+    max_leaf_size: int = MAX_LEAF_SIZE,
+    bins: int = SAH_BINS,
+) -> BVHNodes:
+    """Build a BVH over primitives with the given (m, 3) bounds."""
+    lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+    upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+    centroids = 0.5 * (lower + upper)
+
+    node_lower: list[np.ndarray] = []
+    node_upper: list[np.ndarray] = []
+    second_child: list[int] = []
+    axes: list[int] = []
+    starts: list[int] = []
+    counts: list[int] = []
+    order: list[np.ndarray] = []
+    n_ordered = 0
+
+    def add_leaf(node: int, primitives: np.ndarray):
+        nonlocal n_ordered
+        starts[node], counts[node] = n_ordered, len(primitives)
+        order.append(primitives)
+        n_ordered += len(primitives)
+
+    def build_node(primitives: np.ndarray):
+        node = len(counts)
+        node_lower.append(lower[primitives].min(axis=0))
+        node_upper.append(upper[primitives].max(axis=0))
+        second_child.append(-1)
+        axes.append(0)
+        starts.append(0)
+        counts.append(0)
+
+        if len(primitives) <= max_leaf_size:
+            add_leaf(node, primitives)
+            return node
+
+        split = _sah_split(
+            lower[primitives],
+            upper[primitives],
+            centroids[primitives],
+            surface_area(node_lower[node], node_upper[node]),
+            bins,
+        )
+        if split is None:
+            if len(primitives) <= 2 * max_leaf_size:
+                add_leaf(node, primitives)
+                return node
+            # degenerate centroid bounds: split at the median along the widest axis
+            axis = int(np.argmax(np.ptp(centroids[primitives], axis=0)))
+            ranked = np.argsort(centroids[primitives, axis], kind="stable")
+            is_left = np.zeros(len(primitives), dtype=bool)
+            is_left[ranked[: len(primitives) // 2]] = True
+        else:
+            axis, is_left = split
+
+        axes[node] = axis
+        build_node(primitives[is_left])
+        second_child[node] = build_node(primitives[~is_left])
+        return node
+
+    if len(lower):
+        build_node(np.arange(len(lower)))
+
+    return BVHNodes(
+        lower=np.array(node_lower, dtype=float).reshape(-1, 3),
+        upper=np.array(node_upper, dtype=float).reshape(-1, 3),
+        second_child=np.array(second_child, dtype=np.int32),
+        axis=np.array(axes, dtype=np.int8),
+        start=np.array(starts, dtype=np.int32),
+        count=np.array(counts, dtype=np.int32),
+        order=(np.concatenate(order) if order else np.empty(0, dtype=np.intp)),
+    )
+
+
+def _sah_split(
+    lower: np.ndarray,
+    upper: np.ndarray,
+    centroids: np.ndarray,
+    parent_area: float,
+    bins: int,
+) -> Optional[tuple[int, np.ndarray]]:
+    """Find the cheapest binned SAH split.
+
+    Returns:
+        The split axis and a mask of the primitives going to the first child, or
+        None if no split is cheaper than a leaf.
+    """
+    n = len(lower)
+    c_min, c_max = centroids.min(axis=0), centroids.max(axis=0)
+    best_cost, best = float(n), None
+
+    for axis in range(3):
+        extent = c_max[axis] - c_min[axis]
+        if extent <= 0:
+            continue
+        bin_ids = np.minimum(
+            ((centroids[:, axis] - c_min[axis]) * (bins / extent)).astype(np.intp),
+            bins - 1,
+        )
+        counts = np.bincount(bin_ids, minlength=bins)
+        bin_lower = np.full((bins, 3), np.inf)
+        bin_upper = np.full((bins, 3), -np.inf)
+        np.minimum.at(bin_lower, bin_ids, lower)
+        np.maximum.at(bin_upper, bin_ids, upper)
+
+        # bounds and counts of everything left (right) of each of the bins - 1 planes
+        left_lower = np.minimum.accumulate(bin_lower)[:-1]
+        left_upper = np.maximum.accumulate(bin_upper)[:-1]
+        right_lower = np.minimum.accumulate(bin_lower[::-1])[::-1][1:]
+        right_upper = np.maximum.accumulate(bin_upper[::-1])[::-1][1:]
+        left_count = np.cumsum(counts)[:-1]
+        right_count = n - left_count
+
+        with np.errstate(invalid="ignore"):
+            cost = TRAVERSAL_COST + (
+                left_count * surface_area(left_lower, left_upper)
+                + right_count * surface_area(right_lower, right_upper)
+            ) / max(parent_area, np.finfo(float).tiny)
+        cost[(left_count == 0) | (right_count == 0)] = np.inf
+
+        plane = int(np.argmin(cost))
+        if cost[plane] < best_cost:
+            best_cost, best = float(cost[plane]), (axis, bin_ids <= plane)
+
+    return best
+
+
+def morton_codes(points: np.ndarray) -> np.ndarray:
+    """Morton codes of (n, 3) points quantized to MORTON_BITS per axis.
+
+    The points are quantized in a cube around their bounds, so the cells of the
+    grid are cubes as well. Sorting by the codes orders the points along a Z-order
+    curve, so points which are close in the order are close in space.
+    """
+    low = points.min(axis=0)
+    extent = float((points.max(axis=0) - low).max())
+    scale = ((1 << MORTON_BITS) - 1) / extent if extent > 0 else 0.0
+    quantized = ((points - low) * scale).astype(np.uint64)
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(MORTON_BITS):
+        for axis in range(3):
+            codes |= ((quantized[:, axis] >> np.uint64(bit)) & np.uint64(1)) << (
+                np.uint64(3 * bit + 2 - axis)
+            )
+    return codes
+
+
+def build_linear(
+    lower: np.ndarray, upper: np.ndarray, max_leaf_size: int = MAX_LEAF_SIZE
+) -> BVHNodes:
+    """Build a BVH over primitives with the given (m, 3) bounds in Morton order.
+
+    The primitives are sorted along a Z-order curve and cut into leaves of
+    max_leaf_size consecutive primitives. A node is split where the highest bit in
+    which the Morton codes of its leaves differ changes, i.e., at a plane
+    halving its cell of the Morton grid. Every level of the tree is built with a
+    few array operations, which makes this much faster than ``build`` for
+    millions of primitives, e.g., the triangles of a mesh, at the cost of trees
+    which are traversed somewhat slower.
+    """
+    lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+    upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+    if not len(lower):
+        return build(lower, upper, max_leaf_size)
+
+    codes = morton_codes(0.5 * (lower + upper))
+    order = np.argsort(codes, kind="stable")
+    leaf_start = np.arange(0, len(order), max_leaf_size)
+    leaf_count = np.minimum(max_leaf_size, len(order) - leaf_start)
+    leaf_codes = codes[order[leaf_start]]
+    leaf_lower = np.minimum.reduceat(lower[order], leaf_start)
+    leaf_upper = np.maximum.reduceat(upper[order], leaf_start)
+    n_leaves = len(leaf_start)
+
+    n_nodes = 2 * n_leaves - 1
+    second_child = np.full(n_nodes, -1, dtype=np.int32)
+    axes = np.zeros(n_nodes, dtype=np.int8)
+    start = np.zeros(n_nodes, dtype=np.int32)
+    count = np.zeros(n_nodes, dtype=np.int32)
+    node_lower = np.empty((n_nodes, 3))
+    node_upper = np.empty((n_nodes, 3))
+
+    # every level is a set of nodes covering the leaves [first, last)
+    interior_levels = []
+    node = first = np.zeros(1, dtype=np.intp)
+    last = np.array([n_leaves], dtype=np.intp)
+    while len(node):
+        is_leaf = last - first == 1
+        leaves, leaf = node[is_leaf], first[is_leaf]
+        start[leaves], count[leaves] = leaf_start[leaf], leaf_count[leaf]
+        node_lower[leaves] = leaf_lower[leaf]
+        node_upper[leaves] = leaf_upper[leaf]
+
+        node, first, last = node[~is_leaf], first[~is_leaf], last[~is_leaf]
+        interior_levels.append(node)
+
+        # split before the first leaf with the highest differing bit set, the codes
+        # are below 2**53 and exact as floats
+        low, high = leaf_codes[first], leaf_codes[last - 1]
+        bit = np.frexp((low ^ high).astype(float))[1].astype(np.uint64) - 1
+        split = np.searchsorted(leaf_codes, ((low >> bit) | 1) << bit)
+        # leaves with equal codes are split in halves
+        same = low == high
+        split[same] = (first[same] + last[same]) // 2
+        axes[node] = np.where(same, 0, 2 - bit.astype(np.intp) % 3)
+
+        # the first child follows its parent, the second follows the 2k - 1
+        # nodes of the first child's subtree over k leaves
+        second_child[node] = node + 2 * (split - first)
+        node = np.concatenate([node + 1, second_child[node]])
+        first, last = np.concatenate([first, split]), np.concatenate([split, last])
+
+    for node in reversed(interior_levels):
+        second = second_child[node]
+        node_lower[node] = np.minimum(node_lower[node + 1], node_lower[second])
+        node_upper[node] = np.maximum(node_upper[node + 1], node_upper[second])
+
+    return BVHNodes(
+        lower=node_lower,
+        upper=node_upper,
+        second_child=second_child,
+        axis=axes,
+        start=start,
+        count=count,
+        order=order,
+    )
+
+
+class BVH(Hittable):
+    """Drop-in replacement for World which finds hits through a BVH.
+
+    Attributes:
+        hittables: the hittables of the scene.
+        lights: the hittables with an emissive material, see World.lights.
+        large: hittables kept out of the tree, see LARGE_PRIMITIVE_FACTOR.
+        nodes: the flattened tree over all other hittables.
+        build_time: seconds it took to build the tree.
+    """
+
+    def __init__(
+        self, hittables: Sequence[Hittable], max_leaf_size: int = MAX_LEAF_SIZE
+    ):
+        start = time.perf_counter()
+        self.hittables = list(hittables)
+        self.lights = [light for h in self.hittables for light in lights_of(h)]
+
+        boxes = [h.bounding_box() for h in self.hittables]
+        lower = np.array([b.minimum for b in boxes], dtype=float).reshape(-1, 3)
+        upper = np.array([b.maximum for b in boxes], dtype=float).reshape(-1, 3)
+        areas = surface_area(lower, upper)
+        is_large = (
+            areas > LARGE_PRIMITIVE_FACTOR * np.median(areas)
+            if len(areas)
+            else np.zeros(0, dtype=bool)
+        )
+
+        self.large = [h for h, large in zip(self.hittables, is_large) if large]
+        self._primitives = [
+            h for h, large in zip(self.hittables, is_large) if not large
+        ]
+        self.nodes = build(lower[~is_large], upper[~is_large], max_leaf_size)
+        self._bounds = AABB(lower.min(axis=0), upper.max(axis=0)) if boxes else None
+
+        # traversal runs on plain python floats which are much faster than numpy
+        # scalars for a handful of operations
+        self._lower = [tuple(b) for b in self.nodes.lower.tolist()]
+        self._upper = [tuple(b) for b in self.nodes.upper.tolist()]
+        self._second = self.nodes.second_child.tolist()
+        self._axis = self.nodes.axis.tolist()
+        self._leaves = [
+            [self._primitives[i] for i in self.nodes.order[s : s + c]] if c else None
+            for s, c in zip(self.nodes.start.tolist(), self.nodes.count.tolist())
+        ]
+
+        self.build_time = time.perf_counter() - start
+        _logger.info(
+            f"BVH over {len(self._primitives)} hittables "
+            f"(+{len(self.large)} large) with {len(self.nodes)} nodes, "
+            f"depth {self.nodes.depth() if len(self.nodes) else 0}, "
+            f"{self.nodes.nbytes} bytes, built in {self.build_time:.3f}s"
+        )
+
+    @classmethod
+    def from_world(cls, world: World, **kwargs) -> "BVH":
+        return cls(world.hittables, **kwargs)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the flattened tree."""
+        return self.nodes.nbytes
+
+    def bounding_box(self) -> AABB:
+        if self._bounds is None:
+            raise ValueError("An empty BVH has no bounding box.")
+        return self._bounds
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Distance of the closest hit and the hittable hit, see World.intersect."""
+        closest = None
+        for hittable in self.large:
+            if h := hittable.intersect(ray, t_min, t_max):
+                t_max, part = h
+                closest = hittable, part
+        closest, t_max = self._traverse(ray, t_min, t_max, closest)
+        return None if closest is None else (t_max, closest)
+
+    def surface_info(self, ray: Ray, t: float, part: tuple[Hittable, Any]) -> Record:
+        hittable, hittable_part = part
+        return hittable.surface_info(ray, t, hittable_part)
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        """True if anything is hit between t_min and t_max, stops at the first hit."""
+        if any(h.occluded(ray, t_min, t_max) for h in self.large):
+            return True
+        return self._traverse(ray, t_min, t_max, None, any_hit=True)[0] is not None
+
+    def _traverse(
+        self,
+        ray: Ray,
+        t_min: float,
+        t_max: float,
+        closest: Optional[tuple[Hittable, Any]],
+        any_hit: bool = False,
+    ) -> tuple[Optional[tuple[Hittable, Any]], float]:
+        """Find the closest hit in the tree closer than t_max, else return closest.
+
+        With any_hit the traversal stops at the first hit instead.
+
+        Returns:
+            The hittable hit and its part, see Hittable.intersect, and the
+            distance of the hit, t_max if closest is returned.
+        """
+        if not self._leaves:
+            return closest, t_max
+
+        origin = ray.orig.tolist()
+        direction = ray.direction.tolist()
+        inv = [1.0 / d if d else math.copysign(1e300, d) for d in direction]
+        ox, oy, oz = origin
+        ix, iy, iz = inv
+
+        stack = [0]
+        visited = 0
+        while stack:
+            node = stack.pop()
+            visited += 1
+
+            # slab test against the node's bounds, clipped by the closest hit so far
+            (lx, ly, lz), (ux, uy, uz) = self._lower[node], self._upper[node]
+            t0, t1 = (lx - ox) * ix, (ux - ox) * ix
+            near, far = (t0, t1) if t0 < t1 else (t1, t0)
+            t0, t1 = (ly - oy) * iy, (uy - oy) * iy
+            if t0 > t1:
+                t0, t1 = t1, t0
+            near, far = max(near, t0), min(far, t1)
+            t0, t1 = (lz - oz) * iz, (uz - oz) * iz
+            if t0 > t1:
+                t0, t1 = t1, t0
+            near, far = max(near, t0, t_min), min(far, t1, t_max)
+            if near > far:
+                continue
+
+            leaf = self._leaves[node]
+            if leaf is not None:
+                for hittable in leaf:
+                    if h := hittable.intersect(ray, t_min, t_max):
+                        t_max, part = h
+                        closest = hittable, part
+                        if any_hit:
+                            stack.clear()
+                            break
+            elif direction[self._axis[node]] < 0:
+                # visit the second child first, it is closer along the split axis
+                stack.append(node + 1)
+                stack.append(self._second[node])
+            else:
+                stack.append(self._second[node])
+                stack.append(node + 1)
+
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["bvh.nodes"] += visited
+        return closest, t_max
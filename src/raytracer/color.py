@@ -43,3 +43,18 @@ def write_color(out: io.StringIO, pixel_color: Color) -> None:
 
 def clamp(x: float, x_min: float, x_max: float) -> float:
     return max(min(x, x_max), x_min)
+
+
+def to_bytes(framebuffer: np.ndarray) -> np.ndarray:
+    """Gamma correct, clamp and quantize linear colors in one vectorized pass.
+
+    Computes the same bytes as write_color for every pixel.
+
+    Args:
+        framebuffer: array of linear colors with 3 entries in the last axis.
+
+    Returns:
+        uint8 array of the same shape.
+    """
+    gamma = np.sqrt(np.maximum(framebuffer, 0.0))
+    return (MAX_BYTE * np.clip(gamma, X_MIN, X_MAX)).astype(np.uint8)
@@ -0,0 +1,26 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AABB:
+    """Axis-aligned bounding box spanned by its minimum and maximum corner."""
+
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+    def surface_area(self) -> float:
+        return surface_area(self.minimum, self.maximum)
+
+    def union(self, other: "AABB") -> "AABB":
+        return AABB(
+            np.minimum(self.minimum, other.minimum),
+            np.maximum(self.maximum, other.maximum),
+        )
+
+
+def surface_area(minimum: np.ndarray, maximum: np.ndarray) -> np.ndarray:
+    """Surface area of one or many boxes given as (..., 3) corner arrays."""
+    dx, dy, dz = np.moveaxis(np.maximum(maximum - minimum, 0.0), -1, 0)
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
@@ -0,0 +1,13 @@
+"""Row-wise vector math on (N, 3) arrays, shared by the batched code paths."""
+
+import numpy as np
+
+
+def dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise dot product of two (N, 3) arrays."""
+    return np.einsum("ij,ij->i", a, b)
+
+
+def normalize(v: np.ndarray) -> np.ndarray:
+    """Every row of the (N, 3) array v scaled to unit length."""
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
@@ -1,15 +1,74 @@
 import abc
+import math
+import random
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import ClassVar, Sequence
 
 import numpy as np
+from raytracer.definitions.arrays import dot, normalize
 from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
 from raytracer.definitions.vector import Color, Point, Vector, unit_vector
+from raytracer.sampling import (
+    Sampler,
+    cosine_direction,
+    cosine_directions,
+    unit_vectors,
+)
+
+
+class MaterialKind(IntEnum):
+    """Identifies the scatter model of a material in a MaterialTable."""
+
+    ABSORB = 0
+    LAMBERTIAN = 1
+    METAL = 2
+    DIALETRIC = 3
+    EMISSIVE = 4
+
+
+@dataclass
+class Scatter:
+    """A scattered ray sampled by a material.
+
+    Attributes:
+        ray: the scattered ray.
+        brdf: value of the BRDF for the scattered direction. Specular materials
+            sample from a delta distribution and give its weight instead, i.e.,
+            the attentuition.
+        pdf: probability density of the direction per solid angle, None for
+            specular materials.
+        cos_theta: cosine between the scattered direction and the normal.
+    """
+
+    ray: Ray
+    brdf: Color
+    pdf: float | None = None
+    cos_theta: float = 1.0
+
+    @property
+    def weight(self) -> Color:
+        """Factor of the throughput of the scattered path, brdf cos(theta) / pdf."""
+        if self.pdf is None:
+            return self.brdf
+        return self.brdf * (self.cos_theta / self.pdf)
 
 
 class Material(abc.ABC):
+    kind: MaterialKind
+    # radiance emitted from the front faces, None for materials which do not emit
+    emission: Color | None = None
+
     @abc.abstractmethod
     def scatter(
-        self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
-    ) -> Vector | None:
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
         """Scatter ray on the object with given normal and intersection point.
 
         Args:
@@ -17,7 +76,63 @@ class Material(abc.ABC):
             normal: normal of the scattering object.
             intersection: intersection between the ray and the object.
             front_facing: True if the ray is facing the front of the object, i.e., inwards facing.
+            sampler: source of random numbers, python's random module if None.
+
+        Returns:
+            The scattered ray, None if the ray is absorbed.
+        """
+
+    @classmethod
+    def scatter_many(
+        cls,
+        rng: np.random.Generator,
+        directions: np.ndarray,
+        normals: np.ndarray,
+        points: np.ndarray,
+        front_facing: np.ndarray,
+        materials: "MaterialTable",
+        material_ids: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Scatter a batch of rays which all hit materials of this class.
+
+        The batched counterpart of scatter, by default every ray is absorbed.
+
+        Args:
+            rng: source of the random numbers.
+            directions: (N, 3) directions of the incomming rays.
+            normals: (N, 3) unit normals at the hits, facing the rays.
+            points: (N, 3) hit points, the origins of the scattered rays.
+            front_facing: (N,) True for rays hitting the front of the object.
+            materials: the table with the parameters of the materials.
+            material_ids: (N,) row of the hit material in materials.
+
+        Returns:
+            The (N, 3) scattered directions and a mask of the rays which were
+            not absorbed.
+        """
+        return np.zeros_like(directions), np.zeros(len(directions), dtype=bool)
+
+    def split(
+        self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
+    ) -> list[Scatter] | None:
+        """Every ray scatter may choose between, weighted by its probability.
+
+        Tracing all of them instead of one scattered ray removes the noise of the
+        choice, see ray_color. None for materials which do not choose between
+        a few specular directions.
+        """
+        return None
+
+    def brdf(self, normal: Vector, direction: Vector) -> Color:
+        """Value of the BRDF for scattering into the unit direction.
+
+        Specular materials scatter into single directions, which have no value.
         """
+        return Color(Vec3(0.0, 0.0, 0.0))
+
+    def pdf(self, normal: Vector, direction: Vector) -> float:
+        """Probability density of scatter sampling the unit direction."""
+        return 0.0
 
     @property
     @abc.abstractmethod
@@ -26,9 +141,43 @@ class Material(abc.ABC):
 
 
 class DefaultMaterial(Material):
+    kind = MaterialKind.ABSORB
+
     def scatter(
-        self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
-    ) -> Vector | None:
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
+        return None
+
+    @property
+    def attentuition(self) -> Color:
+        return Color(Vector([0.0, 0.0, 0.0]))
+
+
+class DiffuseLight(Material):
+    """Emits the same radiance in all directions from the front faces, absorbs all light.
+
+    Hittables with this material are the lights of a World, which light
+    sampling aims at directly.
+    """
+
+    kind = MaterialKind.EMISSIVE
+
+    def __init__(self, emission: Color):
+        self.emission = emission
+
+    def scatter(
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
         return None
 
     @property
@@ -37,15 +186,51 @@ class DefaultMaterial(Material):
 
 
 class Lambertian(Material):
+    """Diffuse material, scatters cosine weighted around the normal."""
+
+    kind = MaterialKind.LAMBERTIAN
+
     def __init__(self, albedo: Color):
         self.albedo = albedo
 
     def scatter(
-        self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
-    ) -> Vector | None:
-        scatter_direction = normal + Vector.random_unit_vector()
-        scattered = Ray(intersection, scatter_direction)
-        return scattered
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
+        direction, cos_theta = cosine_direction(*random_2d(sampler), normal)
+        # the BRDF albedo / pi cancels with the density cos(theta) / pi
+        return Scatter(
+            Ray(intersection, direction),
+            self.albedo * (1.0 / math.pi),
+            cos_theta / math.pi,
+            cos_theta,
+        )
+
+    @classmethod
+    def scatter_many(
+        cls,
+        rng: np.random.Generator,
+        directions: np.ndarray,
+        normals: np.ndarray,
+        points: np.ndarray,
+        front_facing: np.ndarray,
+        materials: "MaterialTable",
+        material_ids: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        scattered = cosine_directions(rng.random((len(normals), 2)), normals)
+        return scattered, np.ones(len(normals), dtype=bool)
+
+    def brdf(self, normal: Vector, direction: Vector) -> Color:
+        if direction.dot(normal) <= 0.0:
+            return Color(Vec3(0.0, 0.0, 0.0))
+        return self.albedo * (1.0 / math.pi)
+
+    def pdf(self, normal: Vector, direction: Vector) -> float:
+        return max(0.0, float(direction.dot(normal))) / math.pi
 
     @property
     def attentuition(self) -> Color:
@@ -53,6 +238,8 @@ class Lambertian(Material):
 
 
 class Metal(Material):
+    kind = MaterialKind.METAL
+
     def __init__(self, albedo: Color, fuzz: float):
         self.albedo = albedo
         self.fuzz = fuzz
@@ -60,45 +247,169 @@ class Metal(Material):
         assert 0 <= self.fuzz <= 1
 
     def scatter(
-        self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
-    ) -> Vector | None:
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
         reflected = reflect(ray.direction, normal)
-        reflected = unit_vector(reflected) + self.fuzz * Vector.random_unit_vector()
+        reflected = unit_vector(reflected) + self.fuzz * random_unit_vector(sampler)
         scattered = Ray(intersection, reflected)
 
-        if np.dot(scattered.direction, normal) > 0:
-            return scattered
+        if scattered.direction.dot(normal) > 0:
+            return Scatter(scattered, self.albedo)
         else:
             return None
 
+    @classmethod
+    def scatter_many(
+        cls,
+        rng: np.random.Generator,
+        directions: np.ndarray,
+        normals: np.ndarray,
+        points: np.ndarray,
+        front_facing: np.ndarray,
+        materials: "MaterialTable",
+        material_ids: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        reflected = reflect_many(directions, normals)
+        fuzz = materials.fuzz[material_ids][:, None]
+        reflected = normalize(reflected) + fuzz * unit_vectors(
+            rng.random((len(normals), 2))
+        )
+        return reflected, dot(reflected, normals) > 0
+
     @property
     def attentuition(self) -> Color:
         return self.albedo
 
 
+def random_unit_vector(sampler: Sampler | None) -> Vec3:
+    if sampler is None:
+        return Vec3.random_unit_vector()
+    return sampler.unit_vector()
+
+
+def random_2d(sampler: Sampler | None) -> tuple[float, float]:
+    if sampler is None:
+        return random.random(), random.random()
+    return sampler.uniform_2d()
+
+
+def random_uniform(sampler: Sampler | None) -> float:
+    if sampler is None:
+        return random.random()
+    return sampler.uniform()
+
+
 def reflect(v1: Vector, v2: Vector) -> Vector:
-    return v1 - 2 * np.dot(v1, v2) * v2
+    return v1 - 2 * v1.dot(v2) * v2
+
+
+def reflect_many(v: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Reflect every row of the (N, 3) array v at the normal of the row of n."""
+    return v - 2 * dot(v, n)[:, None] * n
 
 
 class Dialetric(Material):
+    """Glass-like material, reflects or refracts with the Fresnel reflectance."""
+
+    kind = MaterialKind.DIALETRIC
+
     def __init__(self, attentuition: float, refraction_index: float):
         self._attentuition = attentuition
         self.refraction_index = refraction_index
 
     def scatter(
+        self,
+        ray: Ray,
+        normal: Vector,
+        intersection: Point,
+        front_facing: bool,
+        sampler: Sampler | None = None,
+    ) -> Scatter | None:
+        refraction_index = (
+            1 / self.refraction_index if front_facing else self.refraction_index
+        )
+        direction = unit_vector(ray.direction)
+        cos_theta = min((-direction).dot(normal), 1.0)
+        sin_theta = math.sqrt(max(0.0, 1.0 - cos_theta * cos_theta))
+
+        # drawn first, so every scatter consumes the same dimensions of the sampler
+        u = random_uniform(sampler)
+        # total internal reflection: there is no refracted ray, else reflect with
+        # the probability of the reflected fraction of the light
+        if refraction_index * sin_theta > 1.0 or u < reflectance(
+            cos_theta, refraction_index
+        ):
+            scattered = reflect(direction, normal)
+        else:
+            scattered = refract(direction, normal, refraction_index)
+        return Scatter(Ray(intersection, scattered), self.attentuition)
+
+    def split(
         self, ray: Ray, normal: Vector, intersection: Point, front_facing: bool
-    ) -> Vector | None:
+    ) -> list[Scatter] | None:
+        """The refracted ray and the reflected one, weighted by the reflectance."""
         refraction_index = (
             1 / self.refraction_index if front_facing else self.refraction_index
         )
-        refracted = refract(unit_vector(ray.direction), normal, refraction_index)
-        return Ray(intersection, refracted)
+        direction = unit_vector(ray.direction)
+        cos_theta = min((-direction).dot(normal), 1.0)
+        sin_theta = math.sqrt(max(0.0, 1.0 - cos_theta * cos_theta))
+
+        reflected = Ray(intersection, reflect(direction, normal))
+        if refraction_index * sin_theta > 1.0:
+            return [Scatter(reflected, self.attentuition)]
+        r = reflectance(cos_theta, refraction_index)
+        return [
+            Scatter(
+                Ray(intersection, refract(direction, normal, refraction_index)),
+                self.attentuition * (1.0 - r),
+            ),
+            Scatter(reflected, self.attentuition * r),
+        ]
+
+    @classmethod
+    def scatter_many(
+        cls,
+        rng: np.random.Generator,
+        directions: np.ndarray,
+        normals: np.ndarray,
+        points: np.ndarray,
+        front_facing: np.ndarray,
+        materials: "MaterialTable",
+        material_ids: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        ior = materials.refraction_index[material_ids]
+        ratio = np.where(front_facing, 1.0 / ior, ior)[:, None]
+        unit = normalize(directions)
+        cos_theta = np.minimum(dot(-unit, normals), 1.0)[:, None]
+        r_perp = ratio * (unit + cos_theta * normals)
+        r_para_sq = 1.0 - dot(r_perp, r_perp)[:, None]
+        refracted = r_perp - np.sqrt(np.abs(r_para_sq)) * normals
+        # total internal reflection: there is no refracted ray
+        r0 = ((1.0 - ratio) / (1.0 + ratio)) ** 2
+        reflected = (r_para_sq < 0) | (
+            rng.random((len(normals), 1)) < r0 + (1.0 - r0) * (1.0 - cos_theta) ** 5
+        )
+        scattered = np.where(reflected, reflect_many(unit, normals), refracted)
+        return scattered, np.ones(len(normals), dtype=bool)
 
     @property
     def attentuition(self) -> Color:
         return self._attentuition
 
 
+def reflectance(cos_theta: float, relative_refraction: float) -> float:
+    """Schlick's approximation of the reflected fraction of the light."""
+    r0 = (1 - relative_refraction) / (1 + relative_refraction)
+    r0 = r0 * r0
+    return r0 + (1 - r0) * (1 - cos_theta) ** 5
+
+
 def refract(v: Vector, n: Vector, relative_refraction: float) -> Vector:
     """Refract v at an object with normal n and given relative refraction.
 
@@ -110,8 +421,125 @@ def refract(v: Vector, n: Vector, relative_refraction: float) -> Vector:
     assert abs(v.length() - 1) < 10e-10, f"{v=} is supposed to be a unit vector."
     assert abs(n.length() - 1) < 10e-10, f"{n=} is supposed to be a unit vector."
 
-    cos_theta = min(np.dot(-v, n), 1.0)
+    cos_theta = min((-v).dot(n), 1.0)
     r_perp = relative_refraction * (v + cos_theta * n)
-    r_para = -np.sqrt(1 - r_perp.length() ** 2) * n
+    r_para = -math.sqrt(max(0.0, 1 - r_perp.length_squared())) * n
 
     return r_perp + r_para
+
+
+@dataclass
+class MaterialTable:
+    """Parameters of a list of materials packed into parallel arrays.
+
+    Row i of every array describes materials[i]. Parameters a material does not
+    have are left at neutral values, e.g., a fuzz of 0 and a refraction index of 1.
+    Tables built from arrays, e.g., of a scene file, create the material of a row
+    the first time it is looked up.
+
+    Attributes:
+        materials: the packed materials.
+        kinds: (K,) scatter model of every material.
+        albedo: (K, 3) attentuition of every material.
+        fuzz: (K,) fuzz of metals.
+        refraction_index: (K,) refraction index of dialetrics.
+        emission: (K, 3) radiance emitted by lights, 0 for all other materials.
+    """
+
+    # the parameter arrays in the order of from_arrays
+    ARRAYS: ClassVar[tuple[str, ...]] = (
+        "kinds",
+        "albedo",
+        "fuzz",
+        "refraction_index",
+        "emission",
+    )
+
+    materials: Sequence[Material]
+    kinds: np.ndarray
+    albedo: np.ndarray
+    fuzz: np.ndarray
+    refraction_index: np.ndarray
+    emission: np.ndarray
+
+    @classmethod
+    def from_materials(cls, materials: Sequence[Material]) -> "MaterialTable":
+        kinds = np.zeros(len(materials), dtype=np.int8)
+        albedo = np.zeros((len(materials), 3))
+        fuzz = np.zeros(len(materials))
+        refraction_index = np.ones(len(materials))
+        emission = np.zeros((len(materials), 3))
+
+        for i, material in enumerate(materials):
+            if not hasattr(material, "kind"):
+                raise TypeError(f"{material=} can not be packed into a table.")
+            kinds[i] = material.kind
+            albedo[i] = material.attentuition
+            if isinstance(material, Metal):
+                fuzz[i] = material.fuzz
+            elif isinstance(material, Dialetric):
+                refraction_index[i] = material.refraction_index
+            if material.emission is not None:
+                emission[i] = material.emission
+
+        return cls(list(materials), kinds, albedo, fuzz, refraction_index, emission)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        kinds: np.ndarray,
+        albedo: np.ndarray,
+        fuzz: np.ndarray,
+        refraction_index: np.ndarray,
+        emission: np.ndarray,
+    ) -> "MaterialTable":
+        table = cls([], kinds, albedo, fuzz, refraction_index, emission)
+        table.materials = _RowMaterials(table)
+        return table
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """The parameter arrays by name, see ARRAYS."""
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def row_material(self, i: int) -> Material:
+        """Create the material described by row i."""
+        kind = MaterialKind(int(self.kinds[i]))
+        albedo = Color(Vector(self.albedo[i]))
+        if kind is MaterialKind.LAMBERTIAN:
+            return Lambertian(albedo)
+        if kind is MaterialKind.METAL:
+            return Metal(albedo, float(self.fuzz[i]))
+        if kind is MaterialKind.DIALETRIC:
+            return Dialetric(albedo, float(self.refraction_index[i]))
+        if kind is MaterialKind.EMISSIVE:
+            return DiffuseLight(Color(Vector(self.emission[i])))
+        return DefaultMaterial()
+
+
+class _RowMaterials(Sequence[Material]):
+    """The materials of a table, created from its rows when first looked up."""
+
+    def __init__(self, table: MaterialTable):
+        self._table = table
+        self._materials: dict[int, Material] = {}
+
+    def __len__(self) -> int:
+        return len(self._table.kinds)
+
+    def __getitem__(self, i: int) -> Material:
+        i = int(i) + (len(self) if i < 0 else 0)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i not in self._materials:
+            self._materials[i] = self._table.row_material(i)
+        return self._materials[i]
+
+
+# the class implementing the scatter kernel of every kind of material
+KINDS: dict[MaterialKind, type[Material]] = {
+    MaterialKind.ABSORB: DefaultMaterial,
+    MaterialKind.LAMBERTIAN: Lambertian,
+    MaterialKind.METAL: Metal,
+    MaterialKind.DIALETRIC: Dialetric,
+    MaterialKind.EMISSIVE: DiffuseLight,
+}
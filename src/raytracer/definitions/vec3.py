@@ -0,0 +1,198 @@
+"""Lightweight 3 dimensional vector for the per-ray hot path.
+
+``Vector`` wraps numpy, which pays a large fixed overhead on every operation that
+dwarfs the work of adding or multiplying 3 numbers. ``Vec3`` stores plain floats
+in slots and inlines the arithmetic. It interoperates with ``Vector``: numpy
+defers binary operators to Vec3, and ``np.asarray`` turns it into an array.
+
+Run ``python -m raytracer.definitions.vec3`` to compare both per operation.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import timeit
+from typing import Iterator, Self
+
+import numpy as np
+
+from raytracer.definitions.vector import Vector
+
+
+# scalars broadcast over all components like they do for numpy arrays
+_SCALARS = (int, float, np.number)
+
+
+class Vec3:
+    __slots__ = ("x", "y", "z")
+
+    # makes numpy return NotImplemented for e.g. ndarray + Vec3, so Vec3 handles it
+    __array_ufunc__ = None
+
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_vector(cls, v: Vector | np.ndarray) -> Self:
+        return cls(*v.tolist())
+
+    def to_vector(self) -> Vector:
+        return Vector([self.x, self.y, self.z])
+
+    def tolist(self) -> list[float]:
+        return [self.x, self.y, self.z]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.array([self.x, self.y, self.z], dtype=dtype)
+
+    def __iter__(self) -> Iterator[float]:
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __len__(self) -> int:
+        return 3
+
+    def __getitem__(self, i: int) -> float:
+        return (self.x, self.y, self.z)[i]
+
+    def __repr__(self) -> str:
+        return f"Vec3({self.x!r}, {self.y!r}, {self.z!r})"
+
+    def __eq__(self, other) -> bool:
+        try:
+            x, y, z = other
+        except (TypeError, ValueError):
+            return NotImplemented
+        return self.x == x and self.y == y and self.z == z
+
+    __hash__ = None
+
+    def __neg__(self) -> Vec3:
+        return Vec3(-self.x, -self.y, -self.z)
+
+    # Operands are either a Vec3, a scalar which is broadcast like numpy does, or
+    # any other sequence of 3 numbers such as a Vector.
+
+    def __add__(self, other) -> Vec3:
+        if type(other) is Vec3:
+            return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
+        if isinstance(other, _SCALARS):
+            return Vec3(self.x + other, self.y + other, self.z + other)
+        x, y, z = other
+        return Vec3(self.x + x, self.y + y, self.z + z)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> Vec3:
+        if type(other) is Vec3:
+            return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
+        if isinstance(other, _SCALARS):
+            return Vec3(self.x - other, self.y - other, self.z - other)
+        x, y, z = other
+        return Vec3(self.x - x, self.y - y, self.z - z)
+
+    def __rsub__(self, other) -> Vec3:
+        return -self + other
+
+    def __mul__(self, other) -> Vec3:
+        if isinstance(other, _SCALARS):
+            return Vec3(self.x * other, self.y * other, self.z * other)
+        if type(other) is Vec3:
+            return Vec3(self.x * other.x, self.y * other.y, self.z * other.z)
+        x, y, z = other
+        return Vec3(self.x * x, self.y * y, self.z * z)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> Vec3:
+        if isinstance(other, _SCALARS):
+            return Vec3(self.x / other, self.y / other, self.z / other)
+        x, y, z = other
+        return Vec3(self.x / x, self.y / y, self.z / z)
+
+    def dot(self, other) -> float:
+        if type(other) is Vec3:
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        x, y, z = other
+        return self.x * x + self.y * y + self.z * z
+
+    def cross(self, other) -> Vec3:
+        x, y, z = other
+        return Vec3(
+            self.y * z - self.z * y,
+            self.z * x - self.x * z,
+            self.x * y - self.y * x,
+        )
+
+    def length_squared(self) -> float:
+        return self.x * self.x + self.y * self.y + self.z * self.z
+
+    def length(self) -> float:
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def unit(self) -> Vec3:
+        length = self.length()
+        return Vec3(self.x / length, self.y / length, self.z / length)
+
+    @classmethod
+    def random(cls, lower=0.0, upper=1.0) -> Self:
+        return cls(
+            random.uniform(lower, upper),
+            random.uniform(lower, upper),
+            random.uniform(lower, upper),
+        )
+
+    @classmethod
+    def random_unit_vector(cls) -> Self:
+        """Uniformly distributed unit vector, mapped from 2 random numbers."""
+        z = 2.0 * random.random() - 1.0
+        phi = 2.0 * math.pi * random.random()
+        r = math.sqrt(1.0 - z * z)
+        return cls(r * math.cos(phi), r * math.sin(phi), z)
+
+    @classmethod
+    def random_on_hemisphere(cls, normal) -> Self:
+        unit_vector = cls.random_unit_vector()
+        if unit_vector.dot(normal) < 0.0:
+            return -unit_vector
+        return unit_vector
+
+
+def benchmark(number: int = 100_000) -> dict[str, dict[str, float]]:
+    """Time common operations on Vector and Vec3.
+
+    Returns:
+        Microseconds per operation for every operation and type.
+    """
+    operations = {
+        "add": lambda a, b: a + b,
+        "scale": lambda a, b: 0.5 * a,
+        "dot": lambda a, b: a.dot(b),
+        "length": lambda a, b: a.length(),
+        "ray.at": lambda a, b: a + 0.75 * b,
+        "reflect": lambda a, b: a - 2 * a.dot(b) * b,
+    }
+    operands = {
+        "Vector": (Vector([0.1, 0.2, 0.3]), Vector([0.0, 1.0, 0.0])),
+        "Vec3": (Vec3(0.1, 0.2, 0.3), Vec3(0.0, 1.0, 0.0)),
+    }
+    return {
+        name: {
+            kind: timeit.timeit(lambda: op(a, b), number=number) / number * 1e6
+            for kind, (a, b) in operands.items()
+        }
+        for name, op in operations.items()
+    }
+
+
+if __name__ == "__main__":
+    for name, timings in benchmark().items():
+        speedup = timings["Vector"] / timings["Vec3"]
+        print(
+            f"{name:8} Vector {timings['Vector']:6.2f}us "
+            f"Vec3 {timings['Vec3']:6.2f}us speedup {speedup:5.1f}x"
+        )
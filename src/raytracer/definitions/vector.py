@@ -1,6 +1,7 @@
 """General definitions used throughout the project."""
 
 from __future__ import annotations
+import math
 import random
 import numpy as np
 from typing import Any, NewType, Self, TypeVar
@@ -45,6 +46,9 @@ class Vector(np.ndarray[Any, T]):
     def length(self) -> float:
         return np.linalg.norm(self)
 
+    def length_squared(self) -> float:
+        return self.dot(self)
+
     @classmethod
     def random(cls, lower=0.0, upper=1.0) -> Self:
         return cls(
@@ -57,11 +61,11 @@ class Vector(np.ndarray[Any, T]):
 
     @classmethod
     def random_unit_vector(cls) -> Self:
-        while True:
-            p = cls.random(-1, 1)
-            length = p.length()
-            if 10**-100 < length <= 1:
-                return p / length
+        """Uniformly distributed unit vector, mapped from 2 random numbers."""
+        z = 2.0 * random.random() - 1.0
+        phi = 2.0 * math.pi * random.random()
+        r = math.sqrt(1.0 - z * z)
+        return cls([r * math.cos(phi), r * math.sin(phi), z])
 
     @classmethod
     def random_on_hemisphere(cls, normal: Vector) -> Self:
@@ -73,8 +77,8 @@ class Vector(np.ndarray[Any, T]):
 
 
 def unit_vector(v: Vector) -> Vector:
-    """Returns a unit vector with the same direction."""
-    return v / np.linalg.norm(v)
+    """Returns a unit vector with the same direction, also for Vec3."""
+    return v / v.length()
 
 
 Point = NewType("Point", Vector)
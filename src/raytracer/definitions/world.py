@@ -1,23 +1,401 @@
-from typing import Optional, Self
+from collections.abc import Iterable
+from typing import Any, Optional, Self
+
+import numpy as np
+
+from raytracer.definitions.aabb import AABB
+from raytracer.definitions.material import Material, MaterialKind, MaterialTable
 from raytracer.definitions.ray import Ray
-from raytracer.hitable import Hittable, Record
+from raytracer.definitions.vector import Point, Vector
+from raytracer.hitable import Hit, Hittable, Record, Sphere, is_front_facing
+from raytracer.stats import COLLECTOR, closer_hits
+
+
+def is_light(hittable: Hittable) -> bool:
+    """True for hittables with an emissive material which can be sampled.
+
+    Emissive hittables without ``sample_direction``, e.g., meshes, still emit
+    light when a path hits them but are not aimed at by light sampling.
+    """
+    material = getattr(hittable, "material", None)
+    return (
+        material is not None
+        and material.emission is not None
+        and hasattr(hittable, "sample_direction")
+    )
+
+
+def lights_of(hittable: Hittable) -> list[Hittable]:
+    """The lights aimed at by light sampling within hittable.
+
+    These are the hittable itself if it is a light, the lights of a FrozenWorld
+    or none.
+    """
+    if is_light(hittable):
+        return [hittable]
+    if isinstance(hittable, FrozenWorld):
+        return hittable.lights
+    return []
+
+
+def closest_roots(
+    oc: np.ndarray, c: np.ndarray, direction: np.ndarray, t_min: float, t_max: float
+) -> np.ndarray:
+    """Distance of the closest hit of a ray with every sphere, inf if it misses.
+
+    Args:
+        oc: (M, 3) vector from the ray origin to the center of every sphere.
+        c: (M,) squared length of oc minus the squared radius of every sphere.
+        direction: (3,) direction of the ray.
+    """
+    a = direction @ direction
+    h = oc @ direction
+    discriminant = h * h - a * c
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sqrtd = np.sqrt(discriminant)
+        near = (h - sqrtd) / a
+        far = (h + sqrtd) / a
+    root = np.where((t_min <= near) & (near <= t_max), near, far)
+    return np.where((t_min <= root) & (root <= t_max), root, np.inf)
+
+
+def closest_hits(
+    directions: np.ndarray,
+    terms: Iterable[tuple[int, np.ndarray, np.ndarray | float]],
+    t_min: float,
+    t_max: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Closest hit of every ray of a (N, 3) batch, testing one sphere at a time.
+
+    Args:
+        directions: (N, 3) direction of every ray.
+        terms: the index of every sphere with the terms of its intersection with
+            every ray, the (N,) dot products of the direction with the vector oc
+            from the origin to the center and ``|oc|^2 - r^2``, (N,) or a float if
+            all rays share the origin.
+
+    Returns:
+        The distance to the closest hit and the index of the hit sphere, -1 if
+        the ray does not hit any sphere.
+    """
+    n = len(directions)
+    closest = np.full(n, t_max)
+    index = np.full(n, -1, dtype=np.intp)
+    a = np.einsum("ij,ij->i", directions, directions)
+    stats = COLLECTOR.get()
+    tested = 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i, h, c in terms:
+            discriminant = h * h - a * c
+            sqrtd = np.sqrt(np.maximum(discriminant, 0.0))
+
+            root = (h - sqrtd) / a
+            near_valid = (t_min <= root) & (root <= closest)
+            root = np.where(near_valid, root, (h + sqrtd) / a)
+            valid = (discriminant >= 0) & (t_min <= root) & (root <= closest)
+
+            closest[valid] = root[valid]
+            index[valid] = i
+            tested += 1
+            if stats is not None:
+                stats.counters["intersection.hits"] += int(np.count_nonzero(valid))
+
+    if stats is not None:
+        stats.counters["intersection.tests"] += n * tested
+
+    return closest, index
 
 
 class World:
     def __init__(self):
         self.hittables: list[Hittable] = []
+        # the hittables with an emissive material, aimed at by light sampling
+        self.lights: list[Hittable] = []
 
     def add(self, h: Hittable) -> Self:
         self.hittables.append(h)
+        self.lights.extend(lights_of(h))
         return self
 
     def hit(self, ray: Ray, t_min: float, t_max: float) -> Optional[Record]:
+        hit = self.intersect(ray, t_min, t_max)
+        return None if hit is None else self.surface_info(ray, *hit)
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Distance of the closest hit and the hittable hit, see Hittable.intersect."""
         closest_dist = t_max
-        record = None
+        closest = None
 
         for hittable in self.hittables:
-            if r := hittable.hit(ray, t_min, closest_dist):
-                record = r
-                closest_dist = r.distance
+            if h := hittable.intersect(ray, t_min, closest_dist):
+                closest_dist, part = h
+                closest = hittable, part
+
+        return None if closest is None else (closest_dist, closest)
+
+    def surface_info(self, ray: Ray, t: float, part: tuple[Hittable, Any]) -> Record:
+        """Build the record of a hit returned by intersect."""
+        hittable, hittable_part = part
+        return hittable.surface_info(ray, t, hittable_part)
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        """True if any hittable is hit between t_min and t_max."""
+        return any(h.occluded(ray, t_min, t_max) for h in self.hittables)
+
+    @property
+    def freezable(self) -> bool:
+        """True if freeze can pack every hittable, i.e., all of them are spheres.
+
+        A world of a single FrozenWorld, e.g., a loaded scene file, is frozen
+        already.
+        """
+        if len(self.hittables) == 1 and isinstance(self.hittables[0], FrozenWorld):
+            return True
+        return all(isinstance(h, Sphere) for h in self.hittables)
+
+    def freeze(self) -> "FrozenWorld":
+        """Compile the world into packed arrays of sphere geometry and materials.
+
+        Materials shared by several spheres are packed only once.
+        """
+        if len(self.hittables) == 1 and isinstance(self.hittables[0], FrozenWorld):
+            return self.hittables[0]
+        materials: list[Material] = []
+        material_index: dict[int, int] = {}
+        material_ids = np.empty(len(self.hittables), dtype=np.intp)
+        centers = np.empty((len(self.hittables), 3))
+        radii = np.empty(len(self.hittables))
+
+        for i, hittable in enumerate(self.hittables):
+            if not isinstance(hittable, Sphere):
+                raise TypeError(f"{hittable=} can not be frozen.")
+            if id(hittable.material) not in material_index:
+                material_index[id(hittable.material)] = len(materials)
+                materials.append(hittable.material)
+            material_ids[i] = material_index[id(hittable.material)]
+            centers[i] = hittable.center
+            radii[i] = hittable.radius
+
+        return FrozenWorld(
+            centers,
+            radii,
+            material_ids,
+            MaterialTable.from_materials(materials),
+            list(self.lights),
+        )
+
+
+class FrozenWorld(Hittable):
+    """Read-only world with spheres packed into structure-of-arrays form.
+
+    A FrozenWorld is a hittable itself, so the packed spheres of a scene file
+    can be added to a World next to other hittables.
+
+    Attributes:
+        centers: (M, 3) center of every sphere.
+        radii: (M,) radius of every sphere.
+        material_ids: (M,) row of every sphere's material in materials.
+        materials: table with the parameters of all materials.
+        lights: the emissive spheres, aimed at by light sampling.
+    """
+
+    def __init__(
+        self,
+        centers: np.ndarray,
+        radii: np.ndarray,
+        material_ids: np.ndarray,
+        materials: MaterialTable,
+        lights: list[Hittable] | None = None,
+    ):
+        self.centers = np.ascontiguousarray(centers, dtype=float)
+        self.radii = np.ascontiguousarray(radii, dtype=float)
+        self.material_ids = np.ascontiguousarray(material_ids, dtype=np.intp)
+        self.materials = materials
+        self.lights = lights or []
+        self._radii_sq = self.radii * self.radii
+
+    @classmethod
+    def from_arrays(
+        cls,
+        centers: np.ndarray,
+        radii: np.ndarray,
+        material_ids: np.ndarray,
+        materials: MaterialTable,
+    ) -> "FrozenWorld":
+        """Pack spheres given as arrays, e.g., memory-mapped from a scene file.
+
+        Only the emissive spheres become Sphere objects, the lights.
+        """
+        emissive = materials.kinds[material_ids] == MaterialKind.EMISSIVE
+        lights: list[Hittable] = [
+            Sphere(
+                Point(Vector(centers[i])),
+                float(radii[i]),
+                materials.materials[material_ids[i]],
+            )
+            for i in np.flatnonzero(emissive).tolist()
+        ]
+        return cls(centers, radii, material_ids, materials, lights)
+
+    def __len__(self) -> int:
+        return len(self.radii)
+
+    def bounding_box(self) -> AABB:
+        if not len(self):
+            raise ValueError("An empty world has no bounding box.")
+        return AABB(
+            (self.centers - self.radii[:, None]).min(axis=0),
+            (self.centers + self.radii[:, None]).max(axis=0),
+        )
+
+    def _roots(self, ray: Ray, t_min: float, t_max: float) -> np.ndarray:
+        """Distance of the closest hit of ray with every sphere, inf if it misses."""
+        oc = self.centers - np.asarray(ray.orig, dtype=float)
+        c = np.einsum("ij,ij->i", oc, oc) - self._radii_sq
+        return closest_roots(
+            oc, c, np.asarray(ray.direction, dtype=float), t_min, t_max
+        )
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Closest hit of a ray and the index of its sphere, testing all at once."""
+        if not len(self):
+            return None
+
+        root = self._roots(ray, t_min, t_max)
+
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["intersection.tests"] += len(self)
+            stats.counters["intersection.hits"] += closer_hits(root)
+
+        i = int(np.argmin(root))
+        if root[i] == np.inf:
+            return None
+        return float(root[i]), i
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        """True if any sphere is hit between t_min and t_max."""
+        if not len(self):
+            return False
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["intersection.tests"] += len(self)
+        return bool((self._roots(ray, t_min, t_max) < np.inf).any())
+
+    def surface_info(self, ray: Ray, t: float, i: int) -> Record:
+        """Build the hit record of ray with the i-th sphere at distance t."""
+        p = ray.at(t)
+        outward_normal = (p - self.centers[i].tolist()) / float(self.radii[i])
+        front_facing = is_front_facing(ray, outward_normal)
+        return Record(
+            point=p,
+            normal=(1 if front_facing else -1) * outward_normal,
+            front_facing=front_facing,
+            distance=t,
+            material=self.materials.materials[self.material_ids[i]],
+        )
+
+    def intersect_many(
+        self,
+        origins: np.ndarray,
+        directions: np.ndarray,
+        t_min: float,
+        t_max: float,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Closest hit of every ray of a (N, 3) batch.
+
+        Returns:
+            The distance to the closest hit and the index of the hit sphere, -1 if
+            the ray does not hit any sphere.
+        """
+
+        def terms():
+            for i, (center, radius_sq) in enumerate(zip(self.centers, self._radii_sq)):
+                oc = center - origins
+                h = np.einsum("ij,ij->i", directions, oc)
+                yield i, h, np.einsum("ij,ij->i", oc, oc) - radius_sq
+
+        return closest_hits(directions, terms(), t_min, t_max)
+
+
+class PrimaryView:
+    """The spheres of a FrozenWorld as seen by the rays leaving a camera.
+
+    All camera rays start at the camera center, so the terms of the intersection
+    which only depend on the origin, the vector oc to every sphere and
+    ``|oc|^2 - r^2``, are computed once instead of for every ray. Spheres which are
+    completely behind the camera or outside the frustum through the corners of
+    the viewport can not be hit by camera rays and are culled.
+
+    Attributes:
+        scene: the viewed world.
+        origin: (3,) the camera center, the origin of all rays.
+        visible: (V,) indices of the spheres in the frustum.
+    """
+
+    def __init__(self, scene: FrozenWorld, origin: np.ndarray, corners: np.ndarray):
+        """
+        Args:
+            scene: the world to view.
+            origin: the camera center.
+            corners: (4, 3) corners of the viewport in clockwise or
+                counterclockwise order.
+        """
+        self.scene = scene
+        self.origin = np.asarray(origin, dtype=float)
+        corners = np.asarray(corners, dtype=float) - self.origin
+
+        # normals of the side planes of the frustum and of the image plane
+        # through the origin, all pointing into the frustum
+        normals = np.cross(corners, np.roll(corners, -1, axis=0))
+        forward = corners.mean(axis=0)
+        normals *= np.sign(normals @ forward)[:, None]
+        normals = np.vstack([normals, forward])
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+        oc = scene.centers - self.origin
+        inside = (oc @ normals.T >= -scene.radii[:, None]).all(axis=1)
+        self.visible = np.flatnonzero(inside)
+        self._oc = np.ascontiguousarray(oc[self.visible])
+        self._c = (
+            np.einsum("ij,ij->i", self._oc, self._oc) - scene._radii_sq[self.visible]
+        )
+
+    def __len__(self) -> int:
+        return len(self.visible)
+
+    def hit(self, ray: Ray, t_min: float, t_max: float) -> Optional[Record]:
+        """Closest hit of a camera ray, which must start at origin."""
+        hit = self.intersect(ray, t_min, t_max)
+        return None if hit is None else self.scene.surface_info(ray, *hit)
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Closest hit of a camera ray and the index of the sphere in scene."""
+        if not len(self):
+            return None
+
+        root = closest_roots(
+            self._oc, self._c, np.asarray(ray.direction, dtype=float), t_min, t_max
+        )
+
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["intersection.tests"] += len(self)
+            stats.counters["intersection.hits"] += closer_hits(root)
+
+        i = int(np.argmin(root))
+        if root[i] == np.inf:
+            return None
+        return float(root[i]), int(self.visible[i])
+
+    def intersect_many(
+        self, directions: np.ndarray, t_min: float, t_max: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Closest hit of every camera ray of a (N, 3) batch.
 
-        return record
+        See FrozenWorld.intersect_many.
+        """
+        terms = (
+            (i, directions @ oc, c)
+            for i, oc, c in zip(self.visible.tolist(), self._oc, self._c.tolist())
+        )
+        return closest_hits(directions, terms, t_min, t_max)
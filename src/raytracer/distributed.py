@@ -0,0 +1,487 @@
+"""Render the tiles of an image on workers spread over several machines.
+
+A coordinator listens on a TCP port, workers connect to it. Every worker gets
+the settings of the RayTracer and the scene as a scene file once, then asks for
+tiles until the image is done::
+
+    worker                      coordinator
+    hello               ->
+                        <-      scene: settings and the bytes of a .rts file
+    ready               ->
+                        <-      tile: rows, columns and samples
+    result: pixels      ->
+                        <-      tile ... or done
+
+Messages are a little-endian ``<u8`` length and a JSON header followed by the
+raw bytes of the arrays the header lists with dtype and shape, so no pickle is
+ever loaded from the network.
+
+With ``samples_per_pass`` every tile is rendered in several passes, which are
+handed out as separate work, so many workers can share a small image with many
+samples. A tile whose worker disconnects, or does not answer within the
+timeout, goes back into the queue; the first result of every pass wins. Tiles
+are seeded like local renders, so with one pass the image is identical to the
+one rendered on a single machine with the same seed.
+"""
+
+import collections
+import contextlib
+import json
+import logging
+import math
+import socket
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from raytracer import parallel, scenefile
+from raytracer.definitions.world import World
+from raytracer.raytracer import RayTracer
+from raytracer.sinks import Sink
+from raytracer.stats import RenderStats
+
+_logger = logging.getLogger(__name__)
+
+PORT = 5757
+# seconds a worker may take for a tile before it is handed out again
+TIMEOUT = 300.0
+# seconds a worker keeps trying to reach a coordinator which is not up yet
+CONNECT_TIMEOUT = 30.0
+# bytes of the largest JSON header received
+MAX_HEADER = 1 << 20
+
+
+def _receive_exactly(sock: socket.socket, n: int) -> bytearray:
+    buffer = bytearray(n)
+    view = memoryview(buffer)
+    received = 0
+    while received < n:
+        k = sock.recv_into(view[received:])
+        if not k:
+            raise ConnectionError("Connection closed by peer.")
+        received += k
+    return buffer
+
+
+def send_message(
+    sock: socket.socket,
+    header: dict[str, Any],
+    arrays: dict[str, np.ndarray] | None = None,
+) -> None:
+    """Send a JSON header followed by the raw bytes of arrays."""
+    arrays = {name: np.ascontiguousarray(a) for name, a in (arrays or {}).items()}
+    header = {
+        **header,
+        "arrays": [
+            [name, a.dtype.str, list(a.shape), a.nbytes] for name, a in arrays.items()
+        ],
+    }
+    data = json.dumps(header).encode()
+    sock.sendall(struct.pack("<Q", len(data)) + data)
+    for array in arrays.values():
+        sock.sendall(array.data)
+
+
+def _array_specs(header: dict[str, Any]) -> list[tuple[str, np.dtype, tuple, int]]:
+    """Name, dtype, shape and byte count of the arrays listed in a header.
+
+    Raises:
+        ValueError: if an array is malformed or its byte count does not match
+            its dtype and shape.
+    """
+    specs = []
+    for spec in header.pop("arrays", []):
+        if not (isinstance(spec, list) and len(spec) == 4):
+            raise ValueError(f"Malformed array {spec}.")
+        name, dtype, shape, nbytes = spec
+        dtype = np.dtype(dtype)
+        if dtype.hasobject:
+            raise ValueError(f"Array {name} of {dtype=} can not be received.")
+        if not (
+            isinstance(shape, list)
+            and all(isinstance(k, int) and k >= 0 for k in shape)
+            and isinstance(nbytes, int)
+            and nbytes == dtype.itemsize * math.prod(shape)
+        ):
+            raise ValueError(f"Array {name} of {dtype} {shape} is not {nbytes=}.")
+        specs.append((name, dtype, tuple(shape), nbytes))
+    return specs
+
+
+def receive_message(
+    sock: socket.socket, max_size: int | None = None
+) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Receive a message of send_message.
+
+    Args:
+        sock: the connection.
+        max_size: most bytes of all arrays of the message together, None for
+            no limit. Checked before any array is received.
+
+    Raises:
+        ConnectionError: if the peer closed the connection.
+        ValueError: if the message is malformed or too large.
+        TypeError: if the header is not a JSON object.
+    """
+    (length,) = struct.unpack("<Q", _receive_exactly(sock, 8))
+    if length > MAX_HEADER:
+        raise ValueError(f"Header of {length} bytes exceeds {MAX_HEADER}.")
+    header = json.loads(_receive_exactly(sock, length))
+    if not isinstance(header, dict):
+        raise TypeError(f"Header {header} is not a JSON object.")
+    specs = _array_specs(header)
+    size = sum(nbytes for *_, nbytes in specs)
+    if max_size is not None and size > max_size:
+        raise ValueError(f"Arrays of {size} bytes exceed {max_size}.")
+    return header, {
+        name: np.frombuffer(_receive_exactly(sock, nbytes), dtype).reshape(shape)
+        for name, dtype, shape, nbytes in specs
+    }
+
+
+def _tile_header(tile: parallel.Tile) -> dict[str, Any]:
+    return {
+        "type": "tile",
+        "index": tile.index,
+        "rows": [tile.rows.start, tile.rows.stop],
+        "cols": [tile.cols.start, tile.cols.stop],
+        "first_sample": tile.first_sample,
+        "samples": tile.samples,
+    }
+
+
+def _stats_header(stats: RenderStats | None) -> dict[str, Any] | None:
+    if stats is None:
+        return None
+    return {"counters": dict(stats.counters), "seconds": dict(stats.seconds)}
+
+
+@dataclass
+class _Assignment:
+    """A pass of a tile handed out to a worker."""
+
+    deadline: float
+    worker: int
+
+
+class Coordinator:
+    """Hands out the tiles of an image to workers and merges their results.
+
+    Attributes:
+        settings: keyword arguments of the RayTracer of every worker.
+        tracer: the tracer collecting the statistics of the results.
+        address: host and port the coordinator listens on.
+        timeout: seconds after which the tile of a silent worker is handed out
+            again.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        settings: dict[str, Any],
+        address: tuple[str, int] = ("127.0.0.1", PORT),
+        timeout: float = TIMEOUT,
+    ):
+        """
+        Args:
+            world: the scene, spheres, FrozenWorlds and meshes only, see
+                scenefile.save.
+            settings: JSON serializable keyword arguments of RayTracer. A random
+                seed is picked if there is none, as all workers need the same.
+            address: host and port to listen on, port 0 picks a free one.
+            timeout: see the attribute.
+        """
+        settings = dict(settings)
+        if settings.get("seed") is None:
+            settings["seed"] = np.random.SeedSequence().entropy
+        self.settings = settings
+        self.tracer = RayTracer(**settings)
+        self.timeout = timeout
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "scene.rts"
+            scenefile.save(path, world)
+            self._scene = np.frombuffer(path.read_bytes(), dtype=np.uint8)
+
+        self._server = socket.create_server(address)
+        self.address: tuple[str, int] = self._server.getsockname()[:2]
+        self._condition = threading.Condition()
+        self._connections: list[socket.socket] = []
+        self._handlers: list[threading.Thread] = []
+        self._closed = False
+
+    def _work(self) -> list[parallel.Tile]:
+        """Every pass of every tile."""
+        tracer = self.tracer
+        tiles = parallel.split_tiles(
+            tracer.image_height, tracer.image_width, tracer.tile_size
+        )
+        samples_per_pass = tracer.samples_per_pass or tracer.samples_per_pixel
+        return [
+            parallel.Tile(
+                tile.index,
+                tile.rows,
+                tile.cols,
+                first,
+                min(samples_per_pass, tracer.samples_per_pixel - first),
+            )
+            for first in range(0, tracer.samples_per_pixel, samples_per_pass)
+            for tile in tiles
+        ]
+
+    def render(self, sink: Sink) -> None:
+        """Serve workers until every tile is rendered into sink.
+
+        The passes of a tile are summed until all of them are in, then the tile
+        is written into sink, so no full-frame array is kept.
+        """
+        self.tracer.initialize()
+        self._sink = sink
+        self._tiles = {(t.index, t.first_sample): t for t in self._work()}
+        self._passes = collections.Counter(index for index, _ in self._tiles)
+        # sum of the colors and number of samples of the tiles with passes left
+        self._partial: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+        self._pending = collections.deque(self._tiles.values())
+        self._assigned: dict[tuple[int, int], _Assignment] = {}
+        self._done: set[tuple[int, int]] = set()
+        self._total = len(self._tiles)
+
+        _logger.info(
+            f"Coordinating {self._total} tiles on {self.address[0]}:{self.address[1]}"
+        )
+        accept = threading.Thread(target=self._accept, daemon=True)
+        accept.start()
+        try:
+            with self._condition:
+                while len(self._done) < self._total:
+                    self._condition.wait(min(self.timeout, 1.0))
+                    self._requeue_expired()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop listening, send done to idle workers and disconnect the others."""
+        self._server.close()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            handlers = list(self._handlers)
+        for handler in handlers:
+            handler.join(1.0)
+        with self._condition:
+            for connection in self._connections:
+                # unlike close, shutdown also wakes a thread blocked reading it
+                with contextlib.suppress(OSError):
+                    connection.shutdown(socket.SHUT_RDWR)
+            self._connections.clear()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                connection, peer = self._server.accept()
+            except OSError:
+                return
+            handler = threading.Thread(
+                target=self._serve, args=(connection, peer), daemon=True
+            )
+            with self._condition:
+                self._connections.append(connection)
+                self._handlers.append(handler)
+            handler.start()
+
+    def _requeue_expired(self) -> None:
+        now = time.monotonic()
+        for key, assignment in list(self._assigned.items()):
+            if assignment.deadline < now:
+                _logger.warning(f"Tile {key} timed out, handing it out again.")
+                self._requeue(key)
+
+    def _requeue(self, key: tuple[int, int]) -> None:
+        del self._assigned[key]
+        self._pending.append(self._tiles[key])
+        self._condition.notify_all()
+
+    def _next_tile(self, worker: int) -> parallel.Tile | None:
+        """Wait for a tile to hand out to worker, None once the image is done."""
+        with self._condition:
+            while not self._pending:
+                if self._closed or len(self._done) == self._total:
+                    return None
+                self._condition.wait()
+            tile = self._pending.popleft()
+            self._assigned[(tile.index, tile.first_sample)] = _Assignment(
+                time.monotonic() + self.timeout, worker
+            )
+            return tile
+
+    def _result_size(self, tile: parallel.Tile) -> int:
+        """Most bytes of the arrays of a result of tile, 8 bytes per value."""
+        rows, cols = tile.shape
+        return 8 * (4 * rows * cols + self.tracer.max_recursion_depth + 1)
+
+    def _check(self, result: parallel.TileResult) -> None:
+        """Raise ValueError if the arrays of a result do not fit its tile."""
+        tile = result.tile
+        expected = {
+            "pixels": ((*tile.shape, 3), "f"),
+            "samples": (tile.shape, "iu"),
+            "path_lengths": ((self.tracer.max_recursion_depth + 1,), "iu"),
+        }
+        for name, (shape, kinds) in expected.items():
+            array = getattr(result, name)
+            if array.shape != shape or array.dtype.kind not in kinds:
+                raise ValueError(
+                    f"Malformed {name} of tile {tile.index}: {array.dtype} "
+                    f"{array.shape}, expected {shape}."
+                )
+
+    def _add(self, tile: parallel.Tile, result: parallel.TileResult) -> None:
+        """Merge a result, once per tile.
+
+        Raises:
+            ValueError: if the result is malformed. The tile stays assigned to
+                the worker, which is disconnected and its tile handed out again.
+        """
+        self._check(result)
+        key = (tile.index, tile.first_sample)
+        with self._condition:
+            if key in self._done:
+                return
+            self._done.add(key)
+            self._assigned.pop(key, None)
+            if tile in self._pending:
+                self._pending.remove(tile)
+            self.tracer.collect(result)
+            sums, counts = self._partial.setdefault(
+                tile.index,
+                (np.zeros((*tile.shape, 3)), np.zeros(tile.shape, dtype=np.int64)),
+            )
+            sums += result.pixels * result.samples[..., None]
+            counts += result.samples
+            self._passes[tile.index] -= 1
+            if not self._passes[tile.index]:
+                del self._partial[tile.index]
+                self._sink.write(
+                    tile.rows.start,
+                    tile.cols.start,
+                    sums / np.maximum(counts, 1)[..., None],
+                )
+                if self.tracer.spp_map is not None:
+                    self.tracer.spp_map[tile.slices] = counts
+            self._condition.notify_all()
+
+    def _serve(self, connection: socket.socket, peer: Any) -> None:
+        worker = id(connection)
+        tile = None
+        try:
+            header, _ = receive_message(connection, max_size=0)
+            if header.get("type") != "hello":
+                raise ValueError(f"Expected hello, got {header.get('type')}.")
+            send_message(
+                connection,
+                {"type": "scene", "settings": self.settings},
+                {"scene": self._scene},
+            )
+            receive_message(connection, max_size=0)
+            _logger.info(f"Worker {peer} joined.")
+
+            while (tile := self._next_tile(worker)) is not None:
+                send_message(connection, _tile_header(tile))
+                header, arrays = receive_message(
+                    connection, max_size=self._result_size(tile)
+                )
+                stats = header.get("stats")
+                self._add(
+                    tile,
+                    parallel.TileResult(
+                        tile,
+                        arrays["pixels"],
+                        arrays["samples"],
+                        arrays["path_lengths"],
+                        None
+                        if stats is None
+                        else RenderStats(
+                            collections.Counter(stats["counters"]),
+                            collections.Counter(stats["seconds"]),
+                        ),
+                    ),
+                )
+            send_message(connection, {"type": "done"})
+        except (OSError, ValueError, TypeError, KeyError) as error:
+            if not self._closed:
+                _logger.warning(f"Worker {peer} failed: {error}")
+        finally:
+            with self._condition:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+                key = None if tile is None else (tile.index, tile.first_sample)
+                assignment = self._assigned.get(key)
+                if assignment is not None and assignment.worker == worker:
+                    self._requeue(key)
+            connection.close()
+
+
+def _connect(address: tuple[str, int], connect_timeout: float) -> socket.socket:
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            return socket.create_connection(address)
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def work(address: tuple[str, int], connect_timeout: float = CONNECT_TIMEOUT) -> int:
+    """Render tiles for the coordinator at address until the image is done.
+
+    Returns:
+        The number of tiles rendered.
+    """
+    rendered = 0
+    with (
+        _connect(address, connect_timeout) as sock,
+        tempfile.TemporaryDirectory() as directory,
+    ):
+        send_message(sock, {"type": "hello"})
+        header, arrays = receive_message(sock)
+        path = Path(directory) / "scene.rts"
+        path.write_bytes(arrays["scene"].tobytes())
+        tracer = RayTracer(**header["settings"])
+        tracer.initialize()
+        scene = tracer.build_scene(scenefile.load(path).world)
+        send_message(sock, {"type": "ready"})
+        _logger.info(f"Rendering for {address[0]}:{address[1]}")
+
+        try:
+            while (header := receive_message(sock)[0])["type"] == "tile":
+                tile = parallel.Tile(
+                    header["index"],
+                    range(*header["rows"]),
+                    range(*header["cols"]),
+                    header["first_sample"],
+                    header["samples"],
+                )
+                result = tracer.render_tile(scene, tile)
+                send_message(
+                    sock,
+                    {"type": "result", "stats": _stats_header(result.stats)},
+                    {
+                        "pixels": result.pixels,
+                        "samples": result.samples,
+                        "path_lengths": result.path_lengths,
+                    },
+                )
+                rendered += 1
+        except ConnectionError:
+            # the coordinator hangs up on idle workers once the image is done
+            _logger.info("The coordinator closed the connection.")
+
+    _logger.info(f"Rendered {rendered} tiles.")
+    return rendered
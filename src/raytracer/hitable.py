@@ -1,22 +1,65 @@
 import abc
-from typing import Optional
+import math
+from typing import Any, Optional
 
 import numpy as np
 
+from raytracer.definitions.aabb import AABB
 from raytracer.definitions.material import DefaultMaterial, Material
 from raytracer.definitions.vector import Point
 from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
 from raytracer.definitions.hit_record import Record
+from raytracer.sampling import local_to_world
+from raytracer.stats import COLLECTOR
+
+
+# the distance of a hit and the part of the hittable it hit, e.g., the index of a
+# triangle in a mesh, from which surface_info builds the record
+Hit = tuple[float, Any]
 
 
 class Hittable(abc.ABC):
+    """Something a ray can hit.
+
+    Hits are found in two phases: intersect only computes the distance of the
+    closest hit, so a search over many hittables compares plain floats, and
+    surface_info builds the record of the winner once the search is done.
+    """
+
+    @abc.abstractmethod
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Distance of the closest hit between t_min and t_max and the part hit.
+
+        Returns:
+            The distance and the part to pass to surface_info, None if the ray
+            misses.
+        """
+
     @abc.abstractmethod
+    def surface_info(self, ray: Ray, t: float, part: Any) -> Record:
+        """Build the record of a hit returned by intersect."""
+
     def hit(self, ray: Ray, t_min: float, t_max: float) -> Optional[Record]:
         """Compute the intersection of the ray and the hittable, else return None."""
+        hit = self.intersect(ray, t_min, t_max)
+        return None if hit is None else self.surface_info(ray, *hit)
+
+    @abc.abstractmethod
+    def bounding_box(self) -> AABB:
+        """Axis-aligned box enclosing the hittable."""
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        """True if the ray hits anything between t_min and t_max.
+
+        Shadow rays only need to know whether there is a blocker, hittables with
+        many parts override this to stop at the first one they find.
+        """
+        return self.intersect(ray, t_min, t_max) is not None
 
 
 def is_front_facing(ray: Ray, outward_normal):
-    return np.dot(ray.direction, outward_normal) < 0
+    return ray.direction.dot(outward_normal) < 0
 
 
 class Sphere(Hittable):
@@ -24,12 +67,21 @@ class Sphere(Hittable):
         self.center = center
         self.radius = radius
         self.material = material or DefaultMaterial()
+        # plain float copy of the center for the per-ray math
+        self._center = Vec3(*map(float, center))
 
     def hit(self, ray: Ray, t_min: float = 0.0, t_max: float = 1.0) -> Optional[Record]:
+        return super().hit(ray, t_min, t_max)
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
         """Returns the distance to the sphere or None if there is no intersection.
 
         TODO: currently spheres in front and behind the camera are hit.
         """
+        stats = COLLECTOR.get()
+        if stats is not None:
+            stats.counters["intersection.tests"] += 1
+
         a, h, discriminant = self._compute_discriminant(ray)
 
         if discriminant < 0:
@@ -40,11 +92,76 @@ class Sphere(Hittable):
         if not t:
             return None
 
+        if stats is not None:
+            stats.counters["intersection.hits"] += 1
+        return t, None
+
+    def surface_info(self, ray: Ray, t: float, part: Any = None) -> Record:
         return self._compute_record(ray, t)
 
+    def bounding_box(self) -> AABB:
+        center = np.asarray(self.center, dtype=float)
+        extent = np.full(3, abs(self.radius), dtype=float)
+        return AABB(center - extent, center + extent)
+
+    def sample_direction(
+        self, origin: Point, u: float, v: float
+    ) -> Optional[tuple[Vec3, float, float]]:
+        """Sample a direction from origin uniformly within the cone towards the sphere.
+
+        Args:
+            origin: the point to light, outside of the sphere.
+            u, v: uniform numbers in [0, 1).
+
+        Returns:
+            The unit direction, the distance to the sphere along it and the
+            density of the direction per solid angle, None if origin is inside.
+        """
+        axis = self._center - origin
+        distance_sq = axis.dot(axis)
+        sin_max_sq = self.radius * self.radius / distance_sq
+        if sin_max_sq >= 1.0:
+            return None
+        cos_max = math.sqrt(1.0 - sin_max_sq)
+        # 1 - cos_max without cancellation for far away spheres
+        one_minus_cos_max = sin_max_sq / (1.0 + cos_max)
+
+        cos_theta = 1.0 - u * one_minus_cos_max
+        sin_theta = math.sqrt(max(0.0, 1.0 - cos_theta * cos_theta))
+        phi = 2.0 * math.pi * v
+        distance = math.sqrt(distance_sq)
+        direction = local_to_world(
+            sin_theta * math.cos(phi),
+            sin_theta * math.sin(phi),
+            cos_theta,
+            axis / distance,
+        )
+
+        # the near intersection of the unit direction, a = 1
+        h = distance * cos_theta
+        t = h - math.sqrt(max(0.0, h * h - (distance_sq - self.radius * self.radius)))
+        return direction, t, 1.0 / (2.0 * math.pi * one_minus_cos_max)
+
+    def light_pdf(self, origin: Point, point: Point) -> float:
+        """Density of sample_direction from origin for the direction to point.
+
+        Returns:
+            The density per solid angle, 0 if point is not on the sphere.
+        """
+        radius_sq = self.radius * self.radius
+        offset = point - self._center
+        if abs(offset.dot(offset) - radius_sq) > 1e-6 * radius_sq:
+            return 0.0
+        axis = self._center - origin
+        sin_max_sq = radius_sq / axis.dot(axis)
+        if sin_max_sq >= 1.0:
+            return 0.0
+        cos_max = math.sqrt(1.0 - sin_max_sq)
+        return (1.0 + cos_max) / (2.0 * math.pi * sin_max_sq)
+
     def _compute_record(self, ray, t):
         p = ray.at(t)
-        outward_normal = (p - self.center) / self.radius
+        outward_normal = (p - self._center) / self.radius
         front_facing = is_front_facing(ray, outward_normal)
         return Record(
             point=p,
@@ -59,16 +176,16 @@ class Sphere(Hittable):
     ) -> Optional[float]:
         root = (h - np.sqrt(discriminant)) / a
         if not t_min <= root <= t_max:
-            root = (h - np.sqrt(discriminant)) / a
+            root = (h + np.sqrt(discriminant)) / a
             if not t_min <= root <= t_max:
                 return None
 
         return root
 
     def _compute_discriminant(self, ray):
-        oc = self.center - ray.orig
-        a = np.linalg.norm(ray.direction) ** 2
-        h = np.dot(ray.direction, oc)
-        c = np.linalg.norm(oc) ** 2 - self.radius**2
+        oc = self._center - ray.orig
+        a = ray.direction.dot(ray.direction)
+        h = oc.dot(ray.direction)
+        c = oc.dot(oc) - self.radius**2
         discriminant = h * h - a * c
         return a, h, discriminant
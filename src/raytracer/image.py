@@ -0,0 +1,141 @@
+"""Writers for framebuffers of linear float colors.
+
+Every writer builds the complete file in memory and emits it with a single write.
+Images too large for that, or to be read while they are rendered, are written
+block by block through the sinks of raytracer.sinks.
+"""
+
+import os
+import struct
+import zlib
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Callable, TextIO
+
+import numpy as np
+
+from raytracer.color import to_bytes
+
+
+class ImageFormat(str, Enum):
+    P3 = "p3"
+    P6 = "p6"
+    PNG = "png"
+    PFM = "pfm"
+
+    @property
+    def binary(self) -> bool:
+        return self is not ImageFormat.P3
+
+    @classmethod
+    def from_path(cls, path: Path) -> "ImageFormat":
+        """Binary format of a file by its suffix, ppm files are written as P6."""
+        suffixes = {".ppm": cls.P6, ".png": cls.PNG, ".pfm": cls.PFM}
+        try:
+            return suffixes[Path(path).suffix.lower()]
+        except KeyError:
+            raise ValueError(f"No image format for {path=}.") from None
+
+
+def ppm_p3_header(height: int, width: int) -> str:
+    return f"P3\n{width} {height}\n255\n"
+
+
+def ppm_p3_body(data: np.ndarray) -> str:
+    """The pixels of quantized data as lines of an ASCII ppm."""
+    pixels = data.reshape(-1, 3).tolist()
+    return "".join([f"{r} {g} {b}\n" for r, g, b in pixels])
+
+
+def write_ppm_p3(out: TextIO, framebuffer: np.ndarray) -> None:
+    """Write an ASCII ppm, compatible with output_ppm."""
+    height, width, _ = framebuffer.shape
+    out.write(ppm_p3_header(height, width) + ppm_p3_body(to_bytes(framebuffer)))
+
+
+def ppm_p6_header(height: int, width: int) -> bytes:
+    return b"P6\n%d %d\n255\n" % (width, height)
+
+
+def write_ppm_p6(out: BinaryIO, framebuffer: np.ndarray) -> None:
+    """Write a binary ppm."""
+    height, width, _ = framebuffer.shape
+    out.write(ppm_p6_header(height, width) + to_bytes(framebuffer).tobytes())
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    crc = zlib.crc32(data, zlib.crc32(kind))
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+
+def png_header(height: int, width: int) -> bytes:
+    """The signature and IHDR chunk of an 8 bit RGB png."""
+    # width, height, bit depth 8, color type 2 (RGB), compression, filter, interlace
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", header)
+
+
+def png_scanlines(data: np.ndarray) -> bytes:
+    """The unfiltered scanlines of the rows of quantized data."""
+    height = len(data)
+    # every scanline starts with its filter type, 0 for none
+    scanlines = np.zeros((height, 1 + 3 * data.shape[1]), dtype=np.uint8)
+    scanlines[:, 1:] = data.reshape(height, -1)
+    return scanlines.tobytes()
+
+
+def write_png(out: BinaryIO, framebuffer: np.ndarray) -> None:
+    """Write an 8 bit RGB png without filtering."""
+    height, width, _ = framebuffer.shape
+    out.write(
+        png_header(height, width)
+        + png_chunk(b"IDAT", zlib.compress(png_scanlines(to_bytes(framebuffer))))
+        + png_chunk(b"IEND", b"")
+    )
+
+
+def pfm_header(height: int, width: int) -> bytes:
+    return b"PF\n%d %d\n-1.0\n" % (width, height)
+
+
+def write_pfm(out: BinaryIO, framebuffer: np.ndarray) -> None:
+    """Write the linear colors unclamped as a portable float map.
+
+    PFM stores little endian float32 scanlines from the bottom to the top.
+    """
+    height, width, _ = framebuffer.shape
+    data = np.ascontiguousarray(framebuffer[::-1], dtype="<f4")
+    out.write(pfm_header(height, width) + data.tobytes())
+
+
+WRITERS: dict[ImageFormat, Callable[[TextIO | BinaryIO, np.ndarray], None]] = {
+    ImageFormat.P3: write_ppm_p3,
+    ImageFormat.P6: write_ppm_p6,
+    ImageFormat.PNG: write_png,
+    ImageFormat.PFM: write_pfm,
+}
+
+
+def write_image(
+    out: TextIO | BinaryIO, framebuffer: np.ndarray, image_format: ImageFormat
+) -> None:
+    """Write a framebuffer in the given format, out must be binary unless it is P3."""
+    WRITERS[ImageFormat(image_format)](out, framebuffer)
+
+
+def save_image(
+    path: Path, framebuffer: np.ndarray, image_format: ImageFormat | None = None
+) -> None:
+    """Replace the image at path atomically, readers never see a partial file.
+
+    Args:
+        path: the file to write.
+        framebuffer: the linear colors.
+        image_format: format of the file, derived from the suffix of path if None.
+    """
+    image_format = ImageFormat(image_format or ImageFormat.from_path(path))
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb" if image_format.binary else "w") as out:
+        write_image(out, framebuffer, image_format)
+    os.replace(tmp, path)
@@ -0,0 +1,141 @@
+"""Instances of a shared hittable placed in the world by an affine transform.
+
+An instance transforms every ray into the object space of its child, lets the
+child find the hit with its own acceleration structure, e.g., the BVH of a mesh,
+and transforms the record back. Many instances of one mesh thus share a single
+copy of its triangles and tree.
+
+As the transform is affine, a point at distance t along the object space ray is
+the point at distance t along the world space ray, so distances, t_min and t_max
+need no conversion.
+"""
+
+import math
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from raytracer.definitions.aabb import AABB
+from raytracer.definitions.hit_record import Record
+from raytracer.definitions.material import Material
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.hitable import Hit, Hittable
+
+
+def translation(offset: Sequence[float]) -> np.ndarray:
+    """4x4 matrix moving points by offset."""
+    matrix = np.eye(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+
+def scaling(factors: float | Sequence[float]) -> np.ndarray:
+    """4x4 matrix scaling points by a factor per axis or one for all axes."""
+    return np.diag([*np.broadcast_to(np.asarray(factors, dtype=float), 3), 1.0])
+
+
+def rotation(axis: Sequence[float], degrees: float) -> np.ndarray:
+    """4x4 matrix rotating points counterclockwise about axis through the origin."""
+    x, y, z = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    angle = math.radians(degrees)
+    c, s = math.cos(angle), math.sin(angle)
+    # Rodrigues' rotation formula
+    cross = np.array([[0.0, -z, y], [z, 0.0, -x], [-y, x, 0.0]])
+    matrix = np.eye(4)
+    matrix[:3, :3] = (
+        c * np.eye(3) + s * cross + (1 - c) * np.outer([x, y, z], [x, y, z])
+    )
+    return matrix
+
+
+class Instance(Hittable):
+    """A hittable placed in the world by an affine transform.
+
+    Attributes:
+        child: the shared hittable in object space.
+        transform: (4, 4) matrix from object to world space.
+        material: material of all hits, the child's material if None.
+    """
+
+    def __init__(
+        self,
+        child: Hittable,
+        transform: np.ndarray,
+        material: Material | None = None,
+    ):
+        transform = np.asarray(transform, dtype=float)
+        if transform.shape == (3, 4):
+            transform = np.vstack([transform, [0.0, 0.0, 0.0, 1.0]])
+        if transform.shape != (4, 4) or np.any(transform[3] != [0, 0, 0, 1]):
+            raise ValueError(f"{transform=} is not an affine transform.")
+        linear = transform[:3, :3]
+        if abs(np.linalg.det(linear)) < 1e-12:
+            raise ValueError(f"{transform=} can not be inverted.")
+
+        self.child = child
+        self.transform = transform
+        self.material = material
+        inverse = np.linalg.inv(linear)
+        # plain float rows of the matrices for the per-ray math
+        self._inverse = [tuple(row) for row in inverse.tolist()]
+        self._offset = tuple(transform[:3, 3].tolist())
+        # normals transform with the inverse transpose
+        self._normal = [tuple(row) for row in inverse.T.tolist()]
+
+    def _object_ray(self, ray: Ray) -> Ray:
+        ox, oy, oz = ray.orig
+        px, py, pz = self._offset
+        ox, oy, oz = ox - px, oy - py, oz - pz
+        dx, dy, dz = ray.direction
+        (a, b, c), (d, e, f), (g, h, i) = self._inverse
+        return Ray(
+            Vec3(
+                a * ox + b * oy + c * oz,
+                d * ox + e * oy + f * oz,
+                g * ox + h * oy + i * oz,
+            ),
+            Vec3(
+                a * dx + b * dy + c * dz,
+                d * dx + e * dy + f * dz,
+                g * dx + h * dy + i * dz,
+            ),
+        )
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """The hit of the child with the ray in object space."""
+        return self.child.intersect(self._object_ray(ray), t_min, t_max)
+
+    def surface_info(self, ray: Ray, t: float, part: Any) -> Record:
+        record = self.child.surface_info(self._object_ray(ray), t, part)
+        nx, ny, nz = record.normal
+        (a, b, c), (d, e, f), (g, h, i) = self._normal
+        normal = Vec3(
+            a * nx + b * ny + c * nz, d * nx + e * ny + f * nz, g * nx + h * ny + i * nz
+        )
+        # the sign of the dot product of the ray with the normal is kept, so is
+        # front_facing
+        return Record(
+            point=ray.at(record.distance),
+            normal=normal.unit(),
+            distance=record.distance,
+            front_facing=record.front_facing,
+            material=self.material or record.material,
+        )
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        return self.child.occluded(self._object_ray(ray), t_min, t_max)
+
+    def bounding_box(self) -> AABB:
+        """Bounds of the transformed corners of the child's bounding box."""
+        box = self.child.bounding_box()
+        corners = np.array(
+            [
+                [x, y, z]
+                for x in (box.minimum[0], box.maximum[0])
+                for y in (box.minimum[1], box.maximum[1])
+                for z in (box.minimum[2], box.maximum[2])
+            ]
+        )
+        corners = corners @ self.transform[:3, :3].T + self.transform[:3, 3]
+        return AABB(corners.min(axis=0), corners.max(axis=0))
@@ -20,18 +20,23 @@ References:
     - https://pip.pypa.io/en/stable/reference/pip_install
 """
 
+import json
 import logging
 import sys
-from typing import Final
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Final, Optional
 
 import typer
 
 
-from raytracer.definitions.material import Dialetric, Lambertian, Metal
-from raytracer.definitions.vector import Color, Point, Vector
+from raytracer import adaptive, benchmarks, distributed, scenefile, scenes
 from raytracer.definitions.world import World
-from raytracer.hitable import Sphere
+from raytracer.image import ImageFormat, write_image
 from raytracer.raytracer import RayTracer
+from raytracer.sinks import BufferSink, MemmapSink, Sink, StreamSink
 
 _logger = logging.getLogger(__name__)
 
@@ -45,57 +50,326 @@ IMAGE_W: Final = 200
 app = typer.Typer()
 
 
-@app.command()
-def main(aspect_ratio: float = 16 / 9, image_width: int = 200):
+def _load_scene(
+    scene: Optional[Path],
+) -> tuple[Optional[scenefile.SceneFile], World, dict]:
+    """The scene file at scene, its world and camera, or the four spheres."""
+    if scene is not None:
+        loaded = scenefile.load(scene)
+        return loaded, loaded.world, loaded.camera
+    return None, scenes.four_spheres(), {}
+
+
+def _open_output(output_path: Optional[Path], image_format: ImageFormat):
+    """The file to write the image to, stdout if output_path is None."""
+    if output_path is not None:
+        return open(output_path, "wb" if image_format.binary else "w")
+    return nullcontext(sys.stdout.buffer if image_format.binary else sys.stdout)
+
+
+@contextmanager
+def _output_sink(
+    output_path: Optional[Path], image_format: ImageFormat, height: int, width: int
+) -> Iterator[Sink]:
+    """The sink writing the image to output_path, stdout if output_path is None.
+
+    P6 and PFM files are written in place and all other formats but PFM are
+    streamed as tiles complete, so the image does not have to fit in memory. Only
+    a PFM written to stdout is kept in memory until it is complete.
+    """
+    if output_path is not None and image_format in MemmapSink.FORMATS:
+        with MemmapSink(output_path, height, width, image_format) as sink:
+            yield sink
+        return
+    with _open_output(output_path, image_format) as out:
+        if image_format in StreamSink.FORMATS:
+            with StreamSink(out, height, width, image_format) as sink:
+                yield sink
+        else:
+            with BufferSink(height, width) as sink:
+                yield sink
+            write_image(out, sink.framebuffer, image_format)
+
+
+@app.command("render")
+def main(
+    scene: Optional[Path] = typer.Argument(None),
+    aspect_ratio: Optional[float] = None,
+    image_width: Optional[int] = None,
+    samples_per_pixel: int = 50,
+    wavefront: bool = False,
+    seed: Optional[int] = None,
+    bvh: bool = False,
+    workers: int = 1,
+    backend: str = "process",
+    tile_size: int = 16,
+    russian_roulette_depth: Optional[int] = None,
+    image_format: ImageFormat = typer.Option(ImageFormat.P3, "--format"),
+    output_path: Optional[Path] = typer.Option(None, "--output", "-o"),
+    stats_path: Optional[Path] = typer.Option(None, "--stats"),
+    checkpoint: Optional[Path] = None,
+    samples_per_pass: Optional[int] = None,
+    preview: Optional[Path] = None,
+    adaptive_tolerance: Optional[float] = None,
+    min_samples_per_pixel: int = 8,
+    spp_map: Optional[Path] = None,
+    sampler: str = "random",
+    light_sampling: bool = True,
+    primary_fast_path: bool = True,
+):
     """Docstring.
 
     Args:
-        aspect_ratio: Aspect ratio of the resulting image.
+        scene: Scene file (.rts) to render, the four spheres of the book if not
+            given. See raytracer.scenefile.
+        aspect_ratio: Aspect ratio of the resulting image, 16/9 unless given by
+            the scene file.
+        image_width: Width of the resulting image, 200 unless given by the scene
+            file.
+        samples_per_pixel: Number of rays per pixel.
+        wavefront: Trace rays in batches of NumPy arrays.
+        seed: Seed for the random number generators, fixes the image.
+        bvh: Accelerate hit queries with a bounding volume hierarchy.
+        workers: Number of workers rendering tiles, 0 uses all cores.
+        backend: Workers are "process"es or "thread"s sharing the scene.
+        tile_size: Edge length of the tiles handed out to the workers.
+        russian_roulette_depth: Bounces after which paths are randomly terminated.
+        image_format: File format of the image.
+        output_path: File to write the image to, stdout if not given. P6 and PFM
+            files are written in place as tiles complete, P3, P6 and png
+            streams row by row.
+        stats_path: Collect render statistics and write them as JSON to this file.
+        checkpoint: Render in passes and accumulate the samples in this .npy
+            file, resuming it if it exists.
+        samples_per_pass: Samples per pixel of every pass of a checkpointed render.
+        preview: Image updated after every pass of a checkpointed render.
+        adaptive_tolerance: Sample pixels until their gamma corrected error is
+            below this, e.g. 0.02. Uses samples_per_pixel as maximum.
+        min_samples_per_pixel: Minimum samples per pixel of adaptive sampling.
+        spp_map: Image (or .npy file) of the samples every pixel used.
+        sampler: Sampler of the scalar path: random, stratified, halton or sobol.
+        light_sampling: Sample lights directly at diffuse bounces.
+        primary_fast_path: Intersect camera rays with precomputed terms and skip
+            spheres outside the view.
     """
     logging.basicConfig(level=logging.INFO)
 
-    world = (
-        World()
-        # center object
-        .add(
-            Sphere(
-                Point(Vector([0, 0, -1])),
-                0.5,
-                Lambertian(Color(Vector([0.8, 0.8, 0.0]))),
-            )
-        )
-        # gronud surface
-        .add(
-            Sphere(
-                Point(Vector([0, -100.5, -1])),
-                100,
-                Lambertian(Color(Vector([0.1, 0.2, 0.5]))),
-            )
-        )
-        # left object
-        .add(
-            Sphere(
-                Point(Vector([-1, 0, -1])),
-                0.5,
-                Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5),
-            )
-        )
-        # right object
-        .add(
-            Sphere(
-                Point(Vector([1, 0, -1])),
-                0.5,
-                Metal(Color(Vector([0.8, 0.6, 0.2])), fuzz=1.0),
-            )
+    loaded, world, camera = _load_scene(scene)
+    aspect_ratio = aspect_ratio or camera.get("aspect_ratio", ASPECT_RATIO)
+    image_width = image_width or camera.get("image_width", IMAGE_W)
+
+    # Image properties
+    tracer = RayTracer(
+        aspect_ratio,
+        image_width,
+        samples_per_pixel=samples_per_pixel,
+        wavefront=wavefront,
+        seed=seed,
+        bvh=bvh,
+        workers=workers,
+        backend=backend,
+        tile_size=tile_size,
+        russian_roulette_depth=russian_roulette_depth,
+        collect_stats=stats_path is not None,
+        checkpoint=checkpoint,
+        samples_per_pass=samples_per_pass,
+        preview=preview,
+        adaptive_tolerance=adaptive_tolerance,
+        min_samples_per_pixel=min_samples_per_pixel,
+        sampler=sampler,
+        light_sampling=light_sampling,
+        primary_fast_path=primary_fast_path,
+        record_spp_map=spp_map is not None,
+    )
+    start = time.perf_counter()
+    with _output_sink(
+        output_path, image_format, tracer.image_height, tracer.image_width
+    ) as sink:
+        tracer.render_into(world, sink)
+    render_time = time.perf_counter() - start
+    if loaded is not None:
+        _logger.info(
+            f"Loaded the scene in {loaded.load_time:.3f}s, "
+            f"rendered it in {render_time:.3f}s"
         )
+
+    if stats_path is not None:
+        if loaded is not None:
+            tracer.stats.seconds["load"] += loaded.load_time
+        stats_path.write_text(tracer.stats.to_json())
+    if spp_map is not None:
+        adaptive.save_spp_map(spp_map, tracer.spp_map)
+
+    _logger.info("Done.")
+
+
+@app.command()
+def bench(
+    scene: Optional[list[str]] = None,
+    mode: Optional[list[str]] = None,
+    image_width: int = 64,
+    samples_per_pixel: int = 8,
+    seed: int = 0,
+    workers: Optional[list[int]] = None,
+    backend: Optional[list[str]] = None,
+    micro_number: int = 10_000,
+    output_path: Optional[Path] = typer.Option(None, "--output", "-o"),
+):
+    """Run the benchmarks and write a JSON report.
+
+    Args:
+        scene: Scenes to render, may be repeated. All scenes if not given.
+        mode: Render modes (scalar, bvh, wavefront), may be repeated.
+        image_width: Width of the rendered images.
+        samples_per_pixel: Camera rays per pixel of the rendered images.
+        seed: Seed of all renders.
+        workers: Number of workers rendering tiles, 0 uses all cores. May be
+            repeated, e.g. 1, 2, 4 and 8 for a scaling curve. 1 if not given.
+        backend: Workers (process, thread), may be repeated. process if not
+            given.
+        micro_number: Calls per micro-benchmark, 0 skips them.
+        output_path: File to write the report to, stdout if not given.
+    """
+    logging.basicConfig(level=logging.WARNING)
+
+    report = benchmarks.run(
+        micro_number=micro_number,
+        scene_names=scene or None,
+        modes=mode or None,
+        image_width=image_width,
+        samples_per_pixel=samples_per_pixel,
+        seed=seed,
+        workers=workers or None,
+        backends=backend or None,
     )
+    output = (
+        open(output_path, "w") if output_path is not None else nullcontext(sys.stdout)
+    )
+    with output as out:
+        json.dump(report, out, indent=2)
+        out.write("\n")
 
-    output = sys.stdout
 
-    # Image properties
-    RayTracer(aspect_ratio, image_width).render(world, output)
+@app.command()
+def export(
+    scene: str,
+    path: Path,
+    aspect_ratio: float = ASPECT_RATIO,
+    image_width: int = IMAGE_W,
+):
+    """Write one of the built-in scenes to a scene file.
 
-    _logger.info("Done.")
+    Args:
+        scene: Name of the scene in raytracer.scenes.SCENES.
+        path: The .rts file to write, render it with ``raytracer render PATH``.
+        aspect_ratio: Aspect ratio of images of the scene.
+        image_width: Width of images of the scene.
+    """
+    if scene not in scenes.SCENES:
+        raise typer.BadParameter(f"Expected one of {list(scenes.SCENES)}.")
+    scenefile.save(
+        path,
+        scenes.SCENES[scene](),
+        {"aspect_ratio": aspect_ratio, "image_width": image_width},
+    )
+
+
+@app.command()
+def coordinator(
+    scene: Optional[Path] = typer.Argument(None),
+    host: str = "127.0.0.1",
+    port: int = distributed.PORT,
+    timeout: float = distributed.TIMEOUT,
+    aspect_ratio: Optional[float] = None,
+    image_width: Optional[int] = None,
+    samples_per_pixel: int = 50,
+    samples_per_pass: Optional[int] = None,
+    wavefront: bool = False,
+    seed: Optional[int] = None,
+    bvh: bool = False,
+    tile_size: int = 16,
+    russian_roulette_depth: Optional[int] = None,
+    sampler: str = "random",
+    light_sampling: bool = True,
+    primary_fast_path: bool = True,
+    image_format: ImageFormat = typer.Option(ImageFormat.P3, "--format"),
+    output_path: Optional[Path] = typer.Option(None, "--output", "-o"),
+    stats_path: Optional[Path] = typer.Option(None, "--stats"),
+):
+    """Render a scene on workers started with ``raytracer worker HOST:PORT``.
+
+    Args:
+        scene: Scene file (.rts) to render, the four spheres of the book if not
+            given.
+        host: Address to listen on, e.g. 0.0.0.0 for workers on other machines.
+        port: Port to listen on.
+        timeout: Seconds after which the tile of a silent worker is handed out
+            again.
+        aspect_ratio: Aspect ratio of the resulting image, 16/9 unless given by
+            the scene file.
+        image_width: Width of the resulting image, 200 unless given by the scene
+            file.
+        samples_per_pixel: Number of rays per pixel.
+        samples_per_pass: Hand out the samples of every tile in passes of this
+            many samples per pixel, all samples at once if not given.
+        wavefront: Trace rays in batches of NumPy arrays.
+        seed: Seed for the random number generators, fixes the image.
+        bvh: Accelerate hit queries with a bounding volume hierarchy.
+        tile_size: Edge length of the tiles handed out to the workers.
+        russian_roulette_depth: Bounces after which paths are randomly terminated.
+        sampler: Sampler of the scalar path: random, stratified, halton or sobol.
+        light_sampling: Sample lights directly at diffuse bounces.
+        primary_fast_path: Intersect camera rays with precomputed terms and skip
+            spheres outside the view.
+        image_format: File format of the image.
+        output_path: File to write the image to, stdout if not given.
+        stats_path: Collect render statistics and write them as JSON to this file.
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    _, world, camera = _load_scene(scene)
+    settings = {
+        "aspect_ratio": aspect_ratio or camera.get("aspect_ratio", ASPECT_RATIO),
+        "image_width": image_width or camera.get("image_width", IMAGE_W),
+        "samples_per_pixel": samples_per_pixel,
+        "samples_per_pass": samples_per_pass,
+        "wavefront": wavefront,
+        "seed": seed,
+        "bvh": bvh,
+        "tile_size": tile_size,
+        "russian_roulette_depth": russian_roulette_depth,
+        "collect_stats": stats_path is not None,
+        "sampler": sampler,
+        "light_sampling": light_sampling,
+        "primary_fast_path": primary_fast_path,
+    }
+    server = distributed.Coordinator(world, settings, (host, port), timeout)
+
+    start = time.perf_counter()
+    with _output_sink(
+        output_path, image_format, server.tracer.image_height, server.tracer.image_width
+    ) as sink:
+        server.render(sink)
+    _logger.info(f"Rendered in {time.perf_counter() - start:.3f}s")
+    if stats_path is not None:
+        stats_path.write_text(server.tracer.stats.to_json())
+
+
+@app.command()
+def worker(
+    address: str = typer.Argument(f"127.0.0.1:{distributed.PORT}"),
+    connect_timeout: float = distributed.CONNECT_TIMEOUT,
+):
+    """Render tiles for a coordinator until its image is done.
+
+    Args:
+        address: HOST:PORT of the coordinator.
+        connect_timeout: Seconds to keep trying to reach the coordinator.
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    host, _, port = address.rpartition(":")
+    distributed.work((host, int(port)), connect_timeout)
 
 
 def cli():
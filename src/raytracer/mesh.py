@@ -0,0 +1,331 @@
+"""Triangle meshes intersected with a vectorized Möller–Trumbore kernel.
+
+A mesh keeps its vertices and the vertex indices of its triangles in contiguous
+arrays and carries its own bounding volume hierarchy over the triangles, built
+in Morton order by ``bvh.build_linear`` to handle millions of triangles. The
+triangles are stored in the order of the leaves of the tree, so the triangles of
+every leaf are a contiguous slice of the arrays.
+
+A ray first walks the tree with plain python floats, collecting the leaves it
+passes through, and then intersects all triangles of these leaves with a single
+call of the NumPy kernel. Meshes are shaded flat with the normals of their
+triangles.
+"""
+
+import dataclasses
+import logging
+import math
+import time
+from typing import ClassVar, Optional
+
+import numpy as np
+
+from raytracer import bvh
+from raytracer.definitions.aabb import AABB
+from raytracer.definitions.hit_record import Record
+from raytracer.definitions.material import DefaultMaterial, Material
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.hitable import Hit, Hittable
+from raytracer.stats import COLLECTOR, closer_hits
+
+_logger = logging.getLogger(__name__)
+
+# triangles per leaf, the kernel tests a few triangles about as fast as one
+MAX_LEAF_SIZE = 8
+# determinants below this are rays parallel to the triangle
+EPSILON = 1e-12
+
+
+def intersect_triangles(
+    v0: np.ndarray,
+    e1: np.ndarray,
+    e2: np.ndarray,
+    origin: np.ndarray,
+    direction: np.ndarray,
+    t_min: float,
+    t_max: float,
+) -> np.ndarray:
+    """Möller–Trumbore intersection of a single ray with a batch of triangles.
+
+    Args:
+        v0: (n, 3) first vertex of every triangle.
+        e1: (n, 3) edge from the first to the second vertex.
+        e2: (n, 3) edge from the first to the third vertex.
+        origin: (3,) origin of the ray.
+        direction: (3,) direction of the ray.
+        t_min: minimum distance of a hit.
+        t_max: maximum distance of a hit.
+
+    Returns:
+        (n,) distance of the hit with every triangle, inf if it misses.
+    """
+    dx, dy, dz = direction
+    # pvec = direction x e2
+    px = dy * e2[:, 2] - dz * e2[:, 1]
+    py = dz * e2[:, 0] - dx * e2[:, 2]
+    pz = dx * e2[:, 1] - dy * e2[:, 0]
+    det = e1[:, 0] * px + e1[:, 1] * py + e1[:, 2] * pz
+
+    tvec = origin - v0
+    # qvec = tvec x e1
+    qx = tvec[:, 1] * e1[:, 2] - tvec[:, 2] * e1[:, 1]
+    qy = tvec[:, 2] * e1[:, 0] - tvec[:, 0] * e1[:, 2]
+    qz = tvec[:, 0] * e1[:, 1] - tvec[:, 1] * e1[:, 0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = 1.0 / det
+        u = (tvec[:, 0] * px + tvec[:, 1] * py + tvec[:, 2] * pz) * inv
+        v = (dx * qx + dy * qy + dz * qz) * inv
+        t = (e2[:, 0] * qx + e2[:, 1] * qy + e2[:, 2] * qz) * inv
+
+    valid = (
+        (np.abs(det) > EPSILON)
+        & (u >= 0.0)
+        & (v >= 0.0)
+        & (u + v <= 1.0)
+        & (t >= t_min)
+        & (t <= t_max)
+    )
+    return np.where(valid, t, np.inf)
+
+
+class TriangleMesh(Hittable):
+    """A mesh of triangles with a single material.
+
+    Attributes:
+        vertices: (V, 3) position of every vertex.
+        indices: (T, 3) vertex indices of every triangle, in the order of the
+            leaves of nodes.
+        material: material of all triangles.
+        nodes: the flattened BVH over the triangles.
+        build_time: seconds it took to build the tree.
+    """
+
+    # the arrays of a built mesh, see arrays and from_arrays
+    ARRAYS: ClassVar[tuple[str, ...]] = (
+        "vertices",
+        "indices",
+        "v0",
+        "e1",
+        "e2",
+        "normals",
+        *(f"nodes.{field.name}" for field in dataclasses.fields(bvh.BVHNodes)),
+    )
+
+    def __init__(
+        self,
+        vertices: np.ndarray,
+        indices: np.ndarray,
+        material: Material | None = None,
+        max_leaf_size: int = MAX_LEAF_SIZE,
+    ):
+        start = time.perf_counter()
+        vertices = np.ascontiguousarray(vertices, dtype=float).reshape(-1, 3)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(vertices)):
+            raise ValueError("Triangle indices must refer to the given vertices.")
+
+        corners = vertices[indices]
+        nodes = bvh.build_linear(
+            corners.min(axis=1), corners.max(axis=1), max_leaf_size
+        )
+        corners = corners[nodes.order]
+        e1 = np.ascontiguousarray(corners[:, 1] - corners[:, 0])
+        e2 = np.ascontiguousarray(corners[:, 2] - corners[:, 0])
+        normals = np.cross(e1, e2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        self._adopt(
+            vertices,
+            np.ascontiguousarray(indices[nodes.order]),
+            material,
+            nodes,
+            np.ascontiguousarray(corners[:, 0]),
+            e1,
+            e2,
+            normals,
+        )
+
+        self.build_time = time.perf_counter() - start
+        _logger.info(
+            f"Mesh with {len(self.indices)} triangles, {len(self.nodes)} BVH nodes, "
+            f"built in {self.build_time:.3f}s"
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, arrays: dict[str, np.ndarray], material: Material | None = None
+    ) -> "TriangleMesh":
+        """Adopt the arrays of a built mesh without building it again.
+
+        The arrays, e.g., memory-mapped from a scene file, are used as they are.
+        Only the plain python copies of the tree for the traversal are created.
+
+        Args:
+            arrays: every array of ARRAYS, as returned by arrays.
+            material: material of all triangles.
+        """
+        mesh = cls.__new__(cls)
+        nodes = bvh.BVHNodes(
+            **{
+                field.name: arrays[f"nodes.{field.name}"]
+                for field in dataclasses.fields(bvh.BVHNodes)
+            }
+        )
+        mesh._adopt(
+            arrays["vertices"],
+            arrays["indices"],
+            material,
+            nodes,
+            arrays["v0"],
+            arrays["e1"],
+            arrays["e2"],
+            arrays["normals"],
+        )
+        mesh.build_time = 0.0
+        return mesh
+
+    def _adopt(
+        self,
+        vertices: np.ndarray,
+        indices: np.ndarray,
+        material: Material | None,
+        nodes: bvh.BVHNodes,
+        v0: np.ndarray,
+        e1: np.ndarray,
+        e2: np.ndarray,
+        normals: np.ndarray,
+    ) -> None:
+        self.vertices = vertices
+        self.indices = indices
+        self.material = material or DefaultMaterial()
+        self.nodes = nodes
+        self._v0, self._e1, self._e2, self._normals = v0, e1, e2, normals
+
+        # traversal runs on plain python floats, see BVH
+        self._lower = [tuple(b) for b in nodes.lower.tolist()]
+        self._upper = [tuple(b) for b in nodes.upper.tolist()]
+        self._second = nodes.second_child.tolist()
+        self._leaves = [
+            (s, s + c) if c else None
+            for s, c in zip(nodes.start.tolist(), nodes.count.tolist())
+        ]
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """The arrays of the built mesh by name, see ARRAYS."""
+        arrays = {
+            "vertices": self.vertices,
+            "indices": self.indices,
+            "v0": self._v0,
+            "e1": self._e1,
+            "e2": self._e2,
+            "normals": self._normals,
+        }
+        for field in dataclasses.fields(bvh.BVHNodes):
+            arrays[f"nodes.{field.name}"] = getattr(self.nodes, field.name)
+        return arrays
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the mesh and its tree."""
+        return (
+            self.vertices.nbytes
+            + self.indices.nbytes
+            + 4 * self._v0.nbytes
+            + self.nodes.nbytes
+        )
+
+    def bounding_box(self) -> AABB:
+        if not len(self):
+            raise ValueError("An empty mesh has no bounding box.")
+        return AABB(self.nodes.lower[0], self.nodes.upper[0])
+
+    def _candidates(self, ray: Ray, t_min: float, t_max: float) -> np.ndarray:
+        """Indices of the triangles in all leaves whose bounds the ray passes."""
+        ox, oy, oz = ray.orig.tolist()
+        inv = [1.0 / d if d else math.copysign(1e300, d) for d in ray.direction]
+        ix, iy, iz = inv
+
+        ranges = []
+        stack = [0]
+        visited = 0
+        while stack:
+            node = stack.pop()
+            visited += 1
+
+            (lx, ly, lz), (ux, uy, uz) = self._lower[node], self._upper[node]
+            t0, t1 = (lx - ox) * ix, (ux - ox) * ix
+            near, far = (t0, t1) if t0 < t1 else (t1, t0)
+            t0, t1 = (ly - oy) * iy, (uy - oy) * iy
+            if t0 > t1:
+                t0, t1 = t1, t0
+            near, far = max(near, t0), min(far, t1)
+            t0, t1 = (lz - oz) * iz, (uz - oz) * iz
+            if t0 > t1:
+                t0, t1 = t1, t0
+            near, far = max(near, t0, t_min), min(far, t1, t_max)
+            if near > far:
+                continue
+
+            leaf = self._leaves[node]
+            if leaf is not None:
+                ranges.append(np.arange(*leaf))
+            else:
+                stack.append(self._second[node])
+                stack.append(node + 1)
+
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["bvh.nodes"] += visited
+        if not ranges:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(ranges)
+
+    def _intersect(
+        self, ray: Ray, t_min: float, t_max: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """The candidate triangles of ray and their hit distances."""
+        if not len(self):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        candidates = self._candidates(ray, t_min, t_max)
+        t = intersect_triangles(
+            self._v0[candidates],
+            self._e1[candidates],
+            self._e2[candidates],
+            np.asarray(ray.orig.tolist()),
+            np.asarray(ray.direction.tolist()),
+            t_min,
+            t_max,
+        )
+        if (stats := COLLECTOR.get()) is not None:
+            stats.counters["intersection.tests"] += len(candidates)
+            stats.counters["intersection.hits"] += closer_hits(t)
+        return candidates, t
+
+    def intersect(self, ray: Ray, t_min: float, t_max: float) -> Optional[Hit]:
+        """Distance of the closest hit and the index of the triangle hit."""
+        candidates, t = self._intersect(ray, t_min, t_max)
+        if not len(t):
+            return None
+        closest = int(np.argmin(t))
+        if t[closest] == np.inf:
+            return None
+        return float(t[closest]), int(candidates[closest])
+
+    def surface_info(self, ray: Ray, t: float, triangle: int) -> Record:
+        normal = Vec3(*self._normals[triangle].tolist())
+        front_facing = ray.direction.dot(normal) < 0
+        return Record(
+            point=ray.at(t),
+            normal=normal if front_facing else -normal,
+            distance=t,
+            front_facing=front_facing,
+            material=self.material,
+        )
+
+    def occluded(self, ray: Ray, t_min: float, t_max: float) -> bool:
+        _, t = self._intersect(ray, t_min, t_max)
+        return bool((t < np.inf).any())
@@ -0,0 +1,124 @@
+"""Streaming loader of Wavefront OBJ meshes.
+
+The file is read in chunks of bytes. The vertex and face lines of every chunk are
+joined and parsed into arrays by NumPy at once, so no python object is built per
+vertex or triangle. Only the positions (``v``) and faces (``f``) are read; texture
+coordinates, normals, groups and materials are ignored. Polygons are split into
+fans of triangles and negative indices count back from the last vertex read.
+"""
+
+import logging
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from raytracer.definitions.material import Material
+from raytracer.mesh import TriangleMesh
+
+_logger = logging.getLogger(__name__)
+
+# bytes read per chunk
+CHUNK_SIZE = 1 << 24
+
+# the texture coordinate and normal indices of a face vertex, e.g. "/2/3" in "1/2/3"
+_ATTRIBUTES = re.compile(rb"/\S*")
+
+
+def _parse_faces(lines: list[bytes], bases: list[int]) -> np.ndarray:
+    """Split the polygons of face lines into (n, 3) zero-based vertex indices.
+
+    Args:
+        lines: face lines without their "f " prefix.
+        bases: number of vertices read before every line.
+    """
+    text = _ATTRIBUTES.sub(b"", b"\n".join(lines))
+    indices = np.fromstring(text, dtype=np.int64, sep=" ")
+    if len(indices) == 3 * len(lines):
+        counts = np.full(len(lines), 3)
+    else:
+        counts = np.array([len(line.split()) for line in lines])
+        if counts.sum() != len(indices) or counts.min() < 3:
+            raise ValueError("Malformed face in OBJ file.")
+
+    bases = np.repeat(np.asarray(bases, dtype=np.int64), counts)
+    indices = np.where(indices < 0, indices + bases, indices - 1)
+
+    if (counts == 3).all():
+        return indices.reshape(-1, 3)
+    # fan triangulation: polygon (a, b, c, d, ...) becomes (a, b, c), (a, c, d), ...
+    fans = counts - 2
+    first = np.repeat(np.cumsum(counts) - counts, fans)
+    corner = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans)
+    return np.stack(
+        [indices[first], indices[first + corner + 1], indices[first + corner + 2]],
+        axis=1,
+    )
+
+
+def read_obj(path: Path, chunk_size: int = CHUNK_SIZE) -> tuple[np.ndarray, np.ndarray]:
+    """Read the vertices and triangles of an OBJ file.
+
+    Returns:
+        The (V, 3) vertex positions and (T, 3) zero-based vertex indices of
+        every triangle.
+    """
+    vertices: list[np.ndarray] = []
+    triangles: list[np.ndarray] = []
+    n_vertices = 0
+    rest = b""
+
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            data = rest + chunk
+            if chunk:
+                end = data.rfind(b"\n") + 1
+                data, rest = data[:end], data[end:]
+
+            vertex_lines: list[bytes] = []
+            face_lines: list[bytes] = []
+            bases: list[int] = []
+            for line in data.splitlines():
+                if line.startswith(b"v "):
+                    vertex_lines.append(line[2:])
+                elif line.startswith(b"f "):
+                    face_lines.append(line[2:])
+                    bases.append(n_vertices + len(vertex_lines))
+
+            if vertex_lines:
+                # "v x y z [w]", the optional weight is dropped
+                positions = np.fromstring(b"\n".join(vertex_lines), sep=" ")
+                if len(positions) != 3 * len(vertex_lines):
+                    positions = np.array(
+                        [line.split()[:3] for line in vertex_lines], dtype=float
+                    )
+                vertices.append(positions.reshape(-1, 3))
+                n_vertices += len(vertex_lines)
+            if face_lines:
+                triangles.append(_parse_faces(face_lines, bases))
+
+            if not chunk:
+                break
+
+    vertices_array = np.concatenate(vertices) if vertices else np.empty((0, 3))
+    indices = (
+        np.concatenate(triangles) if triangles else np.empty((0, 3), dtype=np.int64)
+    )
+    if len(indices) and (indices.min() < 0 or indices.max() >= len(vertices_array)):
+        raise ValueError(f"Face of {path} refers to a missing vertex.")
+    return vertices_array, indices
+
+
+def load_obj(
+    path: Path, material: Material | None = None, chunk_size: int = CHUNK_SIZE
+) -> TriangleMesh:
+    """Load the triangles of an OBJ file into a mesh with a single material."""
+    start = time.perf_counter()
+    vertices, indices = read_obj(path, chunk_size)
+    _logger.info(
+        f"Read {len(vertices)} vertices and {len(indices)} triangles from {path} "
+        f"in {time.perf_counter() - start:.3f}s"
+    )
+    return TriangleMesh(vertices, indices, material)
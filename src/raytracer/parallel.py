@@ -0,0 +1,197 @@
+"""Render an image as independent tiles, optionally on a pool of workers.
+
+Tiles are small compared to the image and are handed out one at a time, so a
+worker which finishes a cheap tile of sky immediately picks up the next one while
+others are still busy with glass and metal. Every tile seeds its own random
+number generator from the render seed and the tile index, hence the image does
+not depend on which worker rendered which tile.
+
+Workers are processes or threads. Processes receive a copy of the tracer and
+the scene, its arrays through shared memory, see raytracer.shared. Threads
+share both with the main thread and scale where the NumPy kernels of the
+wavefront path release the GIL, without the startup and memory of processes.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterator
+
+import numpy as np
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from raytracer import shared
+from raytracer.stats import RenderStats, timer
+
+if TYPE_CHECKING:
+    from raytracer.raytracer import RayTracer
+    from raytracer.sinks import Sink
+
+_logger = logging.getLogger(__name__)
+
+TILE_SIZE = 16
+# pools of workers rendering tiles
+BACKENDS = ("process", "thread")
+
+
+@dataclass(frozen=True)
+class Tile:
+    """A rectangular block of pixels.
+
+    Attributes:
+        index: position of the tile in the list of tiles of the image.
+        rows: the rows of the image covered by the tile.
+        cols: the columns of the image covered by the tile.
+        first_sample: number of samples per pixel rendered by earlier passes.
+            Together with the index it seeds the random numbers of the tile.
+        samples: samples per pixel to render, None for the tracer's
+            samples_per_pixel.
+    """
+
+    index: int
+    rows: range
+    cols: range
+    first_sample: int = 0
+    samples: int | None = None
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.rows), len(self.cols)
+
+    @property
+    def slices(self) -> tuple[slice, slice]:
+        """Index of the tile in a (height, width, ...) framebuffer."""
+        return (
+            slice(self.rows.start, self.rows.stop),
+            slice(self.cols.start, self.cols.stop),
+        )
+
+
+@dataclass
+class TileResult:
+    """Output of rendering a tile.
+
+    Attributes:
+        tile: the rendered tile.
+        pixels: (rows, cols, 3) colors of the tile's pixels.
+        samples: (rows, cols) number of samples of every pixel.
+        path_lengths: histogram of the number of bounces of all traced paths.
+        stats: counters and timings of the tile, None if stats are disabled.
+    """
+
+    tile: Tile
+    pixels: np.ndarray
+    samples: np.ndarray
+    path_lengths: np.ndarray
+    stats: RenderStats | None = None
+
+
+def split_tiles(height: int, width: int, tile_size: int = TILE_SIZE) -> list[Tile]:
+    """Split an image into tiles of at most tile_size x tile_size pixels in row order."""
+    return [
+        Tile(
+            index,
+            range(r, min(r + tile_size, height)),
+            range(c, min(c + tile_size, width)),
+        )
+        for index, (r, c) in enumerate(
+            (r, c)
+            for r in range(0, height, tile_size)
+            for c in range(0, width, tile_size)
+        )
+    ]
+
+
+def resolve_workers(workers: int | None) -> int:
+    """Number of worker processes to use, all cores for None or 0."""
+    return workers or os.cpu_count() or 1
+
+
+# the tracer and scene of a worker process, shipped once when the worker starts
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(tracer: RayTracer, scene: shared.SharedScene) -> None:
+    # the block stays attached for the lifetime of the worker
+    _worker["memory"], scene = scene.attach()
+    _worker["tracer"] = tracer
+    _worker["scene"] = scene
+
+
+def _render_tile(tile: Tile) -> TileResult:
+    return _worker["tracer"].render_tile(_worker["scene"], tile)
+
+
+def render_tiles(
+    tracer: RayTracer,
+    scene: Any,
+    tiles: list[Tile],
+    workers: int = 1,
+    backend: str = "process",
+) -> Iterator[TileResult]:
+    """Render tiles of an initialized tracer, yielding results as they complete.
+
+    Every tile result is also passed to RayTracer.collect to gather statistics.
+
+    Args:
+        tracer: the initialized tracer, see RayTracer.render_tile.
+        scene: the scene passed to RayTracer.render_tile.
+        tiles: the tiles to render.
+        workers: number of workers, 1 renders in this thread.
+        backend: the kind of workers, one of BACKENDS.
+    """
+    with logging_redirect_tqdm(), tqdm(total=len(tiles), unit="tile") as progress:
+        if workers == 1:
+            for tile in tiles:
+                result = tracer.render_tile(scene, tile)
+                tracer.collect(result)
+                progress.update()
+                yield result
+            return
+
+        _logger.info(f"Rendering {len(tiles)} tiles on {workers} {backend} workers.")
+        with contextlib.ExitStack() as stack:
+            if backend == "thread":
+                # built once up front instead of by every thread at its first tile
+                tracer.primary_view(scene)
+                pool = stack.enter_context(ThreadPoolExecutor(workers))
+                futures = (
+                    pool.submit(tracer.render_tile, scene, tile) for tile in tiles
+                )
+            else:
+                shipped = stack.enter_context(shared.share(scene))
+                pool = stack.enter_context(
+                    ProcessPoolExecutor(
+                        workers, initializer=_init_worker, initargs=(tracer, shipped)
+                    )
+                )
+                futures = (pool.submit(_render_tile, tile) for tile in tiles)
+            # as_completed drops the futures it yielded, and with them the pixels
+            # of every tile, so only the tiles not yet passed on are kept
+            for future in as_completed(futures):
+                result = future.result()
+                tracer.collect(result)
+                progress.update()
+                yield result
+
+
+def render(
+    tracer: RayTracer,
+    scene: Any,
+    tiles: list[Tile],
+    sink: Sink,
+    workers: int = 1,
+    backend: str = "process",
+) -> None:
+    """Render all tiles of an initialized tracer into sink as they complete.
+
+    See render_tiles for the other arguments.
+    """
+    for result in render_tiles(tracer, scene, tiles, workers, backend):
+        with timer("output"):
+            sink.write(result.tile.rows.start, result.tile.cols.start, result.pixels)
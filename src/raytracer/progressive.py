@@ -0,0 +1,189 @@
+"""Progressive rendering in passes, checkpointed to a memory-mapped file.
+
+The samples of every pixel are summed in a ``.npy`` file next to the number of
+samples of the pixel. Every pass adds at most ``samples_per_pass`` samples per
+pixel to all tiles which have fewer than ``samples_per_pixel``. Tiles are added
+to the file as soon as they are rendered, so a render that gets killed resumes
+with the tiles it had not finished, and raising ``samples_per_pixel`` of a
+finished render only renders the additional passes.
+
+The random numbers of a tile are seeded by the render seed, the tile index and
+the number of samples it already has. A resumed render is therefore identical
+to one which ran without interruption.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from raytracer import parallel
+from raytracer.image import save_image
+from raytracer.sinks import Sink
+from raytracer.stats import timer
+
+if TYPE_CHECKING:
+    from raytracer.raytracer import RayTracer
+
+_logger = logging.getLogger(__name__)
+
+
+class Accumulator:
+    """Sum and number of the samples of every pixel, mapped from a .npy file.
+
+    The seed the samples were rendered with is kept in a json file next to it.
+
+    Attributes:
+        path: the .npy file.
+        buffer: (height, width, 4) map of the summed colors followed by the
+            number of samples of every pixel.
+        entropy: entropy of the seed of the samples.
+    """
+
+    def __init__(self, path: Path, buffer: np.ndarray, entropy: int):
+        self.path = path
+        self.buffer = buffer
+        self.entropy = entropy
+
+    @staticmethod
+    def metadata_path(path: Path) -> Path:
+        return path.with_name(path.name + ".json")
+
+    @classmethod
+    def open(
+        cls, path: Path, height: int, width: int, entropy: int | None = None
+    ) -> Accumulator:
+        """Open the checkpoint at path, create an empty one if it does not exist.
+
+        Args:
+            path: the .npy file.
+            height: height of the image.
+            width: width of the image.
+            entropy: entropy of the render seed, None resumes with the seed of
+                the checkpoint or picks a random one for a new checkpoint.
+
+        Raises:
+            ValueError: if the checkpoint does not match the image or the seed.
+        """
+        path = Path(path)
+        metadata_path = cls.metadata_path(path)
+
+        if not path.exists():
+            if entropy is None:
+                entropy = np.random.SeedSequence().entropy
+            metadata_path.write_text(json.dumps({"entropy": entropy}))
+            buffer = np.lib.format.open_memmap(
+                path, mode="w+", dtype=np.float64, shape=(height, width, 4)
+            )
+            return cls(path, buffer, entropy)
+
+        if not metadata_path.exists():
+            raise ValueError(f"Checkpoint {path} has no metadata {metadata_path}.")
+        stored = json.loads(metadata_path.read_text())["entropy"]
+        if entropy is not None and entropy != stored:
+            raise ValueError(f"Checkpoint {path} was rendered with another seed.")
+
+        buffer = np.lib.format.open_memmap(path, mode="r+")
+        if buffer.shape != (height, width, 4):
+            raise ValueError(
+                f"Checkpoint {path} has shape {buffer.shape[:2]}, "
+                f"expected {(height, width)}."
+            )
+        return cls(path, buffer, stored)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """(height, width) number of samples of every pixel."""
+        return self.buffer[..., 3]
+
+    def add(self, result: parallel.TileResult) -> None:
+        """Add the samples of a rendered tile."""
+        block = self.buffer[result.tile.slices]
+        block[..., :3] += result.pixels * result.samples[..., None]
+        block[..., 3] += result.samples
+
+    def image(self, rows: slice = slice(None)) -> np.ndarray:
+        """(height, width, 3) mean color of every pixel, black without samples.
+
+        Args:
+            rows: the rows to compute, all by default.
+        """
+        counts = self.counts[rows, :, None]
+        return np.divide(
+            self.buffer[rows, :, :3],
+            counts,
+            out=np.zeros(counts.shape[:2] + (3,)),
+            where=counts > 0,
+        )
+
+    def flush(self) -> None:
+        self.buffer.flush()
+
+
+def pending_tiles(
+    accumulator: Accumulator,
+    tiles: list[parallel.Tile],
+    samples_per_pixel: int,
+    samples_per_pass: int,
+) -> list[parallel.Tile]:
+    """The next pass of every tile with fewer than samples_per_pixel samples."""
+    pending = []
+    for tile in tiles:
+        first = int(accumulator.counts[tile.slices].min())
+        if first < samples_per_pixel:
+            samples = min(samples_per_pass, samples_per_pixel - first)
+            pending.append(
+                dataclasses.replace(tile, first_sample=first, samples=samples)
+            )
+    return pending
+
+
+def render(tracer: RayTracer, scene: Any, sink: Sink) -> None:
+    """Render progressively into tracer.checkpoint, see the module documentation.
+
+    Sets the entropy of the initialized tracer to the one of the checkpoint. Once
+    every pass is done, the mean colors of the checkpoint are written into sink a
+    band of tiles at a time.
+    """
+    accumulator = Accumulator.open(
+        tracer.checkpoint,
+        tracer.image_height,
+        tracer.image_width,
+        tracer.entropy if tracer.seed is not None else None,
+    )
+    tracer.entropy = accumulator.entropy
+    samples_per_pass = tracer.samples_per_pass or tracer.samples_per_pixel
+    tiles = parallel.split_tiles(
+        tracer.image_height, tracer.image_width, tracer.tile_size
+    )
+
+    while pending := pending_tiles(
+        accumulator, tiles, tracer.samples_per_pixel, samples_per_pass
+    ):
+        first = min(tile.first_sample for tile in pending)
+        _logger.info(
+            f"Pass from {first} samples per pixel over {len(pending)} tiles "
+            f"into {accumulator.path}."
+        )
+        for result in parallel.render_tiles(
+            tracer, scene, pending, tracer.workers, tracer.backend
+        ):
+            accumulator.add(result)
+        accumulator.flush()
+
+        if tracer.preview is not None:
+            save_image(tracer.preview, accumulator.image())
+
+    # the samples of all passes, also of those of earlier runs
+    tracer.samples = int(accumulator.counts.sum())
+    if tracer.spp_map is not None:
+        tracer.spp_map[...] = accumulator.counts
+    for top in range(0, tracer.image_height, tracer.tile_size):
+        rows = slice(top, top + tracer.tile_size)
+        with timer("output"):
+            sink.write(top, 0, accumulator.image(rows))
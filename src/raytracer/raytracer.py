@@ -2,19 +2,31 @@ import io
 import logging
 import math
 import random
-from typing import Callable
-
-from tqdm import trange
-from tqdm.contrib.logging import logging_redirect_tqdm
+from pathlib import Path
+from typing import BinaryIO, Callable, TextIO
 
+import numpy as np
+from raytracer import adaptive, parallel, progressive, sampling, wavefront
+from raytracer.bvh import BVH
 from raytracer.color import write_color
 from raytracer.definitions.camera import Camera
-from raytracer.definitions.vector import Color, Point, Vector, unit_vector
+from raytracer.definitions.hit_record import Record
+from raytracer.definitions.material import Material, random_2d, random_uniform
+from raytracer.definitions.vec3 import Vec3
+from raytracer.definitions.vector import Color, Point, unit_vector
 from raytracer.definitions.ray import Ray
-from raytracer.definitions.world import World
+from raytracer.definitions.world import FrozenWorld, PrimaryView, World
+from raytracer.image import ImageFormat, write_image
+from raytracer.sampling import Sampler
+from raytracer.sinks import BufferSink, Sink, StreamSink
+from raytracer.stats import COLLECTOR, RenderStats, activate, timer
 
 _logger = logging.getLogger(__name__)
 
+# glass hits of a camera path at which both the refracted and the reflected ray
+# are traced instead of choosing one, see Material.split
+FRESNEL_SPLITS = 2
+
 
 def output_ppm(
     output: io.StringIO, height: int, width: int, func: Callable[[int, int], Color]
@@ -29,13 +41,12 @@ def output_ppm(
     output.write(f"{width} {height}\n")
     output.write("255\n")
 
-    with logging_redirect_tqdm():
-        for r in trange(height):
-            for c in range(width):
-                color = func(c, r)
-                _logger.debug(f"{c=} {r=}: {color=}")
+    for r in range(height):
+        for c in range(width):
+            color = func(c, r)
+            _logger.debug(f"{c=} {r=}: {color=}")
 
-                write_color(output, color)
+            write_color(output, color)
 
 
 class RayTracer:
@@ -45,6 +56,23 @@ class RayTracer:
         image_width: int,
         samples_per_pixel: int = 50,
         max_recursion_depth: int = 20,
+        wavefront: bool = False,
+        seed: int | None = None,
+        bvh: bool = False,
+        workers: int = 1,
+        backend: str = "process",
+        tile_size: int = parallel.TILE_SIZE,
+        russian_roulette_depth: int | None = None,
+        collect_stats: bool = False,
+        checkpoint: Path | None = None,
+        samples_per_pass: int | None = None,
+        preview: Path | None = None,
+        adaptive_tolerance: float | None = None,
+        min_samples_per_pixel: int = 8,
+        sampler: str = "random",
+        light_sampling: bool = True,
+        primary_fast_path: bool = True,
+        record_spp_map: bool = False,
     ):
         """Compute a image with given aspect ratio and image_width.
 
@@ -53,23 +81,101 @@ class RayTracer:
             image_width: width of the computed image
             samples_per_pixel: Number of rays to compute per pixel.
             max_recursion_depth: Maximum number of refections considered for diffuse materials.
+            wavefront: Trace all samples of a block of pixels together as arrays
+                instead of one ray at a time.
+            seed: Seed of the random number generators. Renders with the same seed
+                are identical, independent of the number of workers.
+            bvh: Find the hits of single rays through a bounding volume hierarchy
+                instead of testing every sphere. Worlds with meshes or
+                instances always use one.
+            workers: Number of workers rendering tiles, 0 uses all cores.
+            backend: Render tiles on a pool of "process"es or of "thread"s, which
+                share the scene, see raytracer.parallel.
+            tile_size: Edge length in pixels of the square tiles handed to workers.
+            russian_roulette_depth: Number of bounces after which paths are
+                terminated randomly depending on their throughput. None traces
+                every path until it leaves the scene or max_recursion_depth.
+            collect_stats: Count rays, intersection tests and scatters and time
+                the stages of every render, see raytracer.stats.
+            checkpoint: Render progressively in passes and accumulate the
+                samples in this .npy file. An existing checkpoint is resumed,
+                see raytracer.progressive.
+            samples_per_pass: Samples per pixel added by every progressive pass,
+                None renders all samples in one pass.
+            preview: Image file updated after every progressive pass.
+            adaptive_tolerance: Stop sampling a pixel once the 95% confidence
+                interval of its gamma corrected luminance is narrower than this,
+                see raytracer.adaptive. None always takes samples_per_pixel.
+            min_samples_per_pixel: Samples of every pixel and of every round of
+                adaptive sampling.
+            sampler: Name of the sampler of the scalar path in
+                raytracer.sampling.SAMPLERS, e.g. "sobol" for low-discrepancy
+                samples. The wavefront path always samples randomly.
+            light_sampling: Sample the lights of the world directly at every
+                diffuse bounce, combined with the scattered rays by multiple
+                importance sampling. The wavefront path only scatters.
+            primary_fast_path: Intersect camera rays with terms precomputed for the
+                camera center and skip spheres outside the view frustum, see
+                PrimaryView. Only applies to scenes without a BVH.
+            record_spp_map: Keep the number of samples of every pixel in
+                spp_map, which is always kept with adaptive sampling.
         """
         self.aspect_ratio = aspect_ratio
         self.image_width = image_width
         self.image_height = int(self.image_width / self.aspect_ratio)
         self.samples_per_pixel = samples_per_pixel
         self.max_recursion_depth = max_recursion_depth
+        self.wavefront = wavefront
+        self.seed = seed
+        self.bvh = bvh
+        self.workers = parallel.resolve_workers(workers)
+        self.backend = backend
+        self.tile_size = tile_size
+        self.russian_roulette_depth = russian_roulette_depth
+        self.collect_stats = collect_stats
+        self.checkpoint = checkpoint
+        self.samples_per_pass = samples_per_pass
+        self.preview = preview
+        self.adaptive_tolerance = adaptive_tolerance
+        self.min_samples_per_pixel = min_samples_per_pixel
+        self.sampler = sampler
+        self.light_sampling = light_sampling
+        self.primary_fast_path = primary_fast_path
+        self.record_spp_map = record_spp_map
+        # the PrimaryView of the last scene, built once per process
+        self._primary_view: PrimaryView | None = None
+        # number of samples of every pixel of the last render, None unless
+        # recorded, and of all pixels
+        self.spp_map: np.ndarray | None = None
+        self.samples = 0
+        # counters and timings of the last render, None if not collected
+        self.stats: RenderStats | None = None
+        # number of paths per number of bounces of the last render
+        self.path_lengths = np.zeros(max_recursion_depth + 1, dtype=np.int64)
 
         assert self.image_height >= 1
+        if adaptive_tolerance is not None and checkpoint is not None:
+            raise ValueError("Adaptive sampling can not render progressively.")
+        if sampler not in sampling.SAMPLERS:
+            raise ValueError(
+                f"Unknown {sampler=}, expected one of {list(sampling.SAMPLERS)}."
+            )
+        if backend not in parallel.BACKENDS:
+            raise ValueError(
+                f"Unknown {backend=}, expected one of {list(parallel.BACKENDS)}."
+            )
+        if wavefront and sampler != "random":
+            raise ValueError("The wavefront path only samples randomly.")
 
     def initialize(self):
+        self._primary_view = None
         # Camera
         viewport_height = 2.0
         camera = Camera(
             focal_length=1.0,
             viewport_height=viewport_height,
             viewport_width=viewport_height * self.image_width / self.image_height,
-            center=Point(Vector([0, 0, 0])),
+            center=Point(Vec3(0.0, 0.0, 0.0)),
         )
         _logger.debug(f"{camera=}")
 
@@ -85,25 +191,247 @@ class RayTracer:
         _logger.debug(f"{camera.viewport_upper_left=}, {pixel_00_loc=}")
 
         self.camera = camera
-        self.pixel_00_loc = pixel_00_loc
-        self.pixel_delta_u = pixel_delta_u
-        self.pixel_delta_v = pixel_delta_v
+        self.pixel_00_loc = Vec3(*map(float, pixel_00_loc))
+        self.pixel_delta_u = Vec3.from_vector(pixel_delta_u)
+        self.pixel_delta_v = Vec3.from_vector(pixel_delta_v)
+
+        # fixed for the whole render, so every worker derives the same tile seeds
+        self.entropy = np.random.SeedSequence(self.seed).entropy
+
+        self.path_lengths = np.zeros(self.max_recursion_depth + 1, dtype=np.int64)
+        self.stats = RenderStats() if self.collect_stats else None
+        self.samples = 0
+        self.spp_map = (
+            np.zeros((self.image_height, self.image_width), dtype=np.int64)
+            if self.record_spp_map or self.adaptive_tolerance is not None
+            else None
+        )
+
+    def render(
+        self,
+        world: World,
+        output: TextIO | BinaryIO,
+        image_format: ImageFormat = ImageFormat.P3,
+    ):
+        """Render the world and write the image to output.
+
+        Formats which can be streamed are written row by row while the image is
+        rendered, see StreamSink.
+
+        Args:
+            world: the scene to render.
+            output: text stream for P3, binary stream for all other formats.
+            image_format: file format of the image.
+        """
+        if image_format in StreamSink.FORMATS:
+            with StreamSink(
+                output, self.image_height, self.image_width, image_format
+            ) as sink:
+                self.render_into(world, sink)
+            return
+
+        framebuffer = self.render_framebuffer(world)
+        with activate(self.stats), timer("output"):
+            write_image(output, framebuffer, image_format)
 
-    def render(self, world: World, output: io.StringIO):
+    def render_framebuffer(self, world: World) -> np.ndarray:
+        """Render the world into a (height, width, 3) array of linear colors."""
+        sink = BufferSink(self.image_height, self.image_width)
+        self.render_into(world, sink)
+        return sink.framebuffer
+
+    def render_into(self, world: World, sink: Sink) -> None:
+        """Render the world, passing every tile to sink as soon as it completes.
+
+        The sink is not closed.
+        """
         self.initialize()
 
-        def compute_color(i, j):
-            color = sum(
-                ray_color(self.sample_ray(i, j), world, depth=self.max_recursion_depth)
-                for _ in range(self.samples_per_pixel)
+        with activate(self.stats):
+            with timer("scene"):
+                scene = self.build_scene(world)
+
+            with timer("render"):
+                if self.checkpoint is not None:
+                    progressive.render(self, scene, sink)
+                else:
+                    parallel.render(
+                        self,
+                        scene,
+                        parallel.split_tiles(
+                            self.image_height, self.image_width, self.tile_size
+                        ),
+                        sink,
+                        self.workers,
+                        self.backend,
+                    )
+
+        _logger.info(f"Path lengths: {dict(enumerate(self.path_lengths.tolist()))}")
+        _logger.info(
+            "Mean samples per pixel: "
+            f"{self.samples / (self.image_height * self.image_width):.2f}"
+        )
+        if self.stats is not None:
+            _logger.info(f"Render stats: {self.stats.to_json()}")
+
+    def build_scene(self, world: World) -> FrozenWorld | BVH:
+        """Pack the world into the scene tiles are rendered against."""
+        if self.wavefront or (not self.bvh and world.freezable):
+            return world.freeze()
+        # meshes and instances can not be frozen and are found through the tree
+        return BVH.from_world(world)
+
+    def primary_view(self, scene: FrozenWorld | BVH) -> PrimaryView | None:
+        """The view of the camera rays on scene, None without the fast path."""
+        if not self.primary_fast_path or not isinstance(scene, FrozenWorld):
+            return None
+        if self._primary_view is None or self._primary_view.scene is not scene:
+            upper_left = np.asarray(self.camera.viewport_upper_left, dtype=float)
+            u = np.asarray(self.camera.viewport_u, dtype=float)
+            v = np.asarray(self.camera.viewport_v, dtype=float)
+            self._primary_view = PrimaryView(
+                scene,
+                np.asarray(self.camera.center, dtype=float),
+                [upper_left, upper_left + u, upper_left + u + v, upper_left + v],
             )
-            return color / self.samples_per_pixel
+            _logger.debug(
+                f"{len(self._primary_view)} of {len(scene)} spheres are in view"
+            )
+        return self._primary_view
+
+    def render_tile(
+        self, scene: FrozenWorld | BVH, tile: parallel.Tile
+    ) -> parallel.TileResult:
+        """Render the pixels of a tile.
+
+        The random numbers of a tile only depend on the seed, the tile's index and
+        the samples rendered by earlier passes.
+        """
+        rng = np.random.default_rng(
+            np.random.SeedSequence(
+                self.entropy, spawn_key=(tile.index, tile.first_sample)
+            )
+        )
+        samples = tile.samples or self.samples_per_pixel
+        path_lengths = np.zeros(self.max_recursion_depth + 1, dtype=np.int64)
+        stats = RenderStats() if self.collect_stats else None
+
+        with activate(stats), timer("tiles"):
+            if self.adaptive_tolerance is not None:
+                pixels, counts = adaptive.render_tile(
+                    self._draw_samples(scene, rng, path_lengths),
+                    tile.rows,
+                    tile.cols,
+                    self.min_samples_per_pixel,
+                    samples,
+                    self.adaptive_tolerance,
+                )
+                return parallel.TileResult(tile, pixels, counts, path_lengths, stats)
+            if self.wavefront:
+                pixels = wavefront.render_tile(
+                    self, scene, tile.rows, tile.cols, rng, path_lengths, samples
+                )
+            else:
+                sampler = sampling.SAMPLERS[self.sampler](rng)
+                pixels = np.empty((*tile.shape, 3))
+                for r, j in enumerate(tile.rows):
+                    for c, i in enumerate(tile.cols):
+                        pixels[r, c] = self.pixel_color(
+                            scene, i, j, path_lengths, samples, sampler
+                        )
 
-        output_ppm(output, self.image_height, self.image_width, compute_color)
+        counts = np.full(tile.shape, samples, dtype=np.int64)
+        return parallel.TileResult(tile, pixels, counts, path_lengths, stats)
 
-    def sample_ray(self, i, j):
+    def _draw_samples(
+        self,
+        scene: FrozenWorld | BVH,
+        rng: np.random.Generator,
+        path_lengths: np.ndarray,
+    ) -> adaptive.DrawSamples:
+        """Draw the samples of adaptive sampling with the wavefront or scalar path."""
+        if self.wavefront:
+
+            def sample(i, j, n):
+                colors = wavefront.sample_pixels(
+                    self, scene, i, j, n, rng, path_lengths
+                )
+                luminance = colors @ adaptive.LUMINANCE
+                return colors.sum(axis=1), (luminance * luminance).sum(axis=1)
+
+            return sample
+
+        luminance = Vec3(*adaptive.LUMINANCE.tolist())
+        sampler = sampling.SAMPLERS[self.sampler](rng)
+        primary = self.primary_view(scene)
+
+        def sample(i, j, n):
+            sums = np.empty((len(i), 3))
+            luminance_sq = np.empty(len(i))
+            for k, (x, y) in enumerate(zip(i.tolist(), j.tolist())):
+                total, total_sq = Vec3(0.0, 0.0, 0.0), 0.0
+                sampler.start_pixel(x, y, n)
+                for s in range(n):
+                    sampler.start_sample(s)
+                    color = ray_color(
+                        self.sample_ray(x, y, sampler),
+                        scene,
+                        depth=self.max_recursion_depth,
+                        russian_roulette_depth=self.russian_roulette_depth,
+                        light_sampling=self.light_sampling,
+                        path_lengths=path_lengths,
+                        sampler=sampler,
+                        primary=primary,
+                    )
+                    total = total + color
+                    total_sq += color.dot(luminance) ** 2
+                sums[k] = total
+                luminance_sq[k] = total_sq
+            return sums, luminance_sq
+
+        return sample
+
+    def collect(self, result: parallel.TileResult) -> None:
+        """Gather the statistics of a rendered tile."""
+        self.path_lengths += result.path_lengths
+        self.samples += int(result.samples.sum())
+        if self.spp_map is not None:
+            self.spp_map[result.tile.slices] = result.samples
+        if self.stats is not None and result.stats is not None:
+            self.stats.merge(result.stats)
+
+    def pixel_color(
+        self,
+        scene: FrozenWorld | BVH,
+        i: int,
+        j: int,
+        path_lengths: np.ndarray | None = None,
+        samples_per_pixel: int | None = None,
+        sampler: Sampler | None = None,
+    ) -> Color:
+        samples_per_pixel = samples_per_pixel or self.samples_per_pixel
+        if sampler is not None:
+            sampler.start_pixel(i, j, samples_per_pixel)
+        primary = self.primary_view(scene)
+        color = Color(Vec3(0.0, 0.0, 0.0))
+        for s in range(samples_per_pixel):
+            if sampler is not None:
+                sampler.start_sample(s)
+            color = color + ray_color(
+                self.sample_ray(i, j, sampler),
+                scene,
+                depth=self.max_recursion_depth,
+                russian_roulette_depth=self.russian_roulette_depth,
+                light_sampling=self.light_sampling,
+                path_lengths=path_lengths,
+                sampler=sampler,
+                primary=primary,
+            )
+        return color / samples_per_pixel
+
+    def sample_ray(self, i, j, sampler: Sampler | None = None):
         """Sample a ray centered at i, j with a random offset in [-0.5, -0.5, 0] and [0.5, 0.5, 0]."""
-        offset = sample_square()
+        offset = sample_square() if sampler is None else sampler.square()
         pixel_center = (
             self.pixel_00_loc
             + ((i + offset.x) * self.pixel_delta_u)
@@ -115,29 +443,183 @@ class RayTracer:
         return Ray(ray_origin, ray_direction)
 
 
-WHITE = Color(Vector([1.0, 1.0, 1.0]))
-BLUE = Color(Vector([0.5, 0.7, 1.0]))
+WHITE = Color(Vec3(1.0, 1.0, 1.0))
+BLUE = Color(Vec3(0.5, 0.7, 1.0))
 
 
-def sample_square() -> Vector:
+def sample_square() -> Vec3:
     """Return a random vector to a point in the [-.5, -.5, 0] and [.5, .5, 0] unit square."""
-    return Vector([random.random() - 0.5, random.random() - 0.5, 0])
+    return Vec3(random.random() - 0.5, random.random() - 0.5, 0.0)
 
 
-def ray_color(ray: Ray, world: World, *, depth: int) -> Color:
-    if depth == 0:
-        return Color(Vector([0.0, 0.0, 0.0]))
+def ray_color(
+    ray: Ray,
+    world: World | FrozenWorld | BVH,
+    *,
+    depth: int,
+    russian_roulette_depth: int | None = None,
+    light_sampling: bool = True,
+    path_lengths: np.ndarray | None = None,
+    sampler: Sampler | None = None,
+    primary: PrimaryView | None = None,
+) -> Color:
+    """Follow a ray through the world for at most depth bounces.
 
-    # to account for floating point inaccuracies, we ignore small rays that hit its origin
-    if record := world.hit(ray, 0.0001, math.inf):
-        material = record.material
-        scattered = material.scatter(
-            ray, record.normal, record.point, record.front_facing
-        )
-        if scattered:
-            return material.attentuition * ray_color(scattered, world, depth=depth - 1)
-        else:
-            return Color(Vector([0.0, 0.0, 0.0]))
-    v = unit_vector(ray.direction)
-    a = 0.5 * (v.y + 1.0)
-    return (1.0 - a) * WHITE + a * BLUE
+    Light reaches the path from the sky, from lights it hits and, with light
+    sampling, from a light sampled at every diffuse bounce. A light can be both
+    hit by a scattered ray and sampled, the two estimates are weighted by the
+    power heuristic of multiple importance sampling. At the first FRESNEL_SPLITS
+    glass hits the path splits into the refracted and the reflected ray instead
+    of choosing one at random.
+
+    Args:
+        ray: the ray to trace.
+        world: the scene.
+        depth: maximum number of bounces.
+        russian_roulette_depth: number of bounces after which a path is terminated
+            with probability 1 - max(throughput); surviving paths are weighted up
+            so the estimate stays unbiased. None disables Russian roulette.
+        light_sampling: sample the lights of the world directly.
+        path_lengths: histogram indexed by the number of bounces, incremented
+            for the traced path.
+        sampler: source of random numbers, python's random module if None.
+        primary: finds the first hit of a camera ray instead of world.
+    """
+    color = Color(Vec3(0.0, 0.0, 0.0))
+    stats = COLLECTOR.get()
+    lights = world.lights if light_sampling else []
+    splits = FRESNEL_SPLITS
+    # the ray, throughput and bounces of the branches split off at glass, traced
+    # once the path ends
+    branches = [(ray, Color(Vec3(1.0, 1.0, 1.0)), 0)]
+    camera_path = True
+
+    while branches:
+        ray, throughput, bounces = branches.pop()
+        split_at = bounces
+        # density of the material sampling the current ray, None for camera rays
+        # and specular bounces, which light sampling can not produce
+        scatter_pdf = None
+        while bounces < depth:
+            if stats is not None:
+                stats.counters["rays.secondary" if bounces else "rays.primary"] += 1
+            # to account for floating point inaccuracies, we ignore small rays that
+            # hit its origin
+            if bounces == 0 and primary is not None:
+                hit = primary.intersect(ray, 0.0001, math.inf)
+                scene = primary.scene
+            else:
+                hit = world.intersect(ray, 0.0001, math.inf)
+                scene = world
+            if hit is None:
+                v = unit_vector(ray.direction)
+                a = 0.5 * (v.y + 1.0)
+                color = color + throughput * ((1.0 - a) * WHITE + a * BLUE)
+                break
+            # only the closest hit gets a record
+            record = scene.surface_info(ray, *hit)
+
+            bounces += 1
+            material = record.material
+            if material.emission is not None and record.front_facing:
+                weight = 1.0
+                if lights and scatter_pdf is not None:
+                    light_pdf = sum(
+                        light.light_pdf(ray.orig, record.point) for light in lights
+                    ) / len(lights)
+                    weight = power_heuristic(scatter_pdf, light_pdf)
+                color = color + throughput * material.emission * weight
+
+            split = (
+                material.split(ray, record.normal, record.point, record.front_facing)
+                if splits
+                else None
+            )
+            if split is not None:
+                splits -= 1
+                scattered, *others = split
+                branches.extend(
+                    (other.ray, throughput * other.weight, bounces) for other in others
+                )
+            else:
+                scattered = material.scatter(
+                    ray, record.normal, record.point, record.front_facing, sampler
+                )
+            if stats is not None:
+                event = "scatter" if scattered else "absorb"
+                stats.counters[f"{event}.{material.kind.name.lower()}"] += 1
+            if not scattered:
+                break
+
+            if lights and scattered.pdf is not None:
+                color = color + throughput * sample_light(
+                    world, lights, record, material, sampler
+                )
+            throughput = throughput * scattered.weight
+            scatter_pdf = scattered.pdf
+
+            if russian_roulette_depth is not None and bounces >= russian_roulette_depth:
+                survival = min(float(max(throughput)), 1.0)
+                if (
+                    random.random() if sampler is None else sampler.uniform()
+                ) >= survival:
+                    if stats is not None:
+                        stats.counters["roulette.terminated"] += 1
+                    break
+                throughput = throughput / survival
+
+            ray = scattered.ray
+
+        if camera_path:
+            if path_lengths is not None:
+                path_lengths[bounces] += 1
+            camera_path = False
+        elif stats is not None:
+            stats.counters["split.bounces"] += bounces - split_at
+    return color
+
+
+def power_heuristic(pdf: float, other_pdf: float) -> float:
+    """Weight of a sample of the strategy with pdf against the other strategy."""
+    pdf_sq = pdf * pdf
+    return pdf_sq / (pdf_sq + other_pdf * other_pdf)
+
+
+def sample_light(
+    world: World | FrozenWorld | BVH,
+    lights: list,
+    record: Record,
+    material: Material,
+    sampler: Sampler | None = None,
+) -> Color:
+    """Light reflected at the hit from a randomly chosen light, weighted for MIS.
+
+    Args:
+        world: the scene, which may block the light.
+        lights: the lights to choose from, with equal probability.
+        record: the hit on a material with a BRDF.
+        material: the material of the hit.
+        sampler: source of random numbers, python's random module if None.
+    """
+    black = Color(Vec3(0.0, 0.0, 0.0))
+    light = lights[min(int(random_uniform(sampler) * len(lights)), len(lights) - 1)]
+    sample = light.sample_direction(record.point, *random_2d(sampler))
+    if sample is None:
+        return black
+    direction, distance, pdf = sample
+    cos_theta = direction.dot(record.normal)
+    if cos_theta <= 0.0:
+        return black
+
+    if (stats := COLLECTOR.get()) is not None:
+        stats.counters["rays.shadow"] += 1
+    if world.occluded(Ray(record.point, direction), 0.0001, distance - 0.0001):
+        return black
+
+    light_pdf = pdf / len(lights)
+    weight = power_heuristic(light_pdf, material.pdf(record.normal, direction))
+    return (
+        light.material.emission
+        * material.brdf(record.normal, direction)
+        * (cos_theta * weight / light_pdf)
+    )
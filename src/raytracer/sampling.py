@@ -0,0 +1,397 @@
+"""Samplers providing the random numbers of the scalar path.
+
+A path consumes its numbers as a sequence of dimensions: the first 2D dimension
+jitters the camera ray within the pixel, every bounce then draws a 2D dimension
+to scatter and a 1D dimension for Russian roulette as needed. Samplers are
+told which pixel and which of its samples a path belongs to, so they can
+distribute the samples of a pixel evenly in every dimension:
+
+- ``random``: independent uniform numbers, see RandomSampler.
+- ``stratified``: a jittered sample in a distinct stratum per sample.
+- ``halton``: the Halton sequence, randomly shifted per pixel.
+- ``sobol``: Owen-scrambled Sobol points, padded from independently shuffled
+  2D sets as in Burley, "Practical Hash-based Owen Scrambling", JCGT 2020.
+
+The other samplers generate chunks of dimensions for all samples of a pixel at
+once with numpy, when they are first requested. Every tile gets its sampler
+on a Generator seeded from the render seed and the tile, hence tiles draw
+independent and reproducible streams, no matter which worker renders them.
+
+The mappings from uniform numbers to offsets and directions are shared with
+the wavefront renderer, which consumes the arrays directly.
+"""
+
+import abc
+import math
+from typing import Iterator
+
+import numpy as np
+
+from raytracer.definitions.vec3 import Vec3
+
+# numbers drawn per block and kind of sample
+BLOCK_SIZE = 4096
+
+
+def square_offsets(u: np.ndarray) -> np.ndarray:
+    """Map (n, 2) uniform numbers in [0, 1) to offsets in [-0.5, 0.5)^2."""
+    return u - 0.5
+
+
+def unit_vectors(u: np.ndarray) -> np.ndarray:
+    """Map (n, 2) uniform numbers in [0, 1) to uniformly distributed (n, 3) unit vectors.
+
+    By Archimedes' hat-box theorem, z is uniform in [-1, 1) on the unit sphere.
+    """
+    z = 2.0 * u[:, 0] - 1.0
+    phi = 2.0 * math.pi * u[:, 1]
+    r = np.sqrt(1.0 - z * z)
+    return np.stack([r * np.cos(phi), r * np.sin(phi), z], axis=1)
+
+
+def cosine_directions(u: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    """Map (n, 2) uniform numbers to (n, 3) cosine distributed directions.
+
+    The density of a direction around its unit normal is cos(theta) / pi. Points
+    are drawn uniformly on the unit disk and projected up onto the hemisphere
+    (Malley's method) in the orthonormal basis of Duff et al. 2017.
+    """
+    r = np.sqrt(u[:, 0])
+    phi = 2.0 * math.pi * u[:, 1]
+    x, y = r * np.cos(phi), r * np.sin(phi)
+    z = np.sqrt(np.maximum(0.0, 1.0 - u[:, 0]))
+    nx, ny, nz = normals.T
+    sign = np.where(nz >= 0.0, 1.0, -1.0)
+    a = -1.0 / (sign + nz)
+    b = nx * ny * a
+    tangent = np.stack([1.0 + sign * nx * nx * a, sign * b, -sign * nx], axis=1)
+    bitangent = np.stack([b, sign + ny * ny * a, -ny], axis=1)
+    return x[:, None] * tangent + y[:, None] * bitangent + z[:, None] * normals
+
+
+def cosine_direction(u: float, v: float, normal) -> tuple[Vec3, float]:
+    """Map two uniform numbers to a cosine distributed direction around normal.
+
+    The scalar counterpart of cosine_directions.
+
+    Returns:
+        The direction and the cosine between it and the unit normal.
+    """
+    r = math.sqrt(u)
+    phi = 2.0 * math.pi * v
+    z = math.sqrt(max(0.0, 1.0 - u))
+    return local_to_world(r * math.cos(phi), r * math.sin(phi), z, normal), z
+
+
+def local_to_world(x: float, y: float, z: float, normal) -> Vec3:
+    """Turn coordinates in the orthonormal basis around the unit normal into a Vec3.
+
+    The basis of Duff et al. 2017, "Building an Orthonormal Basis, Revisited".
+    """
+    nx, ny, nz = float(normal[0]), float(normal[1]), float(normal[2])
+    sign = 1.0 if nz >= 0.0 else -1.0
+    a = -1.0 / (sign + nz)
+    b = nx * ny * a
+    tx, ty, tz = 1.0 + sign * nx * nx * a, sign * b, -sign * nx
+    bx, by, bz = b, sign + ny * ny * a, -ny
+    return Vec3(
+        x * tx + y * bx + z * nx,
+        x * ty + y * by + z * ny,
+        x * tz + y * bz + z * nz,
+    )
+
+
+class Sampler(abc.ABC):
+    """Source of the random numbers of the scalar path."""
+
+    def start_pixel(self, i: int, j: int, count: int) -> None:
+        """Start drawing count samples of pixel (i, j)."""
+
+    def start_sample(self, index: int) -> None:
+        """Start drawing the dimensions of the index-th sample of the pixel."""
+
+    @abc.abstractmethod
+    def uniform(self) -> float:
+        """The next 1D dimension, in [0, 1)."""
+
+    @abc.abstractmethod
+    def uniform_2d(self) -> tuple[float, float]:
+        """The next 2D dimension, in [0, 1)^2."""
+
+    def square(self) -> Vec3:
+        """An offset in [-0.5, 0.5)^2 x {0}, see raytracer.sample_square."""
+        u, v = self.uniform_2d()
+        return Vec3(u - 0.5, v - 0.5, 0.0)
+
+    def unit_vector(self) -> Vec3:
+        """A uniformly distributed unit vector, see unit_vectors."""
+        u, v = self.uniform_2d()
+        z = 2.0 * u - 1.0
+        phi = 2.0 * math.pi * v
+        r = math.sqrt(max(0.0, 1.0 - z * z))
+        return Vec3(r * math.cos(phi), r * math.sin(phi), z)
+
+    def on_hemisphere(self, normal) -> Vec3:
+        """A uniformly distributed unit vector on the hemisphere around normal."""
+        v = self.unit_vector()
+        if v.dot(normal) < 0.0:
+            return -v
+        return v
+
+
+class RandomSampler(Sampler):
+    """Independent random numbers, pre-generated in blocks.
+
+    Drawing a single number from numpy costs about as much as drawing
+    thousands, so blocks of uniform numbers are drawn and mapped to offsets and
+    unit vectors in one vectorized step and handed out one by one.
+
+    Attributes:
+        rng: the generator all blocks are drawn from.
+        block_size: number of samples of every block.
+    """
+
+    def __init__(self, rng: np.random.Generator, block_size: int = BLOCK_SIZE):
+        self.rng = rng
+        self.block_size = block_size
+        self._uniforms: Iterator[float] = iter(())
+        self._squares: Iterator[tuple[float, float]] = iter(())
+        self._unit_vectors: Iterator[tuple[float, float, float]] = iter(())
+
+    @staticmethod
+    def _components(samples: np.ndarray) -> Iterator[tuple[float, ...]]:
+        # zipping plain lists of the components avoids building a list per sample
+        return zip(*samples.T.tolist())
+
+    def uniform(self) -> float:
+        try:
+            return next(self._uniforms)
+        except StopIteration:
+            self._uniforms = iter(self.rng.random(self.block_size).tolist())
+            return next(self._uniforms)
+
+    def uniform_2d(self) -> tuple[float, float]:
+        return self.uniform(), self.uniform()
+
+    def square(self) -> Vec3:
+        try:
+            x, y = next(self._squares)
+        except StopIteration:
+            u = self.rng.random((self.block_size, 2))
+            self._squares = self._components(square_offsets(u))
+            x, y = next(self._squares)
+        return Vec3(x, y, 0.0)
+
+    def unit_vector(self) -> Vec3:
+        try:
+            x, y, z = next(self._unit_vectors)
+        except StopIteration:
+            u = self.rng.random((self.block_size, 2))
+            self._unit_vectors = self._components(unit_vectors(u))
+            x, y, z = next(self._unit_vectors)
+        return Vec3(x, y, z)
+
+
+class PixelSampler(Sampler):
+    """Base of samplers which distribute the samples of a pixel in every dimension.
+
+    Dimensions are drawn in 2D pairs, a 1D dimension takes the first number of a
+    pair. The pairs of all samples of the pixel are generated in chunks, when the
+    first sample requests them, by subclasses.
+
+    Attributes:
+        rng: the generator of the randomization of every pixel.
+        chunk: number of 2D dimensions generated at once.
+    """
+
+    def __init__(self, rng: np.random.Generator, chunk: int = 8):
+        self.rng = rng
+        self.chunk = chunk
+        self._count = 1
+        self._index = 0
+        self._dimension = 0
+        self._table: list[list[list[float]]] = []
+
+    def start_pixel(self, i: int, j: int, count: int) -> None:
+        self._count = count
+        self._table = []
+        self.start_sample(0)
+
+    def start_sample(self, index: int) -> None:
+        self._index = index
+        self._dimension = 0
+
+    def uniform(self) -> float:
+        return self.uniform_2d()[0]
+
+    def uniform_2d(self) -> tuple[float, float]:
+        d = self._dimension
+        self._dimension += 1
+        if d >= len(self._table):
+            self._table += self.generate(len(self._table), self.chunk, self._count)
+        u, v = self._table[d][self._index]
+        return u, v
+
+    @abc.abstractmethod
+    def generate(self, first: int, dimensions: int, count: int) -> list:
+        """The 2D dimensions first, ..., first + dimensions - 1 of all samples.
+
+        Returns:
+            A (dimensions, count, 2) nested list of numbers in [0, 1).
+        """
+
+
+class StratifiedSampler(PixelSampler):
+    """One jittered sample per cell of a grid, cells are shuffled per dimension.
+
+    The grid has about sqrt(count) x sqrt(count) cells. If count is not a
+    square, a random subset of the cells is sampled.
+    """
+
+    def generate(self, first: int, dimensions: int, count: int) -> list:
+        nx = max(1, round(math.sqrt(count)))
+        ny = -(-count // nx)
+        cells = np.tile(np.arange(nx * ny), (dimensions, 1))
+        cells = self.rng.permuted(cells, axis=1)[:, :count]
+        jitter = self.rng.random((dimensions, count, 2))
+        u = (cells % nx + jitter[..., 0]) / nx
+        v = (cells // nx + jitter[..., 1]) / ny
+        return np.stack([u, v], axis=2).tolist()
+
+
+def primes(n: int) -> list[int]:
+    """The first n prime numbers."""
+    found: list[int] = []
+    candidate = 2
+    while len(found) < n:
+        if all(candidate % p for p in found if p * p <= candidate):
+            found.append(candidate)
+        candidate += 1
+    return found
+
+
+def radical_inverse(base: int, index: np.ndarray) -> np.ndarray:
+    """Mirror the digits of every index in base at the radix point."""
+    index = np.asarray(index, dtype=np.int64)
+    result = np.zeros(index.shape)
+    scale = 1.0 / base
+    while index.any():
+        index, digit = np.divmod(index, base)
+        result += digit * scale
+        scale /= base
+    return result
+
+
+class HaltonSampler(PixelSampler):
+    """The Halton sequence with a random shift (Cranley-Patterson rotation) per pixel.
+
+    The k-th number of a sample uses the k-th prime as base. The sequence loses
+    its uniformity for large bases, which only sample deep bounces. The
+    unshifted points only depend on the number of samples and are cached.
+    """
+
+    BASES = primes(128)
+
+    def __init__(self, rng: np.random.Generator, chunk: int = 8):
+        super().__init__(rng, chunk)
+        self._points: dict[tuple[int, int, int], np.ndarray] = {}
+
+    def points(self, first: int, dimensions: int, count: int) -> np.ndarray:
+        """The unshifted (dimensions, count, 2) points."""
+        key = (first, dimensions, count)
+        if key not in self._points:
+            index = np.arange(count)
+            self._points[key] = np.array(
+                [
+                    [
+                        radical_inverse(self.BASES[k % len(self.BASES)], index)
+                        for k in (2 * d, 2 * d + 1)
+                    ]
+                    for d in range(first, first + dimensions)
+                ]
+            ).transpose(0, 2, 1)
+        return self._points[key]
+
+    def generate(self, first: int, dimensions: int, count: int) -> list:
+        shift = self.rng.random((dimensions, 1, 2))
+        return ((self.points(first, dimensions, count) + shift) % 1.0).tolist()
+
+
+_UINT32 = np.uint32
+
+
+def reverse_bits(x: np.ndarray) -> np.ndarray:
+    """Reverse the bits of every uint32."""
+    x = x.astype(_UINT32)
+    for shift, mask in (
+        (1, 0x55555555),
+        (2, 0x33333333),
+        (4, 0x0F0F0F0F),
+        (8, 0x00FF00FF),
+    ):
+        shift, mask = _UINT32(shift), _UINT32(mask)
+        x = ((x >> shift) & mask) | ((x & mask) << shift)
+    return (x >> _UINT32(16)) | (x << _UINT32(16))
+
+
+def owen_scramble(x: np.ndarray, seed: np.ndarray) -> np.ndarray:
+    """Nested uniform scramble of the bits of every uint32, from the top bit down.
+
+    Uses the hash of Laine and Karras on the reversed bits, in which every bit
+    only depends on the seed and the bits below it.
+    """
+    x = reverse_bits(x) + seed.astype(_UINT32)
+    x ^= x * _UINT32(0x6C50B47C)
+    x ^= x * _UINT32(0xB82F1E52)
+    x ^= x * _UINT32(0xC7AFE638)
+    x ^= x * _UINT32(0x8D22F6E6)
+    return reverse_bits(x)
+
+
+def _sobol_directions() -> np.ndarray:
+    # the second Sobol dimension: v_0 = 2^31, v_k = v_{k-1} ^ (v_{k-1} >> 1)
+    v = [1 << 31]
+    for _ in range(31):
+        v.append(v[-1] ^ (v[-1] >> 1))
+    return np.array(v, dtype=_UINT32)
+
+
+_SOBOL_DIRECTIONS = _sobol_directions()
+
+
+def sobol_2d(index: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The first two dimensions of the Sobol sequence as uint32 fractions."""
+    index = index.astype(_UINT32)
+    bits = (index[..., None] >> np.arange(32, dtype=_UINT32)) & _UINT32(1)
+    v = np.bitwise_xor.reduce(bits * _SOBOL_DIRECTIONS, axis=-1)
+    return reverse_bits(index), v
+
+
+class SobolSampler(PixelSampler):
+    """Owen-scrambled 2D Sobol points, padded by shuffling the samples per dimension.
+
+    Every 2D dimension uses the first two Sobol dimensions, which are well
+    distributed for any number of samples. The order of the samples is Owen
+    scrambled independently per dimension, which decorrelates the dimensions,
+    and the points are Owen scrambled per pixel. Power of 2 sample counts are
+    the most uniform.
+    """
+
+    def generate(self, first: int, dimensions: int, count: int) -> list:
+        shuffle, seed_u, seed_v = self.rng.integers(
+            0, 1 << 32, (3, dimensions, 1), dtype=np.uint64
+        )
+        index = np.broadcast_to(np.arange(count, dtype=_UINT32), (dimensions, count))
+        u, v = sobol_2d(owen_scramble(index, shuffle))
+        return (
+            np.stack([owen_scramble(u, seed_u), owen_scramble(v, seed_v)], axis=2)
+            / float(1 << 32)
+        ).tolist()
+
+
+SAMPLERS: dict[str, type[Sampler]] = {
+    "random": RandomSampler,
+    "stratified": StratifiedSampler,
+    "halton": HaltonSampler,
+    "sobol": SobolSampler,
+}
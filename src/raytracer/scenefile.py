@@ -0,0 +1,231 @@
+"""Binary scene files with memory-mapped geometry.
+
+A ``.rts`` file holds a small JSON header with the camera of a scene followed by
+its materials and geometry as ``.npy`` blocks::
+
+    b"RTSCENE\\x01"            magic and version
+    <u8                       length of the header
+    header                    UTF-8 JSON, padded with spaces
+    blocks                    .npy arrays at offsets from the end of the header
+
+The header maps the name of every block to its offset, all aligned to 64 bytes:
+``materials.<array>`` for the arrays of the MaterialTable, ``spheres.centers``,
+``spheres.radii`` and ``spheres.material_ids`` for the spheres and
+``meshes.0.<array>`` for the arrays of the first built mesh, its triangles in
+the order of its tree and the nodes of the tree, see TriangleMesh.ARRAYS.
+Generated scenes often have a material per sphere, hence the materials are
+packed into arrays like the geometry.
+
+The loader memory-maps the blocks straight into a MaterialTable, a FrozenWorld
+and TriangleMeshes, so no python object is built per sphere or material and no
+tree is built again. Only emissive spheres become Sphere objects for light
+sampling and materials are created when a ray hits them. The traversal of a
+mesh still copies the bounds of its tree into python floats, one tuple per
+node.
+"""
+
+import io
+import json
+import logging
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from raytracer.definitions.material import Material, MaterialTable
+from raytracer.definitions.world import FrozenWorld, World
+from raytracer.hitable import Sphere
+from raytracer.mesh import TriangleMesh
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"RTSCENE\x01"
+# alignment of the header end and of every block
+ALIGNMENT = 64
+
+
+@dataclass
+class SceneFile:
+    """A loaded scene.
+
+    Attributes:
+        world: the spheres, packed into a single FrozenWorld, and the meshes.
+        camera: image settings of the scene, e.g. aspect_ratio and image_width.
+        load_time: seconds it took to load the scene.
+    """
+
+    world: World
+    camera: dict[str, Any] = field(default_factory=dict)
+    load_time: float = 0.0
+
+
+def _npy_header(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        buffer, np.lib.format.header_data_from_array_1_0(array)
+    )
+    return buffer.getvalue()
+
+
+def align(offset: int) -> int:
+    """The first multiple of ALIGNMENT at or after offset."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save(path: Path, world: World, camera: dict[str, Any] | None = None) -> None:
+    """Write the spheres, packed spheres and meshes of world into a scene file.
+
+    The spheres of FrozenWorlds, e.g., of a loaded scene file, are written from
+    their arrays, with their material tables appended to the materials.
+
+    Raises:
+        TypeError: if the world has other hittables than spheres, FrozenWorlds
+            and meshes.
+    """
+    materials: list[Material] = []
+    material_index: dict[int, int] = {}
+
+    def material_id(material: Material) -> int:
+        if id(material) not in material_index:
+            material_index[id(material)] = len(materials)
+            materials.append(material)
+        return material_index[id(material)]
+
+    spheres = [h for h in world.hittables if isinstance(h, Sphere)]
+    frozen = [h for h in world.hittables if isinstance(h, FrozenWorld)]
+    meshes = [h for h in world.hittables if isinstance(h, TriangleMesh)]
+    if len(spheres) + len(frozen) + len(meshes) != len(world.hittables):
+        raise TypeError(
+            "Only spheres, frozen worlds and meshes can be saved to a scene file."
+        )
+
+    centers = [np.array([list(map(float, s.center)) for s in spheres]).reshape(-1, 3)]
+    radii = [np.array([s.radius for s in spheres], dtype=float)]
+    material_ids = [
+        np.array([material_id(s.material) for s in spheres], dtype=np.int64)
+    ]
+    mesh_blocks: dict[str, np.ndarray] = {}
+    mesh_headers = []
+    for i, mesh in enumerate(meshes):
+        for name, array in mesh.arrays().items():
+            mesh_blocks[f"meshes.{i}.{name}"] = array
+        mesh_headers.append({"material": material_id(mesh.material)})
+
+    # the tables of the frozen worlds follow the materials of all other hittables
+    tables = [MaterialTable.from_materials(materials).arrays()]
+    offset = len(materials)
+    for packed in frozen:
+        centers.append(packed.centers)
+        radii.append(packed.radii)
+        material_ids.append(packed.material_ids + offset)
+        tables.append(packed.materials.arrays())
+        offset += len(packed.materials.kinds)
+
+    blocks: dict[str, np.ndarray] = {
+        "spheres.centers": np.concatenate(centers).astype("<f8"),
+        "spheres.radii": np.concatenate(radii).astype("<f8"),
+        "spheres.material_ids": np.concatenate(material_ids).astype("<i8"),
+        **mesh_blocks,
+    }
+    for name in MaterialTable.ARRAYS:
+        blocks[f"materials.{name}"] = np.concatenate([t[name] for t in tables])
+
+    offsets, offset = {}, 0
+    for name, array in blocks.items():
+        offsets[name] = offset
+        offset = align(offset + len(_npy_header(array)) + array.nbytes)
+
+    header = json.dumps(
+        {
+            "camera": camera or {},
+            "meshes": mesh_headers,
+            "blocks": offsets,
+        }
+    ).encode()
+    header += b" " * (
+        align(len(MAGIC) + 8 + len(header)) - len(MAGIC) - 8 - len(header)
+    )
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(struct.pack("<Q", len(header)))
+        file.write(header)
+        start = file.tell()
+        for name, array in blocks.items():
+            file.seek(start + offsets[name])
+            file.write(_npy_header(array))
+            file.write(np.ascontiguousarray(array).tobytes())
+
+
+def _map_block(path: Path, file, offset: int) -> np.ndarray:
+    file.seek(offset)
+    if np.lib.format.read_magic(file) == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+    if not np.prod(shape):
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=file.tell(),
+        shape=shape,
+        order="F" if fortran_order else "C",
+    )
+
+
+def load(path: Path) -> SceneFile:
+    """Load a scene file with memory-mapped geometry.
+
+    Raises:
+        ValueError: if path is not a scene file.
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a scene file.")
+        (length,) = struct.unpack("<Q", file.read(8))
+        header = json.loads(file.read(length))
+        data_start = file.tell()
+        blocks = {
+            name: _map_block(path, file, data_start + offset)
+            for name, offset in header["blocks"].items()
+        }
+
+    materials = MaterialTable.from_arrays(
+        *(blocks[f"materials.{name}"] for name in MaterialTable.ARRAYS)
+    )
+    world = World()
+    if len(blocks["spheres.radii"]):
+        world.add(
+            FrozenWorld.from_arrays(
+                blocks["spheres.centers"],
+                blocks["spheres.radii"],
+                blocks["spheres.material_ids"],
+                materials,
+            )
+        )
+    for i, mesh in enumerate(header["meshes"]):
+        material = materials.materials[mesh["material"]]
+        if f"meshes.{i}.nodes.order" in blocks:
+            arrays = {
+                name: blocks[f"meshes.{i}.{name}"] for name in TriangleMesh.ARRAYS
+            }
+            world.add(TriangleMesh.from_arrays(arrays, material))
+        else:
+            # files without the tree of their meshes build it again
+            world.add(
+                TriangleMesh(
+                    blocks[f"meshes.{i}.vertices"],
+                    blocks[f"meshes.{i}.indices"],
+                    material,
+                )
+            )
+
+    load_time = time.perf_counter() - start
+    _logger.info(f"Loaded {path} in {load_time:.3f}s")
+    return SceneFile(world, header["camera"], load_time)
@@ -0,0 +1,177 @@
+"""Scenes used by the command line, the tests and the benchmarks.
+
+All scenes are laid out for the fixed camera of RayTracer, which sits at the
+origin and looks along -z.
+"""
+
+import numpy as np
+
+from raytracer.definitions.material import (
+    DefaultMaterial,
+    Dialetric,
+    DiffuseLight,
+    Lambertian,
+    Material,
+    Metal,
+)
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.definitions.world import World
+from raytracer.hitable import Sphere
+
+
+def four_spheres() -> World:
+    """The scene of ``raytracer.main``: three spheres standing on a ground sphere."""
+    return (
+        World()
+        # center object
+        .add(
+            Sphere(
+                Point(Vector([0, 0, -1])),
+                0.5,
+                Lambertian(Color(Vector([0.8, 0.8, 0.0]))),
+            )
+        )
+        # gronud surface
+        .add(
+            Sphere(
+                Point(Vector([0, -100.5, -1])),
+                100,
+                Lambertian(Color(Vector([0.1, 0.2, 0.5]))),
+            )
+        )
+        # left object
+        .add(
+            Sphere(
+                Point(Vector([-1, 0, -1])),
+                0.5,
+                Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5),
+            )
+        )
+        # right object
+        .add(
+            Sphere(
+                Point(Vector([1, 0, -1])),
+                0.5,
+                Metal(Color(Vector([0.8, 0.6, 0.2])), fuzz=1.0),
+            )
+        )
+    )
+
+
+def random_spheres(n: int = 500, seed: int = 0) -> World:
+    """Many small random spheres on a ground plane, after the book's final scene.
+
+    Args:
+        n: total number of spheres including the ground and 3 large spheres.
+        seed: seed of the random layout.
+    """
+    rng = np.random.default_rng(seed)
+    world = World().add(
+        Sphere(
+            Point(Vector([0, -1000.5, -10])),
+            1000,
+            Lambertian(Color(Vector([0.5, 0.5, 0.5]))),
+        )
+    )
+    world.add(
+        Sphere(
+            Point(Vector([0, 0.5, -6])), 1.0, Dialetric(Color(Vector([1.0] * 3)), 1.5)
+        )
+    )
+    world.add(
+        Sphere(
+            Point(Vector([-3, 0.5, -7])),
+            1.0,
+            Lambertian(Color(Vector([0.4, 0.2, 0.1]))),
+        )
+    )
+    world.add(
+        Sphere(
+            Point(Vector([3, 0.5, -7])),
+            1.0,
+            Metal(Color(Vector([0.7, 0.6, 0.5])), fuzz=0.0),
+        )
+    )
+
+    for _ in range(n - 4):
+        x, z = rng.uniform(-11, 11), rng.uniform(-23, -2)
+        choice = rng.random()
+        material: Material
+        if choice < 0.8:
+            material = Lambertian(Color(Vector(rng.random(3) * rng.random(3))))
+        elif choice < 0.95:
+            material = Metal(
+                Color(Vector(rng.uniform(0.5, 1.0, 3))), fuzz=rng.uniform(0, 0.5)
+            )
+        else:
+            material = Dialetric(Color(Vector([1.0] * 3)), 1.5)
+        world.add(Sphere(Point(Vector([x, -0.3, z])), 0.2, material))
+
+    return world
+
+
+def glass_spheres(n: int = 12, seed: int = 0) -> World:
+    """Rows of glass spheres in front of a mirror, dominated by refraction."""
+    rng = np.random.default_rng(seed)
+    glass = Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5)
+    world = (
+        World()
+        .add(
+            Sphere(
+                Point(Vector([0, -100.5, -1])),
+                100,
+                Lambertian(Color(Vector([0.8, 0.8, 0.8]))),
+            )
+        )
+        .add(
+            Sphere(
+                Point(Vector([0, 0, -8])),
+                3.0,
+                Metal(Color(Vector([0.9, 0.9, 0.9])), fuzz=0.05),
+            )
+        )
+    )
+    for i in range(n):
+        x = -2.0 + 4.0 * (i % 4) / 3
+        z = -1.5 - 1.0 * (i // 4)
+        world.add(Sphere(Point(Vector([x, rng.uniform(-0.2, 0.2), z])), 0.4, glass))
+    return world
+
+
+def small_light() -> World:
+    """Diffuse spheres lit by a single small light above the image instead of the sky.
+
+    A black sphere around the scene absorbs all rays which would reach the sky.
+    """
+    world = World().add(
+        Sphere(
+            Point(Vector([0, -100.5, -1])),
+            100,
+            Lambertian(Color(Vector([0.5, 0.5, 0.5]))),
+        )
+    )
+    for x, albedo in [
+        (-1, [0.8, 0.3, 0.3]),
+        (0, [0.8, 0.8, 0.8]),
+        (1, [0.3, 0.3, 0.8]),
+    ]:
+        world.add(
+            Sphere(Point(Vector([x, 0, -1])), 0.5, Lambertian(Color(Vector(albedo))))
+        )
+    world.add(Sphere(Point(Vector([0, 0, -1])), 1000, DefaultMaterial()))
+    world.add(
+        Sphere(
+            Point(Vector([0, 1.4, -1])),
+            0.2,
+            DiffuseLight(Color(Vector([20.0, 20.0, 20.0]))),
+        )
+    )
+    return world
+
+
+SCENES = {
+    "four_spheres": four_spheres,
+    "random_spheres": random_spheres,
+    "glass_spheres": glass_spheres,
+    "small_light": small_light,
+}
@@ -0,0 +1,197 @@
+"""Share the packed arrays of a scene with worker processes without copying.
+
+Pickling a scene into every worker process copies all of its spheres, meshes and
+materials N times and takes seconds for large scenes. Instead, the arrays of
+every FrozenWorld and its MaterialTable, of every TriangleMesh and its tree and
+all other large arrays, e.g. the nodes of a BVH, are copied once into a single
+block of shared memory. Workers receive a SharedScene with the name of the
+block, the layout of the arrays and the rest of the scene pickled with
+references to them. They attach read-only views of the arrays, rebuilding only
+the lights, the plain python copies of the trees of meshes and, when a ray hits
+them, the materials, like a loaded scene file.
+
+The process creating the block owns it: share unlinks the block when the render
+ends, also if it fails, and the resource tracker of multiprocessing unlinks it
+should the process be killed.
+"""
+
+import contextlib
+import io
+import logging
+import pickle
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Iterator
+
+import numpy as np
+
+from raytracer import scenefile
+from raytracer.definitions.material import MaterialTable
+from raytracer.definitions.world import FrozenWorld
+from raytracer.mesh import TriangleMesh
+
+_logger = logging.getLogger(__name__)
+
+# arrays smaller than this are pickled with the scene
+MIN_SHARED_BYTES = 4096
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Location of an array in a shared memory block."""
+
+    offset: int
+    dtype: str
+    shape: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class SharedScene:
+    """Picklable handle of a scene in shared memory.
+
+    Attributes:
+        name: name of the shared memory block.
+        arrays: location of every array by the key of the object it belongs to
+            and its name, e.g. ``0.centers`` or ``0.materials.fuzz``.
+        pickled: the scene pickled with references to the shared objects.
+    """
+
+    name: str
+    arrays: dict[str, SharedArray]
+    pickled: bytes
+
+    def attach(self) -> tuple[shared_memory.SharedMemory, Any]:
+        """Attach a scene viewing read-only arrays of the block.
+
+        Returns:
+            The attached block, which must be kept open as long as the scene is
+            used, and the scene.
+        """
+        memory = shared_memory.SharedMemory(self.name)
+        views: dict[str, dict[str, np.ndarray]] = {}
+        for name, array in self.arrays.items():
+            view = np.ndarray(
+                array.shape, np.dtype(array.dtype), memory.buf, array.offset
+            )
+            view.flags.writeable = False
+            key, name = name.split(".", 1)
+            views.setdefault(key, {})[name] = view
+        return memory, _Unpickler(io.BytesIO(self.pickled), views).load()
+
+
+def _world_arrays(world: FrozenWorld) -> dict[str, np.ndarray]:
+    arrays = {
+        "centers": world.centers,
+        "radii": world.radii,
+        "material_ids": world.material_ids,
+    }
+    for name, array in world.materials.arrays().items():
+        arrays[f"materials.{name}"] = array
+    return arrays
+
+
+def _world_from_arrays(arrays: dict[str, np.ndarray]) -> FrozenWorld:
+    materials = MaterialTable.from_arrays(
+        *(arrays[f"materials.{name}"] for name in MaterialTable.ARRAYS)
+    )
+    return FrozenWorld.from_arrays(
+        arrays["centers"], arrays["radii"], arrays["material_ids"], materials
+    )
+
+
+class _Pickler(pickle.Pickler):
+    """Pickles a scene with references to its FrozenWorlds, meshes and arrays.
+
+    The arrays of every referenced object are collected in arrays, under the
+    key of the object.
+    """
+
+    def __init__(self, file: io.BytesIO):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.arrays: dict[str, np.ndarray] = {}
+        self._references: dict[int, tuple] = {}
+
+    def persistent_id(self, obj: Any) -> tuple | None:
+        if isinstance(obj, FrozenWorld):
+            kind, arrays, extra = "world", _world_arrays(obj), ()
+        elif isinstance(obj, TriangleMesh):
+            kind, arrays, extra = "mesh", obj.arrays(), (obj.material,)
+        elif (
+            isinstance(obj, np.ndarray)
+            and not obj.dtype.hasobject
+            and obj.nbytes >= MIN_SHARED_BYTES
+        ):
+            kind, arrays, extra = "array", {"array": obj}, ()
+        else:
+            return None
+
+        # objects referenced several times, e.g. the mesh of many instances, are
+        # shared once and loaded as one object
+        if id(obj) not in self._references:
+            key = str(len(self._references))
+            for name, array in arrays.items():
+                self.arrays[f"{key}.{name}"] = np.ascontiguousarray(array)
+            self._references[id(obj)] = (kind, key, *extra)
+        return self._references[id(obj)]
+
+
+class _Unpickler(pickle.Unpickler):
+    """Loads a scene of _Pickler with the referenced objects on shared views."""
+
+    def __init__(self, file: io.BytesIO, views: dict[str, dict[str, np.ndarray]]):
+        super().__init__(file)
+        self._views = views
+        self._loaded: dict[str, Any] = {}
+
+    def persistent_load(self, pid: tuple) -> Any:
+        kind, key, *extra = pid
+        if key not in self._loaded:
+            arrays = self._views.get(key, {})
+            if kind == "world":
+                self._loaded[key] = _world_from_arrays(arrays)
+            elif kind == "mesh":
+                self._loaded[key] = TriangleMesh.from_arrays(arrays, *extra)
+            elif kind == "array":
+                self._loaded[key] = arrays["array"]
+            else:
+                raise pickle.UnpicklingError(f"Unknown shared object {kind}.")
+        return self._loaded[key]
+
+
+@contextlib.contextmanager
+def share(scene: Any) -> Iterator[SharedScene]:
+    """Copy the arrays of a scene into shared memory for the duration of the context.
+
+    The FrozenWorlds and TriangleMeshes of the scene, e.g. within a BVH or an
+    Instance, and all other arrays of at least MIN_SHARED_BYTES are shared, the
+    rest of the scene is pickled into the SharedScene.
+
+    Yields:
+        The SharedScene of the scene.
+    """
+    buffer = io.BytesIO()
+    pickler = _Pickler(buffer)
+    pickler.dump(scene)
+    arrays = pickler.arrays
+    layout, size = {}, 0
+    for name, array in arrays.items():
+        layout[name] = SharedArray(size, array.dtype.str, array.shape)
+        # aligned like the blocks of a scene file
+        size += scenefile.align(array.nbytes)
+
+    # a block can not be empty
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for name, array in arrays.items():
+            location = layout[name]
+            np.ndarray(array.shape, array.dtype, memory.buf, location.offset)[...] = (
+                array
+            )
+        _logger.info(
+            f"Shared {size} bytes of scene in {memory.name}, "
+            f"pickled {len(buffer.getvalue())} bytes"
+        )
+        yield SharedScene(memory.name, layout, buffer.getvalue())
+    finally:
+        memory.close()
+        memory.unlink()
@@ -0,0 +1,228 @@
+"""Sinks receiving the blocks of an image as they are rendered.
+
+Tiles complete in any order, so a sink receives every block of linear colors
+with the position of its upper left pixel and decides how to store it:
+
+- BufferSink keeps the whole image in memory as a NumPy framebuffer.
+- StreamSink writes the rows of a P3, P6 or png image to a stream as soon as
+  all rows above them are complete, so downstream tools can read the image
+  while it is rendered. Only the rows that can not be written yet are buffered,
+  as bytes.
+- MemmapSink writes every block in place into a pre-sized P6 or PFM file
+  mapped into memory. The operating system writes the pages back to the file,
+  so images larger than the memory can be rendered.
+"""
+
+import abc
+import logging
+import zlib
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+import numpy as np
+
+from raytracer.color import to_bytes
+from raytracer.image import (
+    ImageFormat,
+    pfm_header,
+    png_chunk,
+    png_header,
+    png_scanlines,
+    ppm_p3_body,
+    ppm_p3_header,
+    ppm_p6_header,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class Sink(abc.ABC):
+    """Receives blocks of linear colors of a (height, width) image.
+
+    A sink is closed once all blocks are written, by close or at the end of a
+    with block that did not fail.
+    """
+
+    def __init__(self, height: int, width: int):
+        self.height = height
+        self.width = width
+
+    def _block(self, top: int, left: int, pixels: np.ndarray) -> tuple[slice, slice]:
+        """Rows and columns of the image covered by the block."""
+        rows, cols, _ = pixels.shape
+        if top < 0 or left < 0 or top + rows > self.height or left + cols > self.width:
+            raise ValueError(
+                f"Block of {rows}x{cols} pixels at {top=}, {left=} is outside "
+                f"of the {self.height}x{self.width} image."
+            )
+        return slice(top, top + rows), slice(left, left + cols)
+
+    @abc.abstractmethod
+    def write(self, top: int, left: int, pixels: np.ndarray) -> None:
+        """Store a block of the image.
+
+        Args:
+            top: row of the upper left pixel of the block.
+            left: column of the upper left pixel of the block.
+            pixels: (rows, cols, 3) linear colors.
+        """
+
+    def close(self) -> None:
+        """Finish the image."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+
+class BufferSink(Sink):
+    """Keeps the image in a (height, width, 3) framebuffer."""
+
+    def __init__(self, height: int, width: int):
+        super().__init__(height, width)
+        self.framebuffer = np.zeros((height, width, 3))
+
+    def write(self, top: int, left: int, pixels: np.ndarray) -> None:
+        self.framebuffer[self._block(top, left, pixels)] = pixels
+
+
+class StreamSink(Sink):
+    """Writes the image to a stream in row order while it is rendered.
+
+    The header is written right away, every row once it and all rows above it
+    are complete. The png is written as one IDAT chunk per batch of rows, each
+    ending with a sync flush of the compressor, so every written row can be
+    decoded.
+    """
+
+    FORMATS = (ImageFormat.P3, ImageFormat.P6, ImageFormat.PNG)
+
+    def __init__(
+        self,
+        out: TextIO | BinaryIO,
+        height: int,
+        width: int,
+        image_format: ImageFormat = ImageFormat.P3,
+    ):
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Can not stream {image_format=}.")
+        super().__init__(height, width)
+        self.out = out
+        self.image_format = image_format
+        # the next row to write and the bytes and written pixels of later rows
+        self._next = 0
+        self._rows: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+        if image_format is ImageFormat.P3:
+            out.write(ppm_p3_header(height, width))
+        elif image_format is ImageFormat.P6:
+            out.write(ppm_p6_header(height, width))
+        else:
+            out.write(png_header(height, width))
+            self._compressor = zlib.compressobj()
+        out.flush()
+
+    @property
+    def pending_rows(self) -> int:
+        """Number of rows buffered until the rows above them are complete."""
+        return len(self._rows)
+
+    def write(self, top: int, left: int, pixels: np.ndarray) -> None:
+        rows, cols = self._block(top, left, pixels)
+        if top < self._next:
+            raise ValueError(f"Row {top} was already written.")
+        for row, data in zip(range(rows.start, rows.stop), to_bytes(pixels)):
+            if row not in self._rows:
+                self._rows[row] = (
+                    np.zeros((self.width, 3), dtype=np.uint8),
+                    np.zeros(self.width, dtype=bool),
+                )
+            buffer, written = self._rows[row]
+            buffer[cols] = data
+            written[cols] = True
+
+        complete = []
+        while self._next in self._rows and self._rows[self._next][1].all():
+            complete.append(self._rows.pop(self._next)[0])
+            self._next += 1
+        if complete:
+            self._emit(np.stack(complete))
+
+    def _emit(self, data: np.ndarray) -> None:
+        if self.image_format is ImageFormat.P3:
+            self.out.write(ppm_p3_body(data))
+        elif self.image_format is ImageFormat.P6:
+            self.out.write(data.tobytes())
+        else:
+            compressed = self._compressor.compress(png_scanlines(data))
+            compressed += self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.out.write(png_chunk(b"IDAT", compressed))
+        self.out.flush()
+
+    def close(self) -> None:
+        """Finish the image.
+
+        Raises:
+            ValueError: if not all rows were written.
+        """
+        if self._next < self.height:
+            raise ValueError(f"Only {self._next} of {self.height} rows were written.")
+        if self.image_format is ImageFormat.PNG:
+            self.out.write(
+                png_chunk(b"IDAT", self._compressor.flush()) + png_chunk(b"IEND", b"")
+            )
+        self.out.flush()
+
+
+class MemmapSink(Sink):
+    """Writes the blocks in place into a P6 or PFM file mapped into memory.
+
+    The file is created with its final size up front, so blocks can be written
+    in any order and the file is only as complete as the blocks written so far.
+    """
+
+    FORMATS = (ImageFormat.P6, ImageFormat.PFM)
+
+    def __init__(
+        self,
+        path: Path,
+        height: int,
+        width: int,
+        image_format: ImageFormat | None = None,
+    ):
+        image_format = image_format or ImageFormat.from_path(path)
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Can not write {image_format=} in place.")
+        super().__init__(height, width)
+        self.path = path
+        self.image_format = image_format
+
+        if image_format is ImageFormat.P6:
+            header, dtype = ppm_p6_header(height, width), np.dtype(np.uint8)
+        else:
+            header, dtype = pfm_header(height, width), np.dtype("<f4")
+        with open(path, "wb") as file:
+            file.write(header)
+            file.truncate(len(header) + height * width * 3 * dtype.itemsize)
+        self._image = np.memmap(
+            path, dtype=dtype, mode="r+", offset=len(header), shape=(height, width, 3)
+        )
+        # PFM stores the scanlines from the bottom to the top
+        self._view = (
+            self._image if image_format is ImageFormat.P6 else self._image[::-1]
+        )
+        _logger.info(f"Writing {height}x{width} {image_format.value} to {path}")
+
+    def write(self, top: int, left: int, pixels: np.ndarray) -> None:
+        block = self._block(top, left, pixels)
+        if self.image_format is ImageFormat.P6:
+            self._view[block] = to_bytes(pixels)
+        else:
+            self._view[block] = pixels
+
+    def close(self) -> None:
+        """Flush the written blocks to the file."""
+        self._image.flush()
@@ -0,0 +1,127 @@
+"""Opt-in counters and stage timers of a render.
+
+Nothing is collected unless a RenderStats is activated. Instrumented code looks up
+the active collector once per call and skips all bookkeeping if there is none,
+so disabled stats cost a single context variable lookup. The collector is
+kept in a context variable rather than a global, hence concurrently rendered
+tiles each count into their own RenderStats, which are merged afterwards.
+
+Counters:
+    rays.primary: rays leaving the camera.
+    rays.secondary: scattered rays traced after a bounce.
+    rays.shadow: shadow rays towards sampled lights.
+    intersection.tests: ray-sphere intersection tests.
+    intersection.hits: tests which found an intersection closer than the
+        closest one known at the time of the test.
+    bvh.nodes: BVH nodes visited.
+    scatter.<kind>, absorb.<kind>: bounces on a material of the given
+        MaterialKind which scattered or absorbed the ray.
+    roulette.terminated: paths terminated by Russian roulette.
+    split.bounces: bounces of the rays split off at glass, which are not in
+        the path lengths of a render.
+"""
+
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import numpy as np
+
+from raytracer.definitions.material import MaterialKind
+
+
+@dataclass
+class RenderStats:
+    """Counters and seconds spent per stage.
+
+    Attributes:
+        counters: number of events by name, see the module documentation.
+        seconds: wall time by stage. Stages run by workers sum the time of all
+            workers.
+    """
+
+    counters: Counter = field(default_factory=Counter)
+    seconds: Counter = field(default_factory=Counter)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def count_materials(self, event: str, kinds: Counter) -> None:
+        """Count events, scatter or absorb, by MaterialKind."""
+        for kind, n in kinds.items():
+            self.counters[f"{event}.{MaterialKind(kind).name.lower()}"] += n
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] += time.perf_counter() - start
+
+    def merge(self, other: "RenderStats") -> None:
+        self.counters.update(other.counters)
+        self.seconds.update(other.seconds)
+
+    def summary(self) -> dict:
+        """JSON serializable summary of all counters and timings."""
+        tests = self.counters["intersection.tests"]
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "seconds": dict(sorted(self.seconds.items())),
+            "hit_rate": self.counters["intersection.hits"] / tests if tests else None,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+
+# the collector of the running render, None if stats are disabled
+COLLECTOR: ContextVar[Optional[RenderStats]] = ContextVar(
+    "raytracer_stats", default=None
+)
+
+
+@contextmanager
+def activate(stats: Optional[RenderStats]) -> Iterator[Optional[RenderStats]]:
+    """Collect into stats within the context, None disables collection."""
+    token = COLLECTOR.set(stats)
+    try:
+        yield stats
+    finally:
+        COLLECTOR.reset(token)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Count n events in the active collector, if any."""
+    if (stats := COLLECTOR.get()) is not None:
+        stats.counters[name] += n
+
+
+@contextmanager
+def timer(stage: str) -> Iterator[None]:
+    """Add the time spent in the context to stage of the active collector, if any."""
+    stats = COLLECTOR.get()
+    if stats is None:
+        yield
+        return
+    with stats.timer(stage):
+        yield
+
+
+def closer_hits(distances: np.ndarray) -> int:
+    """Number of intersection.hits of testing the distances one after another.
+
+    A distance is a hit if it is closer than all distances before it, as if every
+    test was bounded by the closest hit found so far. Misses are inf.
+    """
+    if not len(distances):
+        return 0
+    closest = np.minimum.accumulate(distances)
+    return int(distances[0] < np.inf) + int(
+        np.count_nonzero(distances[1:] < closest[:-1])
+    )
@@ -0,0 +1,294 @@
+"""Wavefront path tracing on NumPy arrays.
+
+Instead of following a single sample through ``ray_color`` the wavefront renderer
+builds the camera rays of a block of pixels as ``(N, 3)`` origin and direction
+arrays and advances all of them one bounce at a time. Rays which miss the scene
+or get absorbed are compacted out after every bounce, so later bounces only pay
+for the rays which are still alive.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from collections import Counter
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from raytracer import sampling
+from raytracer.definitions.arrays import dot, normalize
+from raytracer.definitions.material import KINDS, MaterialKind, MaterialTable
+from raytracer.definitions.world import FrozenWorld, PrimaryView
+from raytracer.stats import COLLECTOR, timer
+
+if TYPE_CHECKING:
+    from raytracer.raytracer import RayTracer
+
+_logger = logging.getLogger(__name__)
+
+# to account for floating point inaccuracies, we ignore small rays that hit its origin
+T_MIN = 0.0001
+
+# Upper bound of rays traced together. Bounds the memory of a single wavefront.
+RAYS_PER_BATCH = 1 << 17
+
+WHITE = np.array([1.0, 1.0, 1.0])
+BLUE = np.array([0.5, 0.7, 1.0])
+
+
+def sky(directions: np.ndarray) -> np.ndarray:
+    """Background color for rays that left the scene, see ``ray_color``."""
+    a = 0.5 * (normalize(directions)[:, 1] + 1.0)[:, None]
+    return (1.0 - a) * WHITE + a * BLUE
+
+
+def scatter(
+    materials: MaterialTable,
+    rng: np.random.Generator,
+    directions: np.ndarray,
+    normals: np.ndarray,
+    points: np.ndarray,
+    front_facing: np.ndarray,
+    material_ids: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Scatter rays at their hit points, mirroring ``Material.scatter``.
+
+    The hits are sorted by the kind of their material and every kind scatters
+    its contiguous group with a single call of its ``scatter_many`` kernel.
+
+    Returns:
+        The scattered directions and a mask of the rays which were not absorbed.
+    """
+    kinds = materials.kinds[material_ids]
+    # stable, so every kernel sees its rays in their original order
+    order = np.argsort(kinds, kind="stable")
+    bounds = np.searchsorted(kinds[order], np.arange(len(MaterialKind) + 1))
+    scattered = np.empty_like(directions)
+    alive = np.zeros(len(directions), dtype=bool)
+
+    for kind, start, end in zip(MaterialKind, bounds[:-1], bounds[1:]):
+        if start == end:
+            continue
+        group = order[start:end]
+        scattered[group], alive[group] = KINDS[kind].scatter_many(
+            rng,
+            directions[group],
+            normals[group],
+            points[group],
+            front_facing[group],
+            materials,
+            material_ids[group],
+        )
+
+    return scattered, alive
+
+
+def trace(
+    scene: FrozenWorld,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    rng: np.random.Generator,
+    *,
+    depth: int,
+    russian_roulette_depth: int | None = None,
+    path_lengths: np.ndarray | None = None,
+    primary: PrimaryView | None = None,
+) -> np.ndarray:
+    """Compute the color of every ray, the batched counterpart of ``ray_color``.
+
+    Args:
+        primary: finds the first hits if the rays are camera rays.
+    """
+    radiance = np.zeros_like(directions)
+    throughput = np.ones_like(directions)
+    index = np.arange(len(directions))
+    # number of bounces of every terminated path
+    bounces = np.full(len(directions), depth, dtype=np.intp)
+    stats = COLLECTOR.get()
+
+    for bounce in range(depth):
+        if not len(index):
+            break
+
+        if stats is not None:
+            stats.count("rays.secondary" if bounce else "rays.primary", len(index))
+        with timer("wavefront.intersect"):
+            if bounce == 0 and primary is not None:
+                t, hit = primary.intersect_many(directions, T_MIN, math.inf)
+            else:
+                t, hit = scene.intersect_many(origins, directions, T_MIN, math.inf)
+
+        missed = hit < 0
+        radiance[index[missed]] = throughput[missed] * sky(directions[missed])
+        bounces[index[missed]] = bounce
+
+        hit_mask = ~missed
+        index, hit, t = index[hit_mask], hit[hit_mask], t[hit_mask]
+        origins, directions = origins[hit_mask], directions[hit_mask]
+        throughput = throughput[hit_mask]
+
+        points = origins + t[:, None] * directions
+        outward = (points - scene.centers[hit]) / scene.radii[hit][:, None]
+        front_facing = dot(directions, outward) < 0
+        normals = np.where(front_facing[:, None], outward, -outward)
+        material_ids = scene.material_ids[hit]
+        # lights emit from their front faces and absorb, without light sampling
+        emission = scene.materials.emission[material_ids]
+        radiance[index] += throughput * emission * front_facing[:, None]
+
+        with timer("wavefront.scatter"):
+            directions, alive = scatter(
+                scene.materials,
+                rng,
+                directions,
+                normals,
+                points,
+                front_facing,
+                material_ids,
+            )
+        throughput = throughput * scene.materials.albedo[material_ids]
+
+        if stats is not None:
+            kinds = scene.materials.kinds[material_ids]
+            stats.count_materials("scatter", Counter(kinds[alive].tolist()))
+            stats.count_materials("absorb", Counter(kinds[~alive].tolist()))
+
+        if russian_roulette_depth is not None and bounce + 1 >= russian_roulette_depth:
+            survival = np.minimum(throughput.max(axis=1), 1.0)
+            survived = rng.random(len(survival)) < survival
+            if stats is not None:
+                stats.count(
+                    "roulette.terminated", int(np.count_nonzero(alive & ~survived))
+                )
+            alive &= survived
+            throughput = throughput / np.where(alive, survival, 1.0)[:, None]
+
+        bounces[index[~alive]] = bounce + 1
+        index, throughput = index[alive], throughput[alive]
+        origins, directions = points[alive], directions[alive]
+
+    if path_lengths is not None:
+        path_lengths += np.bincount(bounces, minlength=depth + 1)
+    # rays still alive after the last bounce do not contribute any light
+    return radiance
+
+
+def camera_rays(
+    tracer: RayTracer,
+    rows: range,
+    cols: range,
+    rng: np.random.Generator,
+    samples: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sample camera rays for every pixel in rows x cols.
+
+    The rays are ordered by row, column and then sample.
+
+    Args:
+        samples: samples per pixel, the tracer's samples_per_pixel if None.
+    """
+    j, i = np.meshgrid(rows, cols, indexing="ij")
+    return pixel_rays(tracer, i.ravel(), j.ravel(), rng, samples)
+
+
+def pixel_rays(
+    tracer: RayTracer,
+    i: np.ndarray,
+    j: np.ndarray,
+    rng: np.random.Generator,
+    samples: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sample camera rays for the pixels in column i and row j, ordered by pixel."""
+    samples = samples or tracer.samples_per_pixel
+    i = np.repeat(i, samples)
+    j = np.repeat(j, samples)
+    offset = sampling.square_offsets(rng.random((len(i), 2)))
+
+    pixel_centers = (
+        np.asarray(tracer.pixel_00_loc)
+        + (i + offset[:, 0])[:, None] * np.asarray(tracer.pixel_delta_u)
+        + (j + offset[:, 1])[:, None] * np.asarray(tracer.pixel_delta_v)
+    )
+    origins = np.broadcast_to(
+        np.asarray(tracer.camera.center, dtype=float), (len(i), 3)
+    )
+    return np.ascontiguousarray(origins), pixel_centers - origins
+
+
+def sample_pixels(
+    tracer: RayTracer,
+    scene: FrozenWorld,
+    i: np.ndarray,
+    j: np.ndarray,
+    samples: int,
+    rng: np.random.Generator,
+    path_lengths: np.ndarray | None = None,
+) -> np.ndarray:
+    """Trace samples rays through every pixel (i, j).
+
+    Returns:
+        (len(i), samples, 3) color of every sample.
+    """
+    colors = np.empty((len(i), samples, 3))
+    pixels_per_batch = max(1, RAYS_PER_BATCH // samples)
+    for start in range(0, len(i), pixels_per_batch):
+        batch = slice(start, start + pixels_per_batch)
+        with timer("wavefront.camera_rays"):
+            origins, directions = pixel_rays(tracer, i[batch], j[batch], rng, samples)
+        colors[batch] = trace(
+            scene,
+            origins,
+            directions,
+            rng,
+            depth=tracer.max_recursion_depth,
+            russian_roulette_depth=tracer.russian_roulette_depth,
+            path_lengths=path_lengths,
+            primary=tracer.primary_view(scene),
+        ).reshape(-1, samples, 3)
+    return colors
+
+
+def render_tile(
+    tracer: RayTracer,
+    scene: FrozenWorld,
+    rows: range,
+    cols: range,
+    rng: np.random.Generator,
+    path_lengths: np.ndarray | None = None,
+    samples: int | None = None,
+) -> np.ndarray:
+    """Render the pixels rows x cols of an initialized tracer into a (rows, cols, 3) array."""
+    samples = samples or tracer.samples_per_pixel
+    pixels = np.empty((len(rows), len(cols), 3))
+
+    rows_per_batch = max(1, RAYS_PER_BATCH // (len(cols) * samples))
+    for start in range(0, len(rows), rows_per_batch):
+        batch = rows[start : start + rows_per_batch]
+        _logger.debug(f"wavefront rows={batch} {cols=}")
+        with timer("wavefront.camera_rays"):
+            origins, directions = camera_rays(tracer, batch, cols, rng, samples)
+        colors = trace(
+            scene,
+            origins,
+            directions,
+            rng,
+            depth=tracer.max_recursion_depth,
+            russian_roulette_depth=tracer.russian_roulette_depth,
+            path_lengths=path_lengths,
+            primary=tracer.primary_view(scene),
+        )
+        pixels[start : start + len(batch)] = colors.reshape(
+            len(batch), len(cols), samples, 3
+        ).mean(axis=2)
+
+    return pixels
+
+
+def render(
+    tracer: RayTracer, scene: FrozenWorld, rng: np.random.Generator
+) -> np.ndarray:
+    """Render the image of an initialized tracer into a (height, width, 3) array."""
+    return render_tile(
+        tracer, scene, range(tracer.image_height), range(tracer.image_width), rng
+    )
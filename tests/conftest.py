@@ -7,4 +7,28 @@ Read more about conftest.py under:
 - https://docs.pytest.org/en/stable/writing_plugins.html
 """
 
-# import pytest
+import numpy as np
+import pytest
+
+from raytracer import scenes
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Point, Vector
+from raytracer.definitions.world import World
+
+
+@pytest.fixture
+def world() -> World:
+    """The scene rendered by ``raytracer.main``."""
+    return scenes.four_spheres()
+
+
+@pytest.fixture
+def random_rays():
+    """Generator of n random rays from z = 5 roughly towards -z."""
+
+    def rays(rng: np.random.Generator, n: int):
+        for _ in range(n):
+            origin = Point(Vector(rng.uniform(-3, 3, 3) + [0, 0, 5]))
+            yield Ray(origin, Vector(rng.uniform(-0.5, 0.5, 3) + [0, 0, -1]))
+
+    return rays
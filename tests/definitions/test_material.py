@@ -0,0 +1,270 @@
+import math
+
+import numpy as np
+import pytest
+
+from raytracer import sampling, wavefront
+from raytracer.definitions.material import (
+    DefaultMaterial,
+    Dialetric,
+    DiffuseLight,
+    Lambertian,
+    MaterialTable,
+    Metal,
+    reflectance,
+)
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.definitions.vector import Color, Vector
+from raytracer.sampling import RandomSampler
+
+
+def test_lambertian_samples_cosine_weighted():
+    # GIVEN a diffuse material hit head-on
+    material = Lambertian(Color(Vector([0.2, 0.4, 0.6])))
+    sampler = RandomSampler(np.random.default_rng(0))
+    ray = Ray(Vec3(0.0, 0.0, 0.0), Vec3(0.0, 0.0, -1.0))
+    normal, point = Vec3(0.0, 0.0, 1.0), Vec3(0.0, 0.0, -1.0)
+
+    # WHEN scattering many rays
+    scattered = [
+        material.scatter(ray, normal, point, True, sampler) for _ in range(20_000)
+    ]
+
+    # THEN the density matches the directions and the BRDF cancels with it
+    for s in scattered[:100]:
+        direction = s.ray.direction
+        assert direction.length() == pytest.approx(1.0)
+        assert s.cos_theta == pytest.approx(direction.dot(normal))
+        assert s.pdf == pytest.approx(material.pdf(normal, direction))
+        np.testing.assert_allclose(s.brdf, material.brdf(normal, direction))
+        np.testing.assert_allclose(s.weight, [0.2, 0.4, 0.6])
+    # E[cos(theta)] of the density cos(theta) / pi is 2 / 3
+    assert np.mean([s.cos_theta for s in scattered]) == pytest.approx(2 / 3, abs=0.01)
+
+
+def test_lambertian_does_not_scatter_below_the_surface():
+    material = Lambertian(Color(Vector([0.5, 0.5, 0.5])))
+    normal = Vec3(0.0, 1.0, 0.0)
+
+    assert material.pdf(normal, Vec3(0.0, -1.0, 0.0)) == 0.0
+    np.testing.assert_equal(material.brdf(normal, Vec3(1.0, -0.1, 0.0)), [0, 0, 0])
+
+
+def test_cosine_directions_match_scalar_mapping():
+    # GIVEN normals in all octants, including the pole of the basis
+    rng = np.random.default_rng(1)
+    normals = np.vstack([[[0.0, 0.0, -1.0]], rng.normal(size=(20, 3))])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    u = rng.random((21, 2))
+
+    # WHEN mapping the numbers with both functions
+    directions = sampling.cosine_directions(u, normals)
+
+    # THEN they agree and point away from the surface
+    for (a, b), normal, direction in zip(u, normals, directions):
+        scalar, cos_theta = sampling.cosine_direction(a, b, normal)
+        np.testing.assert_allclose(scalar.tolist(), direction, atol=1e-12)
+        assert cos_theta == pytest.approx(direction @ normal)
+        assert cos_theta >= 0.0
+
+
+def test_reflectance():
+    assert reflectance(1.0, 1.5) == pytest.approx(0.04)
+    assert reflectance(0.0, 1.5) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "cos_theta, front_facing",
+    [(1.0, True), (0.5, True), (0.2, True), (0.9, False), (0.5, False)],
+)
+def test_dialetric_reflects_schlick_fraction(cos_theta, front_facing):
+    # GIVEN glass hit at an angle from outside or inside
+    material = Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5)
+    sampler = RandomSampler(np.random.default_rng(2))
+    sin_theta = math.sqrt(1 - cos_theta**2)
+    ray = Ray(Vec3(0.0, 0.0, 0.0), Vec3(sin_theta, 0.0, -cos_theta))
+    normal, point = Vec3(0.0, 0.0, 1.0), Vec3(0.0, 0.0, 0.0)
+    ratio = 1 / 1.5 if front_facing else 1.5
+
+    # WHEN scattering many rays
+    directions = [
+        material.scatter(ray, normal, point, front_facing, sampler).ray.direction
+        for _ in range(20_000)
+    ]
+
+    # THEN rays reflect with the reflectance, always under total internal reflection
+    reflected = np.mean([d.dot(normal) > 0 for d in directions])
+    if ratio * sin_theta > 1.0:
+        assert reflected == 1.0
+    else:
+        assert reflected == pytest.approx(reflectance(cos_theta, ratio), abs=0.01)
+    assert all(math.isfinite(c) for d in directions for c in d)
+
+
+class FixedSampler:
+    """Hands out the given uniform numbers one after the other."""
+
+    def __init__(self, numbers: np.ndarray):
+        self._numbers = iter(numbers.tolist())
+
+    def uniform(self) -> float:
+        return next(self._numbers)
+
+
+def test_mirror_scatter_many_matches_scatter():
+    # GIVEN a mirror hit by random rays
+    rng = np.random.default_rng(3)
+    directions = rng.normal(size=(50, 3))
+    normals = rng.normal(size=(50, 3))
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    # normals face the incomming rays
+    normals *= -np.sign(np.einsum("ij,ij->i", directions, normals))[:, None]
+    points = rng.normal(size=(50, 3))
+    mirror = Metal(Color(Vector([0.9, 0.9, 0.9])), fuzz=0.0)
+    table = MaterialTable.from_materials([mirror])
+
+    # WHEN scattering them all at once
+    scattered, alive = Metal.scatter_many(
+        rng, directions, normals, points, np.ones(50, bool), table, np.zeros(50, int)
+    )
+
+    # THEN every ray scatters as with the single ray scatter
+    assert alive.all()
+    for d, n, p, s in zip(directions, normals, points, scattered):
+        expected = mirror.scatter(
+            Ray(Vec3(*p), Vec3(*d)), Vec3(*n), Vec3(*p), True
+        ).ray.direction
+        np.testing.assert_allclose(
+            s / np.linalg.norm(s), np.array(expected) / expected.length()
+        )
+
+
+def test_dialetric_scatter_many_matches_scatter():
+    # GIVEN glass hit by random rays from outside and inside
+    rng = np.random.default_rng(3)
+    directions = rng.normal(size=(200, 3))
+    normals = rng.normal(size=(200, 3))
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    # normals face the incomming rays
+    normals *= -np.sign(np.einsum("ij,ij->i", directions, normals))[:, None]
+    points = rng.normal(size=(200, 3))
+    front_facing = rng.random(200) < 0.5
+    glass = Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5)
+    table = MaterialTable.from_materials([glass])
+
+    # WHEN scattering them all at once, drawing the same numbers as one by one
+    scattered, alive = Dialetric.scatter_many(
+        np.random.default_rng(4),
+        directions,
+        normals,
+        points,
+        front_facing,
+        table,
+        np.zeros(200, int),
+    )
+    sampler = FixedSampler(np.random.default_rng(4).random(200))
+
+    # THEN every ray scatters as with the single ray scatter
+    assert alive.all()
+    for d, n, p, f, s in zip(directions, normals, points, front_facing, scattered):
+        expected = glass.scatter(
+            Ray(Vec3(*p), Vec3(*d)), Vec3(*n), Vec3(*p), bool(f), sampler
+        ).ray.direction
+        np.testing.assert_allclose(
+            s / np.linalg.norm(s), np.array(expected) / expected.length()
+        )
+
+    # THEN both the random reflection and the refraction were compared
+    unit = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    cos_theta = np.einsum("ij,ij->i", -unit, normals)
+    ratio = np.where(front_facing, 1 / 1.5, 1.5)
+    total_reflection = ratio * np.sqrt(1 - cos_theta**2) > 1.0
+    reflected = np.einsum("ij,ij->i", scattered, normals) > 0
+    assert (reflected & ~total_reflection).any()
+    assert (~reflected).any()
+
+
+def test_lambertian_scatter_many_is_cosine_weighted():
+    rng = np.random.default_rng(4)
+    normals = np.tile([0.0, 1.0, 0.0], (20_000, 1))
+    table = MaterialTable.from_materials([Lambertian(Color(Vector([0.5, 0.5, 0.5])))])
+
+    scattered, alive = Lambertian.scatter_many(
+        rng,
+        -normals,
+        normals,
+        np.zeros_like(normals),
+        np.ones(20_000, bool),
+        table,
+        np.zeros(20_000, int),
+    )
+
+    assert alive.all()
+    np.testing.assert_allclose(np.linalg.norm(scattered, axis=1), 1.0)
+    assert scattered[:, 1].min() >= 0.0
+    assert scattered[:, 1].mean() == pytest.approx(2 / 3, abs=0.01)
+
+
+def test_wavefront_scatter_groups_by_kind():
+    # GIVEN hits on interleaved absorbing, mirror and light materials
+    table = MaterialTable.from_materials(
+        [
+            DefaultMaterial(),
+            Metal(Color(Vector([0.9, 0.9, 0.9])), fuzz=0.0),
+            DiffuseLight(Color(Vector([1.0, 1.0, 1.0]))),
+        ]
+    )
+    ids = np.array([1, 0, 2, 1, 0, 1])
+    directions = np.tile([1.0, -1.0, 0.0], (6, 1))
+    normals = np.tile([0.0, 1.0, 0.0], (6, 1))
+
+    # WHEN scattering them in one bounce
+    scattered, alive = wavefront.scatter(
+        table,
+        np.random.default_rng(5),
+        directions,
+        normals,
+        np.zeros((6, 3)),
+        np.ones(6, bool),
+        ids,
+    )
+
+    # THEN only the mirror hits scatter, each in place
+    np.testing.assert_equal(alive, ids == 1)
+    np.testing.assert_allclose(
+        scattered[alive], np.tile([1.0, 1.0, 0.0], (3, 1)) / math.sqrt(2)
+    )
+
+
+def test_material_table_from_arrays_creates_materials_lazily():
+    # GIVEN a table packed from one material of every kind
+    materials = [
+        DefaultMaterial(),
+        Lambertian(Color(Vector([0.2, 0.4, 0.6]))),
+        Metal(Color(Vector([0.8, 0.6, 0.2])), fuzz=0.3),
+        Dialetric(Color(Vector([1.0, 1.0, 1.0])), 1.5),
+        DiffuseLight(Color(Vector([4.0, 4.0, 4.0]))),
+    ]
+    packed = MaterialTable.from_materials(materials)
+
+    # WHEN unpacking its arrays into a new table
+    table = MaterialTable.from_arrays(
+        packed.kinds,
+        packed.albedo,
+        packed.fuzz,
+        packed.refraction_index,
+        packed.emission,
+    )
+
+    # THEN every row becomes a material like the original, once
+    assert len(table.materials) == len(materials)
+    for original, material in zip(materials, table.materials):
+        assert type(material) is type(original)
+        assert list(material.attentuition) == list(original.attentuition)
+    assert table.materials[2].fuzz == 0.3
+    assert table.materials[3].refraction_index == 1.5
+    assert list(table.materials[-1].emission) == [4.0, 4.0, 4.0]
+    assert table.materials[1] is table.materials[1]
+    with pytest.raises(IndexError):
+        table.materials[5]
@@ -0,0 +1,78 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3, benchmark
+from raytracer.definitions.vector import Vector
+
+
+def test_arithmetic():
+    a = Vec3(1.0, 2.0, 3.0)
+    b = Vec3(4.0, 5.0, 6.0)
+
+    assert a + b == Vec3(5.0, 7.0, 9.0)
+    assert b - a == Vec3(3.0, 3.0, 3.0)
+    assert a * b == Vec3(4.0, 10.0, 18.0)
+    assert 2 * a == a * 2 == Vec3(2.0, 4.0, 6.0)
+    assert a / 2 == Vec3(0.5, 1.0, 1.5)
+    assert -a == Vec3(-1.0, -2.0, -3.0)
+    assert a.dot(b) == 32.0
+    assert a.cross(b) == Vec3(-3.0, 6.0, -3.0)
+    assert Vec3(3.0, 4.0, 0.0).length() == 5.0
+    assert Vec3(3.0, 4.0, 0.0).unit() == Vec3(0.6, 0.8, 0.0)
+
+
+@pytest.mark.parametrize(
+    "op",
+    [
+        lambda a, b: a + b,
+        lambda a, b: a - b,
+        lambda a, b: a * b,
+        lambda a, b: np.float64(0.5) * a,
+        lambda a, b: a.dot(b),
+    ],
+)
+def test_matches_vector(op):
+    """Operations mixing Vec3 with Vector or numpy scalars match Vector math."""
+    a, b = Vector([0.1, 0.2, 0.3]), Vector([-1.0, 0.5, 2.0])
+
+    expected = op(a, b)
+
+    np.testing.assert_allclose(op(Vec3.from_vector(a), Vec3.from_vector(b)), expected)
+    np.testing.assert_allclose(op(Vec3.from_vector(a), b), expected)
+    np.testing.assert_allclose(op(a, Vec3.from_vector(b)), expected)
+
+
+def test_numpy_defers_to_vec3():
+    result = Vector([1.0, 2.0, 3.0]) + Vec3(1.0, 1.0, 1.0)
+
+    assert type(result) is Vec3
+    assert result == Vec3(2.0, 3.0, 4.0)
+
+
+def test_conversion():
+    v = Vector([1.0, 2.0, 3.0])
+
+    assert Vec3.from_vector(v).to_vector().tolist() == v.tolist()
+    np.testing.assert_equal(np.asarray(Vec3(1.0, 2.0, 3.0)), v)
+    assert pickle.loads(pickle.dumps(Vec3(1.0, 2.0, 3.0))) == Vec3(1.0, 2.0, 3.0)
+
+
+def test_ray_at():
+    ray = Ray(Vec3(1.0, 2.0, 3.0), Vec3(1.0, 1.0, 1.0))
+
+    assert ray.at(10) == Vec3(11.0, 12.0, 13.0)
+
+
+def test_random_unit_vector():
+    for _ in range(10):
+        assert Vec3.random_unit_vector().length() == pytest.approx(1.0)
+
+
+def test_benchmark_reports_every_operation():
+    timings = benchmark(number=10)
+
+    assert "reflect" in timings
+    assert set(timings["reflect"]) == {"Vector", "Vec3"}
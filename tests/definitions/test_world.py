@@ -1,7 +1,152 @@
-from raytracer.definitions.world import World
+import math
+
+import numpy as np
+import pytest
+
+from raytracer.bvh import BVH
+from raytracer.definitions.material import (
+    DiffuseLight,
+    Lambertian,
+    MaterialKind,
+    Metal,
+)
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.definitions.world import PrimaryView, World
+from raytracer.hitable import Sphere
 
 
 def test_single_hittable():
     world = World()
     world.add(None)
     # TODO: install MagicMock and write a test
+
+
+def test_freeze_packs_spheres_and_materials():
+    # GIVEN a world with two spheres sharing a material
+    shared = Lambertian(Color(Vector([0.1, 0.2, 0.3])))
+    metal = Metal(Color(Vector([0.5, 0.5, 0.5])), fuzz=0.3)
+    world = (
+        World()
+        .add(Sphere(Point(Vector([0, 0, -1])), 0.5, shared))
+        .add(Sphere(Point(Vector([1, 0, -1])), 0.25, metal))
+        .add(Sphere(Point(Vector([2, 0, -1])), 0.75, shared))
+    )
+
+    # WHEN freezing it
+    frozen = world.freeze()
+
+    # THEN geometry and materials are packed into contiguous arrays
+    np.testing.assert_equal(frozen.centers, [[0, 0, -1], [1, 0, -1], [2, 0, -1]])
+    np.testing.assert_equal(frozen.radii, [0.5, 0.25, 0.75])
+    np.testing.assert_equal(frozen.material_ids, [0, 1, 0])
+    assert frozen.centers.flags.c_contiguous
+    assert frozen.materials.materials == [shared, metal]
+    np.testing.assert_equal(
+        frozen.materials.kinds, [MaterialKind.LAMBERTIAN, MaterialKind.METAL]
+    )
+    np.testing.assert_equal(frozen.materials.albedo, [[0.1, 0.2, 0.3], [0.5] * 3])
+    np.testing.assert_equal(frozen.materials.fuzz, [0.0, 0.3])
+
+
+def test_frozen_hit_matches_world_hit(world):
+    frozen = world.freeze()
+    rng = np.random.default_rng(0)
+
+    for direction in rng.uniform(-1, 1, (100, 3)):
+        ray = Ray(Point(Vector([0, 0, 0])), Vector(direction))
+        expected = world.hit(ray, 0.001, math.inf)
+        record = frozen.hit(ray, 0.001, math.inf)
+
+        if expected is None:
+            assert record is None
+        else:
+            assert record.distance == pytest.approx(expected.distance)
+            np.testing.assert_allclose(record.normal, expected.normal)
+            assert record.front_facing == expected.front_facing
+            assert record.material is expected.material
+
+
+def test_freeze_empty_world():
+    frozen = World().freeze()
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, 0, -1]))
+
+    assert frozen.hit(ray, 0.001, math.inf) is None
+
+
+def test_lights_are_collected():
+    # GIVEN a world with a light between other spheres
+    light = Sphere(Point(Vector([0, 2, -1])), 0.1, DiffuseLight(Color(Vector([4] * 3))))
+    world = (
+        World()
+        .add(Sphere(Point(Vector([0, 0, -1])), 0.5))
+        .add(light)
+        .add(Sphere(Point(Vector([1, 0, -1])), 0.5))
+    )
+
+    # WHEN / THEN every representation of it knows the light
+    assert world.lights == [light]
+    assert world.freeze().lights == [light]
+    assert BVH.from_world(world).lights == [light]
+    np.testing.assert_equal(world.freeze().materials.emission[1], [4, 4, 4])
+
+
+@pytest.fixture
+def viewport() -> np.ndarray:
+    """Corners of a viewport at z = -1 with a 90 degree field of view."""
+    return np.array([[-1, 1, -1], [1, 1, -1], [1, -1, -1], [-1, -1, -1]], float)
+
+
+def test_primary_view_culls_spheres_outside_the_frustum(viewport):
+    # GIVEN spheres in view, behind the camera, beside the frustum and one
+    # overlapping the frustum's edge
+    world = (
+        World()
+        .add(Sphere(Point(Vector([0, 0, -5])), 1.0))
+        .add(Sphere(Point(Vector([0, 0, 5])), 1.0))
+        .add(Sphere(Point(Vector([10, 0, -5])), 1.0))
+        .add(Sphere(Point(Vector([5.5, 0, -5])), 1.0))
+        .add(Sphere(Point(Vector([0, 0, 0.5])), 1.0))
+    )
+
+    # WHEN viewing them from the origin
+    view = PrimaryView(world.freeze(), np.zeros(3), viewport)
+
+    # THEN only the spheres which can be hit by camera rays are kept
+    assert view.visible.tolist() == [0, 3, 4]
+
+
+def test_primary_view_matches_frozen_world(world, viewport):
+    frozen = world.freeze()
+    view = PrimaryView(frozen, np.zeros(3), viewport)
+    rng = np.random.default_rng(0)
+    directions = np.c_[rng.uniform(-1, 1, (200, 2)), -np.ones(200)]
+
+    for direction in directions:
+        ray = Ray(Point(Vector([0, 0, 0])), Vector(direction))
+        assert view.hit(ray, 0.001, math.inf) == frozen.hit(ray, 0.001, math.inf)
+
+    t, index = view.intersect_many(directions, 0.001, math.inf)
+    expected_t, expected_index = frozen.intersect_many(
+        np.zeros_like(directions), directions, 0.001, math.inf
+    )
+    np.testing.assert_allclose(t, expected_t)
+    np.testing.assert_equal(index, expected_index)
+
+
+def test_hit_builds_only_the_closest_record(mocker):
+    # GIVEN a row of spheres along the ray, the closest one added last
+    world = World()
+    spheres = [Sphere(Point(Vector([0, 0, -z])), 0.5) for z in (8, 6, 4, 2)]
+    for sphere in spheres:
+        world.add(sphere)
+        mocker.spy(sphere, "surface_info")
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, 0, -1]))
+
+    # WHEN hitting the world
+    record = world.hit(ray, 0.001, math.inf)
+
+    # THEN every sphere is closer than the previous one, but only the record of
+    # the closest is built
+    assert record.distance == pytest.approx(1.5)
+    assert [s.surface_info.call_count for s in spheres] == [0, 0, 0, 1]
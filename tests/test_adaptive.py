@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from raytracer import adaptive
+from raytracer.definitions.world import World
+from raytracer.raytracer import RayTracer
+
+
+def test_error_of_constant_samples_is_zero():
+    """Test that pixels without variance have no error."""
+    # GIVEN
+    sums = np.array([[4.0, 4.0, 4.0], [0.0, 0.0, 0.0]])
+    luminance_sq = np.array([4.0, 0.0])
+
+    # WHEN
+    error = adaptive.error(sums, luminance_sq, np.array([4, 4]))
+
+    # THEN
+    assert error == pytest.approx([0.0, 0.0])
+
+
+def test_error_shrinks_with_samples():
+    """Test that the error is the gamma corrected 95% confidence interval."""
+
+    # GIVEN samples 0 and 0.5 of equal frequency, with mean 0.25 and variance 1/12
+    def moments(n):
+        luminance = np.tile([0.0, 0.5], n // 2)
+        return (
+            np.full((1, 3), luminance.sum()),
+            np.array([(luminance**2).sum()]),
+            np.array([n]),
+        )
+
+    # WHEN
+    error_4, error_16 = adaptive.error(*moments(4)), adaptive.error(*moments(16))
+
+    # THEN
+    linear = 1.96 * np.sqrt(1 / 12 / 4)
+    assert error_4[0] == pytest.approx(linear / (2 * np.sqrt(0.25)))
+    assert error_16[0] < error_4[0] / 1.9
+
+
+def test_render_tile_samples_noisy_blocks():
+    """Test that noisy pixels and their neighbours sample up to the maximum."""
+    # GIVEN a row of pixels where only the first one is noisy
+    rng = np.random.default_rng(0)
+
+    def sample(i, j, n):
+        colors = np.full((len(i), n, 3), 0.5)
+        colors[i == 0] = rng.random((np.count_nonzero(i == 0), n, 1))
+        luminance = colors @ adaptive.LUMINANCE
+        return colors.sum(axis=1), (luminance**2).sum(axis=1)
+
+    # WHEN
+    pixels, counts = adaptive.render_tile(
+        sample, range(1), range(5), min_samples=4, max_samples=32, tolerance=0.01
+    )
+
+    # THEN
+    assert counts.tolist() == [[32, 32, 4, 4, 4]]
+    assert pixels[0, 2:] == pytest.approx(np.full((3, 3), 0.5))
+
+
+@pytest.mark.parametrize("wavefront", [False, True])
+def test_adaptive_render(world, wavefront):
+    """Test that the sky converges at the minimum and noisy pixels sample more."""
+
+    # GIVEN
+    def render(world):
+        tracer = RayTracer(
+            2.0,
+            16,
+            samples_per_pixel=32,
+            max_recursion_depth=5,
+            wavefront=wavefront,
+            seed=0,
+            adaptive_tolerance=0.02,
+            min_samples_per_pixel=4,
+        )
+        # WHEN
+        tracer.render_framebuffer(world)
+        return tracer
+
+    sky, scene = render(World()), render(world)
+
+    # THEN
+    assert (sky.spp_map == 4).all()
+    assert scene.spp_map.min() == 4
+    assert scene.spp_map.max() == 32
+    assert scene.path_lengths.sum() == scene.spp_map.sum()
+
+
+def test_adaptive_render_is_not_progressive(tmp_path):
+    with pytest.raises(ValueError):
+        RayTracer(2.0, 8, adaptive_tolerance=0.1, checkpoint=tmp_path / "a.npy")
+
+
+def test_save_spp_map(tmp_path):
+    """Test that the spp map is saved raw as .npy or normalized as image."""
+    # GIVEN
+    spp_map = np.array([[4, 8], [16, 32]])
+
+    # WHEN
+    adaptive.save_spp_map(tmp_path / "spp.npy", spp_map)
+    adaptive.save_spp_map(tmp_path / "spp.pfm", spp_map)
+
+    # THEN
+    assert (np.load(tmp_path / "spp.npy") == spp_map).all()
+    pfm = np.frombuffer((tmp_path / "spp.pfm").read_bytes()[-16 * 3 :], "<f4")
+    assert pfm.reshape(2, 2, 3)[::-1, :, 0].tolist() == [[0.125, 0.25], [0.5, 1.0]]
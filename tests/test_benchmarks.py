@@ -0,0 +1,88 @@
+import json
+
+from typer.testing import CliRunner
+
+from raytracer import benchmarks, scenes
+from raytracer.benchmarks import render
+from raytracer.main import app
+
+
+def test_render_benchmark_counts_rays():
+    """Test that a render benchmark reports the throughput of the render."""
+    # GIVEN / WHEN
+    result = render.run_one(
+        "four_spheres", "wavefront", image_width=16, samples_per_pixel=2
+    )
+
+    # THEN
+    assert result.samples == result.width * result.height * 2
+    assert result.rays > result.samples
+    assert result.rays_per_second > result.samples_per_second > 0
+
+
+def test_render_benchmark_scaling_curve():
+    """Test that renders are repeated for every number of workers and backend."""
+    # GIVEN / WHEN
+    results = render.run(
+        ["four_spheres"],
+        ["wavefront"],
+        workers=[1, 2],
+        backends=["process", "thread"],
+        image_width=8,
+        samples_per_pixel=1,
+    )
+
+    # THEN
+    assert [(r.backend, r.workers) for r in results] == [
+        ("process", 1),
+        ("process", 2),
+        ("thread", 1),
+        ("thread", 2),
+    ]
+
+
+def test_run_is_json_serializable():
+    """Test that the report covers all operations, scenes and modes."""
+    # GIVEN / WHEN
+    report = benchmarks.run(micro_number=5, image_width=8, samples_per_pixel=1)
+
+    # THEN
+    assert "Sphere.hit" in report["micro_us_per_call"]
+    assert "Vec3.dot" in report["micro_us_per_call"]
+    assert len(report["render"]) == 3 * len(scenes.SCENES)
+    assert report["peak_rss_bytes"] > 0
+    json.dumps(report)
+
+
+def test_bench_command(tmp_path):
+    """Test that the bench command writes the report to a file."""
+    # GIVEN
+    output = tmp_path / "bench.json"
+
+    # WHEN
+    result = CliRunner().invoke(
+        app,
+        [
+            "bench",
+            "--scene",
+            "four_spheres",
+            "--mode",
+            "scalar",
+            "--image-width",
+            "8",
+            "--samples-per-pixel",
+            "1",
+            "--micro-number",
+            "0",
+            "-o",
+            str(output),
+        ],
+    )
+
+    # THEN
+    assert result.exit_code == 0, result.output
+    report = json.loads(output.read_text())
+    assert report["micro_us_per_call"] == {}
+    assert [(r["scene"], r["mode"]) for r in report["render"]] == [
+        ("four_spheres", "scalar")
+    ]
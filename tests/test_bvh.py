@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+import pytest
+
+from raytracer.bvh import BVH, build, build_linear
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Point, Vector
+from raytracer.definitions.world import World
+from raytracer.hitable import Sphere
+
+
+@pytest.fixture
+def random_world() -> World:
+    """A ground sphere with many small spheres on top, as in the book's final scene."""
+    rng = np.random.default_rng(0)
+    world = World().add(Sphere(Point(Vector([0, -1000, 0])), 1000))
+    for x, z in rng.uniform(-11, 11, (200, 2)):
+        world.add(Sphere(Point(Vector([x, 0.2, z])), 0.2))
+    return world
+
+
+@pytest.mark.parametrize("builder", [build, build_linear])
+def test_build_covers_every_primitive_once(builder):
+    rng = np.random.default_rng(0)
+    lower = rng.uniform(-10, 10, (100, 3))
+    upper = lower + rng.uniform(0, 1, (100, 3))
+
+    nodes = builder(lower, upper, max_leaf_size=2)
+
+    assert sorted(nodes.order.tolist()) == list(range(100))
+    assert nodes.count.max() <= 4
+    # every leaf's bounds enclose its primitives
+    for start, count, lo, hi in zip(nodes.start, nodes.count, nodes.lower, nodes.upper):
+        primitives = nodes.order[start : start + count]
+        assert np.all(lo <= lower[primitives]) and np.all(upper[primitives] <= hi)
+
+
+@pytest.mark.parametrize("builder", [build, build_linear])
+def test_children_are_enclosed_by_their_parents(builder):
+    rng = np.random.default_rng(0)
+    lower = rng.uniform(-10, 10, (100, 3))
+    upper = lower + rng.uniform(0, 1, (100, 3))
+
+    nodes = builder(lower, upper, max_leaf_size=2)
+
+    for node in np.flatnonzero(nodes.count == 0):
+        for child in (node + 1, nodes.second_child[node]):
+            assert np.all(nodes.lower[node] <= nodes.lower[child])
+            assert np.all(nodes.upper[child] <= nodes.upper[node])
+
+
+def test_build_linear_with_equal_centroids():
+    # GIVEN primitives which all share their Morton code
+    lower = np.zeros((50, 3))
+
+    # WHEN building the tree
+    nodes = build_linear(lower, lower + 1, max_leaf_size=4)
+
+    # THEN the leaves are split in halves
+    assert sorted(nodes.order.tolist()) == list(range(50))
+    assert nodes.depth() == 5
+
+
+def test_hit_matches_world(random_world):
+    bvh = BVH.from_world(random_world)
+    rng = np.random.default_rng(1)
+
+    for _ in range(200):
+        origin = Point(Vector(rng.uniform(-12, 12, 3) + [0, 3, 0]))
+        ray = Ray(origin, Vector(rng.uniform(-1, 1, 3)))
+        expected = random_world.hit(ray, 0.001, math.inf)
+        record = bvh.hit(ray, 0.001, math.inf)
+
+        assert (record is None) == (expected is None)
+        if record is not None:
+            assert record == expected
+
+
+def test_occluded_matches_hit(random_world):
+    bvh = BVH.from_world(random_world)
+    frozen = random_world.freeze()
+    rng = np.random.default_rng(2)
+
+    for _ in range(200):
+        origin = Point(Vector(rng.uniform(-12, 12, 3) + [0, 3, 0]))
+        ray = Ray(origin, Vector(rng.uniform(-1, 1, 3)))
+        t_max = rng.uniform(0, 20)
+        expected = random_world.hit(ray, 0.001, t_max) is not None
+
+        assert bvh.occluded(ray, 0.001, t_max) == expected
+        assert random_world.occluded(ray, 0.001, t_max) == expected
+        assert frozen.occluded(ray, 0.001, t_max) == expected
+
+
+def test_large_primitives_are_kept_out_of_the_tree(random_world):
+    bvh = BVH.from_world(random_world)
+
+    assert bvh.large == random_world.hittables[:1]
+    assert bvh.nodes.upper[0, 1] == pytest.approx(0.4)
+
+
+def test_build_statistics(random_world):
+    bvh = BVH.from_world(random_world)
+
+    assert bvh.build_time > 0
+    assert bvh.nbytes == bvh.nodes.nbytes > 0
+    assert bvh.nodes.depth() < 20
+
+
+def test_empty():
+    bvh = BVH([])
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, 0, -1]))
+
+    assert bvh.hit(ray, 0.001, math.inf) is None
@@ -1,7 +1,9 @@
 import pytest
-from raytracer.color import clamp, write_color
+from raytracer.color import clamp, to_bytes, write_color
 import io
 
+import numpy as np
+
 from raytracer.definitions.vector import Color, Vector
 
 
@@ -20,3 +22,17 @@ def test_clamp(x, res):
     x_max = 1.0
 
     assert clamp(x, x_min, x_max) == res
+
+
+def test_to_bytes_matches_write_color():
+    # GIVEN random colors including values outside of [0, 1]
+    framebuffer = np.random.default_rng(0).uniform(-0.2, 1.2, (4, 5, 3))
+
+    # WHEN quantizing them all at once
+    quantized = to_bytes(framebuffer)
+
+    # THEN every pixel equals the one written by write_color
+    for color, expected in zip(framebuffer.reshape(-1, 3), quantized.reshape(-1, 3)):
+        out = io.StringIO()
+        write_color(out, np.clip(color, 0.0, 1.0))
+        assert out.getvalue() == "{} {} {}\n".format(*expected)
@@ -0,0 +1,261 @@
+import contextlib
+import json
+import multiprocessing
+import socket
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from raytracer import distributed, scenefile, scenes
+from raytracer.main import app
+from raytracer.raytracer import RayTracer
+from raytracer.sinks import BufferSink
+
+SETTINGS = {
+    "aspect_ratio": 2.0,
+    "image_width": 12,
+    "samples_per_pixel": 2,
+    "max_recursion_depth": 5,
+    "seed": 42,
+    "tile_size": 4,
+    "record_spp_map": True,
+}
+
+
+def test_message_round_trip():
+    # GIVEN a connected pair of sockets
+    a, b = socket.socketpair()
+    pixels = np.arange(24.0).reshape(2, 4, 3)
+
+    # WHEN sending a header with arrays
+    distributed.send_message(a, {"type": "result"}, {"pixels": pixels})
+    header, arrays = distributed.receive_message(b)
+
+    # THEN both arrive unchanged
+    assert header == {"type": "result"}
+    assert np.array_equal(arrays["pixels"], pixels)
+    assert arrays["pixels"].dtype == pixels.dtype
+
+
+def test_object_arrays_are_rejected():
+    # GIVEN a message claiming to carry an array of python objects
+    a, b = socket.socketpair()
+    header = b'{"type": "result", "arrays": [["x", "|O", [1], 8]]}'
+    a.sendall(len(header).to_bytes(8, "little") + header + bytes(8))
+
+    # WHEN / THEN it is not unpickled but rejected
+    with pytest.raises(ValueError):
+        distributed.receive_message(b)
+
+
+@pytest.mark.parametrize(
+    ("arrays", "match"),
+    [
+        ([["x", "<f8", [2, 3], 8]], "is not nbytes=8"),
+        ([["x", "<f8", [2, -3], -48]], "is not"),
+        ([["x", "<f8", [1 << 20, 3], 3 << 23]], "exceed 64"),
+        ([["x", "<f8", [2, 3], 48], ["y", "<f8", [3], 24]], "exceed 64"),
+    ],
+)
+def test_arrays_are_checked_before_they_are_received(arrays, match):
+    # GIVEN a message whose arrays do not match their size or are too large
+    a, b = socket.socketpair()
+    header = json.dumps({"type": "result", "arrays": arrays}).encode()
+    a.sendall(len(header).to_bytes(8, "little") + header)
+
+    # WHEN / THEN it is rejected without waiting for the payload
+    with pytest.raises(ValueError, match=match):
+        distributed.receive_message(b, max_size=64)
+
+
+def test_large_headers_are_rejected():
+    a, b = socket.socketpair()
+    a.sendall((distributed.MAX_HEADER + 1).to_bytes(8, "little"))
+
+    with pytest.raises(ValueError, match="Header of"):
+        distributed.receive_message(b)
+
+
+def _start_workers(coordinator, n):
+    # spawned rather than forked, a fork could copy locks held by the threads
+    # of the coordinator
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=distributed.work, args=(coordinator.address,))
+        for _ in range(n)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def _coordinate(coordinator):
+    tracer = coordinator.tracer
+    sink = BufferSink(tracer.image_height, tracer.image_width)
+    coordinator.render(sink)
+    return sink.framebuffer
+
+
+def _local_render(world, **settings):
+    return RayTracer(**{**SETTINGS, **settings}).render_framebuffer(world)
+
+
+def test_workers_render_the_local_image(world):
+    # GIVEN a coordinator with two worker processes
+    coordinator = distributed.Coordinator(world, SETTINGS, ("127.0.0.1", 0))
+    workers = _start_workers(coordinator, 2)
+
+    # WHEN rendering
+    framebuffer = _coordinate(coordinator)
+
+    # THEN the image is the one rendered locally with the same seed
+    for worker in workers:
+        worker.join(10)
+        assert worker.exitcode == 0
+    assert np.array_equal(framebuffer, _local_render(world))
+    assert (coordinator.tracer.spp_map == 2).all()
+
+
+def test_passes_are_merged(world):
+    # GIVEN a coordinator handing out one sample per pixel at a time
+    coordinator = distributed.Coordinator(
+        world, {**SETTINGS, "samples_per_pass": 1}, ("127.0.0.1", 0)
+    )
+    workers = _start_workers(coordinator, 1)
+
+    # WHEN rendering
+    framebuffer = _coordinate(coordinator)
+
+    # THEN every pixel has all samples
+    for worker in workers:
+        worker.join(10)
+    assert (coordinator.tracer.spp_map == 2).all()
+    assert framebuffer.shape == (6, 12, 3)
+    assert np.isfinite(framebuffer).all()
+
+
+def _take_a_tile(address, release: threading.Event):
+    """A worker which takes a tile and then dies or hangs until released."""
+    with socket.create_connection(address) as sock:
+        distributed.send_message(sock, {"type": "hello"})
+        distributed.receive_message(sock)
+        distributed.send_message(sock, {"type": "ready"})
+        distributed.receive_message(sock)
+        release.wait(10)
+
+
+@pytest.mark.parametrize("hang", [False, True])
+def test_tiles_of_lost_workers_are_handed_out_again(world, hang):
+    # GIVEN a coordinator with a short timeout
+    coordinator = distributed.Coordinator(
+        world, SETTINGS, ("127.0.0.1", 0), timeout=0.5
+    )
+    # and a worker that takes a tile and disconnects or never answers
+    release = threading.Event()
+    if not hang:
+        release.set()
+    lost = threading.Thread(target=_take_a_tile, args=(coordinator.address, release))
+    lost.start()
+
+    # WHEN a healthy worker joins
+    workers = _start_workers(coordinator, 1)
+    framebuffer = _coordinate(coordinator)
+    release.set()
+    lost.join()
+
+    # THEN its tile is rendered by the other worker
+    for worker in workers:
+        worker.join(10)
+    assert np.array_equal(framebuffer, _local_render(world))
+
+
+def _send_malformed_result(address):
+    """A worker which answers its tile with pixels of the wrong shape."""
+    with socket.create_connection(address) as sock:
+        distributed.send_message(sock, {"type": "hello"})
+        distributed.receive_message(sock)
+        distributed.send_message(sock, {"type": "ready"})
+        distributed.receive_message(sock)
+        distributed.send_message(
+            sock,
+            {"type": "result", "stats": None},
+            {
+                "pixels": np.zeros((1, 1, 3)),
+                "samples": np.ones((1, 1), dtype=np.int64),
+                "path_lengths": np.zeros(6, dtype=np.int64),
+            },
+        )
+        # until the coordinator hangs up
+        with contextlib.suppress(ConnectionError):
+            distributed.receive_message(sock)
+
+
+def test_malformed_results_are_handed_out_again(world):
+    # GIVEN a coordinator and a worker answering with a malformed result
+    coordinator = distributed.Coordinator(world, SETTINGS, ("127.0.0.1", 0))
+    malformed = threading.Thread(
+        target=_send_malformed_result, args=(coordinator.address,)
+    )
+    malformed.start()
+
+    # WHEN a healthy worker joins
+    workers = _start_workers(coordinator, 1)
+    framebuffer = _coordinate(coordinator)
+    malformed.join()
+
+    # THEN the tile is rendered again by the other worker
+    for worker in workers:
+        worker.join(10)
+    assert np.array_equal(framebuffer, _local_render(world))
+    assert (coordinator.tracer.spp_map == 2).all()
+
+
+@pytest.mark.parametrize("from_file", [False, True])
+def test_coordinator_and_worker_commands(tmp_path, from_file):
+    # GIVEN the built-in scene or a scene file
+    scene = []
+    if from_file:
+        scene = [str(tmp_path / "scene.rts")]
+        scenefile.save(tmp_path / "scene.rts", scenes.four_spheres())
+
+    # GIVEN a free port and a worker waiting for a coordinator on it
+    with socket.create_server(("127.0.0.1", 0)) as probe:
+        port = probe.getsockname()[1]
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "from raytracer.main import cli; cli()",
+            "worker",
+            f"127.0.0.1:{port}",
+        ]
+    )
+
+    # WHEN the coordinator renders the scene
+    output = tmp_path / "image.ppm"
+    result = CliRunner().invoke(
+        app,
+        [
+            "coordinator",
+            *scene,
+            "--port",
+            str(port),
+            "--image-width",
+            "8",
+            "--samples-per-pixel",
+            "1",
+            "--seed",
+            "1",
+            "-o",
+            str(output),
+        ],
+    )
+
+    # THEN the worker rendered the image
+    assert worker.wait(10) == 0
+    assert result.exit_code == 0, result.output
+    assert output.read_text().split()[:3] == ["P3", "8", "4"]
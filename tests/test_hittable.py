@@ -1,8 +1,12 @@
+import math
+
 import numpy as np
+import pytest
 
 from raytracer.definitions.vector import Point, Vector
 from raytracer.hitable import Record, Sphere
 from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
 
 
 def test_hit_sphere_two():
@@ -97,3 +101,47 @@ def test_hit_sphere_zero():
 
     # THEN the ray is never hit
     assert not sphere.hit(ray)
+
+
+def test_sample_direction_hits_the_sphere():
+    # GIVEN a sphere seen from a point outside of it
+    sphere = Sphere(Point(Vector([1, 2, -3])), radius=0.5)
+    origin = Vec3(0.0, 0.0, 0.0)
+    rng = np.random.default_rng(0)
+
+    for u, v in rng.random((100, 2)):
+        # WHEN sampling a direction towards it
+        direction, distance, pdf = sphere.sample_direction(origin, u, v)
+
+        # THEN the direction hits it at the distance, where the density agrees
+        record = sphere.hit(Ray(origin, direction), 0.0, math.inf)
+        assert record.distance == pytest.approx(distance)
+        assert sphere.light_pdf(origin, record.point) == pytest.approx(pdf)
+
+    # the density is uniform over the solid angle of the sphere
+    sin_max_sq = 0.25 / 14
+    solid_angle = 2 * math.pi * (1 - math.sqrt(1 - sin_max_sq))
+    assert pdf * solid_angle == pytest.approx(1.0)
+
+
+def test_sample_direction_from_inside():
+    sphere = Sphere(Point(Vector([0, 0, 0])), radius=1.0)
+
+    assert sphere.sample_direction(Vec3(0.1, 0.0, 0.0), 0.5, 0.5) is None
+    assert sphere.light_pdf(Vec3(0.0, 0.0, 2.0), Vec3(0.0, 0.0, 1.5)) == 0.0
+
+
+def test_intersect_and_surface_info_match_hit():
+    # GIVEN a sphere in front of the origin
+    sphere = Sphere(Point(Vector([0, 0, -1])), radius=0.5)
+    ray = Ray(Point(Vector([0, 0, 0])), direction=Vector([0.1, 0.2, -1]))
+
+    # WHEN intersecting in two phases
+    t, part = sphere.intersect(ray, 0.0, math.inf)
+
+    # THEN the distance and the record match the single phase hit
+    record = sphere.hit(ray, 0.0, math.inf)
+    assert t == record.distance
+    assert sphere.surface_info(ray, t, part) == record
+    # and a miss has no distance
+    assert sphere.intersect(ray, 0.0, 0.1) is None
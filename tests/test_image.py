@@ -0,0 +1,101 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from raytracer.color import to_bytes
+from raytracer.image import (
+    ImageFormat,
+    save_image,
+    write_image,
+    write_pfm,
+    write_png,
+    write_ppm_p3,
+    write_ppm_p6,
+)
+from raytracer.raytracer import output_ppm
+
+
+@pytest.fixture
+def framebuffer() -> np.ndarray:
+    return np.random.default_rng(0).uniform(0.0, 1.0, (3, 4, 3))
+
+
+def test_p3_matches_output_ppm(framebuffer):
+    expected = io.StringIO()
+    output_ppm(expected, 3, 4, lambda i, j: framebuffer[j, i])
+
+    out = io.StringIO()
+    write_ppm_p3(out, framebuffer)
+
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_p6(framebuffer):
+    out = io.BytesIO()
+    write_ppm_p6(out, framebuffer)
+
+    assert out.getvalue() == b"P6\n4 3\n255\n" + to_bytes(framebuffer).tobytes()
+
+
+def test_png(framebuffer):
+    out = io.BytesIO()
+    write_png(out, framebuffer)
+    data = out.getvalue()
+
+    # GIVEN the chunks of the png
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks, offset = {}, 8
+    while offset < len(data):
+        (length,) = struct.unpack(">I", data[offset : offset + 4])
+        kind = data[offset + 4 : offset + 8]
+        body = data[offset + 8 : offset + 8 + length]
+        (crc,) = struct.unpack(">I", data[offset + 8 + length : offset + 12 + length])
+        assert crc == zlib.crc32(kind + body)
+        chunks[kind] = body
+        offset += 12 + length
+
+    # THEN the header describes a 4x3 RGB image and the data decodes to its bytes
+    assert list(chunks) == [b"IHDR", b"IDAT", b"IEND"]
+    assert struct.unpack(">IIBBBBB", chunks[b"IHDR"]) == (4, 3, 8, 2, 0, 0, 0)
+    scanlines = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8)
+    scanlines = scanlines.reshape(3, 1 + 4 * 3)
+    assert (scanlines[:, 0] == 0).all()
+    np.testing.assert_equal(scanlines[:, 1:].reshape(3, 4, 3), to_bytes(framebuffer))
+
+
+def test_pfm_keeps_unclamped_floats():
+    framebuffer = np.array([[[0.0, 2.5, -1.0]], [[0.25, 0.5, 0.75]]])
+    out = io.BytesIO()
+    write_pfm(out, framebuffer)
+
+    header, data = out.getvalue().split(b"\n-1.0\n")
+    assert header == b"PF\n1 2"
+    pixels = np.frombuffer(data, dtype="<f4").reshape(2, 1, 3)
+    np.testing.assert_equal(pixels[::-1], framebuffer)
+
+
+def test_write_image_dispatches_on_format(framebuffer):
+    out = io.BytesIO()
+    write_image(out, framebuffer, ImageFormat("p6"))
+
+    assert out.getvalue().startswith(b"P6\n")
+
+
+def test_save_image_by_suffix(framebuffer, tmp_path):
+    """Test that save_image picks the format from the suffix and leaves no temp file."""
+    # GIVEN
+    path = tmp_path / "image.ppm"
+
+    # WHEN
+    save_image(path, framebuffer)
+
+    # THEN
+    out = io.BytesIO()
+    write_ppm_p6(out, framebuffer)
+    assert path.read_bytes() == out.getvalue()
+    assert [p.name for p in tmp_path.iterdir()] == ["image.ppm"]
+    with pytest.raises(ValueError):
+        ImageFormat.from_path(tmp_path / "image.jpg")
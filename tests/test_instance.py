@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+import pytest
+
+from raytracer.bvh import BVH
+from raytracer.definitions.material import Lambertian
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.definitions.world import World
+from raytracer.hitable import Sphere
+from raytracer.instance import Instance, rotation, scaling, translation
+from raytracer.mesh import TriangleMesh
+
+
+@pytest.fixture
+def tetrahedron() -> TriangleMesh:
+    return TriangleMesh(
+        [[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]],
+        [[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]],
+    )
+
+
+def test_transforms():
+    point = np.array([1.0, 0.0, 0.0, 1.0])
+
+    assert translation([1, 2, 3]) @ point == pytest.approx([2, 2, 3, 1])
+    assert scaling(2) @ point == pytest.approx([2, 0, 0, 1])
+    assert scaling([3, 1, 1]) @ point == pytest.approx([3, 0, 0, 1])
+    assert rotation([0, 0, 1], 90) @ point == pytest.approx([0, 1, 0, 1])
+
+
+def test_hit_matches_transformed_mesh(tetrahedron, random_rays):
+    # GIVEN an instance of a mesh and a copy of the mesh with transformed vertices
+    transform = (
+        translation([0.5, -0.2, 0]) @ rotation([1, 1, 0], 30) @ scaling([2, 1, 1.5])
+    )
+    instance = Instance(tetrahedron, transform)
+    vertices = np.c_[tetrahedron.vertices, np.ones(4)] @ transform.T
+    copy = TriangleMesh(vertices[:, :3], tetrahedron.indices)
+    rng = np.random.default_rng(0)
+
+    for ray in random_rays(rng, 300):
+        # WHEN a ray hits both
+        record = instance.hit(ray, 0.001, math.inf)
+        expected = copy.hit(ray, 0.001, math.inf)
+
+        # THEN their records agree
+        assert (record is None) == (expected is None)
+        if record is not None:
+            assert record.distance == pytest.approx(expected.distance)
+            assert list(record.point) == pytest.approx(list(expected.point))
+            assert list(record.normal) == pytest.approx(list(expected.normal))
+            assert record.front_facing == expected.front_facing
+        assert instance.occluded(ray, 0.001, 4.0) == (
+            copy.hit(ray, 0.001, 4.0) is not None
+        )
+
+
+def test_instance_of_sphere():
+    # GIVEN a unit sphere moved and scaled uniformly
+    instance = Instance(
+        Sphere(Point(Vector([0, 0, 0])), 1.0), translation([0, 0, -3]) @ scaling(0.5)
+    )
+    sphere = Sphere(Point(Vector([0, 0, -3])), 0.5)
+    ray = Ray(Point(Vector([0.1, 0.2, 0])), Vector([0, 0, -1]))
+
+    # WHEN the ray hits it
+    record = instance.hit(ray, 0.001, math.inf)
+
+    # THEN the hit is the one of the sphere it became
+    expected = sphere.hit(ray, 0.001, math.inf)
+    assert record.distance == pytest.approx(expected.distance)
+    assert list(record.normal) == pytest.approx(list(expected.normal))
+    box = instance.bounding_box()
+    assert box.minimum == pytest.approx([-0.5, -0.5, -3.5])
+    assert box.maximum == pytest.approx([0.5, 0.5, -2.5])
+
+
+def test_material_override(tetrahedron):
+    material = Lambertian(Color(Vector([0.2, 0.4, 0.6])))
+    ray = Ray(Point(Vector([0.2, 0.2, 5])), Vector([0, 0, -1]))
+
+    assert Instance(tetrahedron, np.eye(4)).hit(ray, 0.001, math.inf).material is (
+        tetrahedron.material
+    )
+    assert (
+        Instance(tetrahedron, np.eye(4), material).hit(ray, 0.001, math.inf).material
+        is material
+    )
+
+
+@pytest.mark.parametrize("transform", [scaling([1, 0, 1]), np.ones((4, 4))])
+def test_invalid_transform(tetrahedron, transform):
+    with pytest.raises(ValueError):
+        Instance(tetrahedron, transform)
+
+
+def test_many_instances_share_one_mesh(tetrahedron, random_rays):
+    # GIVEN a grid of 400 instances of the same mesh
+    world = World()
+    for x in range(20):
+        for y in range(20):
+            world.add(
+                Instance(
+                    tetrahedron,
+                    translation([x - 10, y - 10, -5]) @ rotation([0, 1, 0], 9 * x),
+                )
+            )
+    bvh = BVH.from_world(world)
+    rng = np.random.default_rng(1)
+
+    # THEN they keep a single copy of the triangles and the tree finds their hits
+    assert all(h.child is tetrahedron for h in world.hittables)
+    for ray in random_rays(rng, 100):
+        expected = world.hit(ray, 0.001, math.inf)
+        record = bvh.hit(ray, 0.001, math.inf)
+        assert (record is None) == (expected is None)
+        if record is not None:
+            assert record.distance == expected.distance
@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+import pytest
+
+from raytracer.definitions.material import DiffuseLight, Lambertian
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.definitions.world import World, is_light
+from raytracer.hitable import Sphere
+from raytracer.mesh import TriangleMesh, intersect_triangles
+from raytracer.raytracer import RayTracer
+
+
+@pytest.fixture
+def soup() -> TriangleMesh:
+    """Random small triangles in front of the camera."""
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(-2, 2, (300, 1, 3)) + rng.uniform(-0.3, 0.3, (300, 3, 3))
+    return TriangleMesh(corners.reshape(-1, 3), np.arange(900).reshape(-1, 3))
+
+
+def brute_force(mesh: TriangleMesh, ray: Ray, t_min: float, t_max: float) -> float:
+    corners = mesh.vertices[mesh.indices]
+    t = intersect_triangles(
+        corners[:, 0],
+        corners[:, 1] - corners[:, 0],
+        corners[:, 2] - corners[:, 0],
+        np.asarray(ray.orig, dtype=float),
+        np.asarray(ray.direction, dtype=float),
+        t_min,
+        t_max,
+    )
+    return float(t.min())
+
+
+def test_intersect_triangles():
+    # GIVEN a triangle in the plane z = -2
+    v0 = np.array([[-1.0, -1.0, -2.0]] * 3)
+    e1 = np.array([[2.0, 0.0, 0.0]] * 3)
+    e2 = np.array([[0.0, 2.0, 0.0]] * 3)
+
+    # WHEN rays hit its inside, miss it and run parallel to it
+    origins = [[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.0, 0.0, -2.0]]
+    directions = [[-0.25, -0.25, -1.0], [0.5, 0.5, -1.0], [1.0, 0.0, 0.0]]
+    t = [
+        intersect_triangles(v0[:1], e1[:1], e2[:1], np.array(o), np.array(d), 0, 10)
+        for o, d in zip(origins, directions)
+    ]
+
+    # THEN only the first ray hits it, at z = -2
+    assert t[0] == pytest.approx([2.0])
+    assert t[1] == [np.inf]
+    assert t[2] == [np.inf]
+
+
+def test_hit_matches_brute_force(soup, random_rays):
+    rng = np.random.default_rng(1)
+
+    for ray in random_rays(rng, 200):
+        expected = brute_force(soup, ray, 0.001, math.inf)
+        record = soup.hit(ray, 0.001, math.inf)
+
+        assert (record is None) == (expected == np.inf)
+        if record is not None:
+            assert record.distance == pytest.approx(expected)
+            assert record.normal.dot(ray.direction) < 0
+            assert record.material is soup.material
+
+
+def test_occluded_matches_hit(soup, random_rays):
+    rng = np.random.default_rng(2)
+
+    for ray in random_rays(rng, 200):
+        t_max = rng.uniform(0, 8)
+        assert soup.occluded(ray, 0.001, t_max) == (
+            soup.hit(ray, 0.001, t_max) is not None
+        )
+
+
+def test_record_of_back_face():
+    # GIVEN a triangle facing away from the camera
+    mesh = TriangleMesh([[0, 0, -1], [0, 1, -1], [1, 0, -1]], [[0, 1, 2]])
+    ray = Ray(Point(Vector([0.2, 0.2, 0])), Vector([0, 0, -1]))
+
+    # WHEN the camera ray hits it
+    record = mesh.hit(ray, 0.001, math.inf)
+
+    # THEN the record is of its back face with the normal flipped towards the ray
+    assert not record.front_facing
+    assert list(record.normal) == pytest.approx([0, 0, 1])
+    assert list(record.point) == pytest.approx([0.2, 0.2, -1])
+
+
+def test_bounding_box_and_memory(soup):
+    box = soup.bounding_box()
+
+    assert np.all(np.asarray(box.minimum) == soup.vertices.min(axis=0))
+    assert np.all(np.asarray(box.maximum) == soup.vertices.max(axis=0))
+    assert len(soup) == 300
+    assert soup.nbytes > soup.vertices.nbytes + soup.indices.nbytes
+
+
+def test_invalid_indices():
+    with pytest.raises(ValueError):
+        TriangleMesh([[0, 0, 0], [1, 0, 0], [0, 1, 0]], [[0, 1, 3]])
+
+
+def test_emissive_meshes_are_not_sampled():
+    mesh = TriangleMesh(
+        [[0, 0, 0], [1, 0, 0], [0, 1, 0]],
+        [[0, 1, 2]],
+        DiffuseLight(Color(Vector([1.0, 1.0, 1.0]))),
+    )
+
+    assert not is_light(mesh)
+
+
+def test_render_world_with_mesh():
+    # GIVEN a quad made of two triangles in front of the camera and a sphere
+    mesh = TriangleMesh(
+        [[-1, -1, -2], [1, -1, -2], [1, 1, -2], [-1, 1, -2]],
+        [[0, 1, 2], [0, 2, 3]],
+        Lambertian(Color(Vector([0.5, 0.5, 0.5]))),
+    )
+    world = World().add(mesh).add(Sphere(Point(Vector([2, 2, -3])), 0.2))
+
+    # WHEN rendering it with and without the bvh
+    images = [
+        RayTracer(1.0, 8, samples_per_pixel=2, seed=0, bvh=bvh).render_framebuffer(
+            world
+        )
+        for bvh in (False, True)
+    ]
+
+    # THEN the quad darkens the sky behind it
+    for image in images:
+        assert image.shape == (8, 8, 3)
+        assert image[4, 4].mean() < 0.7 * image[0, 4].mean()
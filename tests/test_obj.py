@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from raytracer.definitions.material import Lambertian
+from raytracer.definitions.vector import Color, Vector
+from raytracer.obj import load_obj, read_obj
+
+OBJ = b"""# a quad, a triangle with negative indices and a triangle with attributes
+o quad
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vn 0 0 1
+f 1/1/1 2/1/1 3/1/1 4/1/1
+v 0 0 1
+f -1 1 2
+f 1//1 2//1 5//1
+"""
+
+
+@pytest.fixture
+def obj_file(tmp_path):
+    path = tmp_path / "mesh.obj"
+    path.write_bytes(OBJ)
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 1 << 20])
+def test_read_obj(obj_file, chunk_size):
+    # WHEN reading the file in chunks of any size
+    vertices, indices = read_obj(obj_file, chunk_size)
+
+    # THEN the quad is split into two triangles and all indices start at zero
+    assert vertices.tolist() == [
+        [0, 0, 0],
+        [1, 0, 0],
+        [1, 1, 0],
+        [0, 1, 0],
+        [0, 0, 1],
+    ]
+    assert indices.tolist() == [[0, 1, 2], [0, 2, 3], [4, 0, 1], [0, 1, 4]]
+
+
+def test_read_large_polygons(tmp_path):
+    # GIVEN a hexagon and a pentagon
+    path = tmp_path / "polygons.obj"
+    path.write_bytes(b"v 0 0 0\n" * 6 + b"f 1 2 3 4 5 6\nf 6 5 4 3 2\n")
+
+    # WHEN reading the file
+    _, indices = read_obj(path)
+
+    # THEN both are split into fans of triangles
+    assert indices.tolist() == [
+        [0, 1, 2],
+        [0, 2, 3],
+        [0, 3, 4],
+        [0, 4, 5],
+        [5, 4, 3],
+        [5, 3, 2],
+        [5, 2, 1],
+    ]
+
+
+@pytest.mark.parametrize("face", [b"f 1 2\n", b"f 1 2 4\n"])
+def test_malformed_faces(tmp_path, face):
+    path = tmp_path / "malformed.obj"
+    path.write_bytes(b"v 0 0 0\nv 1 0 0\nv 0 1 0\n" + face)
+
+    with pytest.raises(ValueError):
+        read_obj(path)
+
+
+def test_load_obj(obj_file):
+    material = Lambertian(Color(Vector([0.5, 0.5, 0.5])))
+
+    mesh = load_obj(obj_file, material)
+
+    assert len(mesh) == 4
+    assert mesh.material is material
+    assert np.all(mesh.vertices == read_obj(obj_file)[0])
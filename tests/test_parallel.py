@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+
+from raytracer.parallel import split_tiles
+from raytracer.raytracer import RayTracer
+
+
+def test_split_tiles_covers_image():
+    tiles = split_tiles(height=5, width=7, tile_size=3)
+
+    covered = np.zeros((5, 7), dtype=int)
+    for tile in tiles:
+        covered[tile.slices] += 1
+
+    assert (covered == 1).all()
+    assert [tile.index for tile in tiles] == list(range(6))
+    assert tiles[-1].shape == (2, 1)
+
+
+@pytest.mark.parametrize("backend", ["process", "thread"])
+@pytest.mark.parametrize("wavefront", [False, True])
+def test_fixed_seed_is_independent_of_workers(world, wavefront, backend):
+    """Workers render identical images to a single process for the same seed."""
+
+    def render(workers: int) -> str:
+        out = io.StringIO()
+        RayTracer(
+            2.0,
+            8,
+            samples_per_pixel=4,
+            max_recursion_depth=5,
+            wavefront=wavefront,
+            seed=42,
+            workers=workers,
+            backend=backend,
+            tile_size=3,
+        ).render(world, out)
+        return out.getvalue()
+
+    serial = render(workers=1)
+
+    assert render(workers=2) == serial
+    assert render(workers=1) == serial
+
+
+def test_threads_share_the_scene(world, mocker):
+    # GIVEN a tracer rendering on threads
+    tracer = RayTracer(2.0, 8, samples_per_pixel=1, workers=2, backend="thread")
+    render_tile = mocker.spy(tracer, "render_tile")
+
+    # WHEN rendering
+    tracer.render_framebuffer(world)
+
+    # THEN every tile is rendered against the same scene object
+    scenes = {id(call.args[0]) for call in render_tile.call_args_list}
+    assert len(scenes) == 1
+    assert render_tile.call_count == len(split_tiles(4, 8))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        RayTracer(2.0, 8, backend="fiber")
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from raytracer.progressive import Accumulator
+from raytracer.raytracer import RayTracer
+from raytracer.sinks import BufferSink
+
+
+def tracer(directory, samples_per_pixel=4, **kwargs) -> RayTracer:
+    directory.mkdir(exist_ok=True)
+    return RayTracer(
+        2.0,
+        8,
+        samples_per_pixel=samples_per_pixel,
+        max_recursion_depth=5,
+        seed=3,
+        tile_size=3,
+        checkpoint=directory / "render.npy",
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("wavefront", [False, True])
+def test_single_pass_matches_render(world, tmp_path, wavefront):
+    """Test that a single pass renders the same image as a plain render."""
+    # GIVEN
+    plain = tracer(tmp_path, wavefront=wavefront)
+    plain.checkpoint = None
+
+    # WHEN
+    image = tracer(tmp_path, wavefront=wavefront).render_framebuffer(world)
+
+    # THEN
+    np.testing.assert_allclose(image, plain.render_framebuffer(world))
+
+
+def test_raising_samples_resumes(world, tmp_path):
+    """Test that adding passes to a checkpoint equals rendering them at once."""
+    # GIVEN
+    tracer(tmp_path, samples_per_pixel=2, samples_per_pass=2).render_framebuffer(world)
+
+    # WHEN
+    resumed = tracer(tmp_path, samples_per_pass=2).render_framebuffer(world)
+
+    # THEN
+    np.testing.assert_allclose(
+        resumed,
+        tracer(tmp_path / "uninterrupted", samples_per_pass=2).render_framebuffer(
+            world
+        ),
+    )
+    counts = Accumulator.open(tmp_path / "render.npy", 4, 8).counts
+    assert (counts == 4).all()
+
+
+def test_image_is_written_a_band_at_a_time(world, tmp_path, mocker):
+    """Test that the image of the checkpoint is never built as a whole."""
+    # GIVEN a sink recording the blocks written into it
+    sink = BufferSink(4, 8)
+    write = mocker.spy(sink, "write")
+
+    # WHEN rendering progressively
+    rendered = tracer(tmp_path, samples_per_pass=2, record_spp_map=True)
+    rendered.render_into(world, sink)
+
+    # THEN the image arrives in bands of tile rows
+    assert [call.args[2].shape for call in write.call_args_list] == [
+        (3, 8, 3),
+        (1, 8, 3),
+    ]
+    np.testing.assert_allclose(
+        sink.framebuffer, Accumulator.open(tmp_path / "render.npy", 4, 8).image()
+    )
+    assert (rendered.spp_map == 4).all()
+    assert rendered.samples == 4 * 8 * 4
+
+
+def test_interrupted_pass_resumes(world, tmp_path, mocker):
+    """Test that only tiles missing from a killed pass are rendered again."""
+    # GIVEN
+    expected = tracer(
+        tmp_path / "uninterrupted", samples_per_pass=2
+    ).render_framebuffer(world)
+    tracer(tmp_path, samples_per_pixel=2).render_framebuffer(world)
+    first_pass = Accumulator.open(tmp_path / "render.npy", 4, 8).buffer[:3, :3].copy()
+    tracer(tmp_path, samples_per_pass=2).render_framebuffer(world)
+    # drop the second pass of the first tile, as if the render was killed
+    Accumulator.open(tmp_path / "render.npy", 4, 8).buffer[:3, :3] = first_pass
+    render_tile = mocker.spy(RayTracer, "render_tile")
+
+    # WHEN
+    resumed = tracer(tmp_path, samples_per_pass=2).render_framebuffer(world)
+
+    # THEN
+    assert render_tile.call_count == 1
+    np.testing.assert_allclose(resumed, expected)
+
+
+def test_checkpoint_must_match(world, tmp_path):
+    """Test that a checkpoint is not resumed with another image size or seed."""
+    # GIVEN
+    tracer(tmp_path, samples_per_pixel=1).render_framebuffer(world)
+
+    # WHEN / THEN
+    with pytest.raises(ValueError, match="shape"):
+        Accumulator.open(tmp_path / "render.npy", 5, 8)
+    with pytest.raises(ValueError, match="seed"):
+        Accumulator.open(tmp_path / "render.npy", 4, 8, entropy=4)
+    assert Accumulator.open(tmp_path / "render.npy", 4, 8).entropy == 3
+
+
+def test_preview_after_every_pass(world, tmp_path, mocker):
+    """Test that the preview is updated after every pass."""
+    # GIVEN
+    save_image = mocker.spy(
+        __import__("raytracer.progressive").progressive, "save_image"
+    )
+    preview = tmp_path / "preview.png"
+
+    # WHEN
+    tracer(tmp_path, samples_per_pass=1, preview=preview).render_framebuffer(world)
+
+    # THEN
+    assert save_image.call_count == 4
+    assert preview.read_bytes().startswith(b"\x89PNG")
@@ -0,0 +1,181 @@
+import io
+import random
+
+import numpy as np
+import pytest
+
+from raytracer import scenes, wavefront
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Point, Vector
+from raytracer.definitions.world import World
+from raytracer.raytracer import RayTracer, ray_color
+
+
+def test_ray_color_sky():
+    # GIVEN an empty world
+    path_lengths = np.zeros(6, dtype=np.int64)
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, 1, 0]))
+
+    # WHEN a ray is traced upwards
+    color = ray_color(ray, World(), depth=5, path_lengths=path_lengths)
+
+    # THEN it gets the top sky color without bouncing
+    np.testing.assert_allclose(color, [0.5, 0.7, 1.0])
+    np.testing.assert_equal(path_lengths, [1, 0, 0, 0, 0, 0])
+
+
+def test_ray_color_depth_zero(world):
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, 0, -1]))
+
+    np.testing.assert_equal(ray_color(ray, world, depth=0), [0, 0, 0])
+
+
+@pytest.mark.parametrize("wavefront_mode", [False, True])
+def test_render_records_path_lengths(world, wavefront_mode):
+    tracer = RayTracer(
+        2.0,
+        4,
+        samples_per_pixel=3,
+        max_recursion_depth=6,
+        wavefront=wavefront_mode,
+        seed=0,
+        russian_roulette_depth=2,
+    )
+    tracer.render(world, io.StringIO())
+
+    assert tracer.path_lengths.shape == (7,)
+    assert tracer.path_lengths.sum() == 4 * 2 * 3
+    assert tracer.path_lengths[1:].sum() > 0
+
+
+@pytest.mark.parametrize("record_spp_map", [False, True])
+def test_spp_map_is_only_kept_when_recorded(world, record_spp_map):
+    tracer = RayTracer(
+        2.0, 4, samples_per_pixel=3, seed=0, record_spp_map=record_spp_map
+    )
+    tracer.render(world, io.StringIO())
+
+    assert tracer.samples == 4 * 2 * 3
+    if record_spp_map:
+        assert (tracer.spp_map == 3).all()
+    else:
+        assert tracer.spp_map is None
+
+
+def test_russian_roulette_is_unbiased(world):
+    """Terminating paths early shortens them without changing the expected color."""
+    tracer = RayTracer(2.0, 8, samples_per_pixel=512, max_recursion_depth=10)
+    tracer.initialize()
+    scene = world.freeze()
+
+    def render(russian_roulette_depth):
+        tracer.russian_roulette_depth = russian_roulette_depth
+        path_lengths = np.zeros(11, dtype=np.int64)
+        image = wavefront.render_tile(
+            tracer,
+            scene,
+            range(4),
+            range(8),
+            np.random.default_rng(0),
+            path_lengths,
+        )
+        return image, (path_lengths * np.arange(11)).sum() / path_lengths.sum()
+
+    image, mean_length = render(None)
+    roulette_image, roulette_mean_length = render(1)
+
+    assert roulette_mean_length < mean_length
+    np.testing.assert_allclose(roulette_image.mean(), image.mean(), atol=0.01)
+
+
+def test_scalar_russian_roulette_terminates_paths(world):
+    random.seed(0)
+    ray = Ray(Point(Vector([0, 0, 0])), Vector([0, -1, -1]))
+    path_lengths = np.zeros(21, dtype=np.int64)
+
+    for _ in range(50):
+        ray_color(
+            ray, world, depth=20, russian_roulette_depth=1, path_lengths=path_lengths
+        )
+
+    assert path_lengths.sum() == 50
+    assert path_lengths[20] == 0
+
+
+def test_light_sampling_is_unbiased():
+    """Sampling the small light converges to the image of hitting it by chance."""
+    # GIVEN a scene lit by a small light only
+    world = scenes.small_light()
+
+    # WHEN rendering it with and without (wavefront) light sampling
+    with_lights = RayTracer(
+        2.0, 8, samples_per_pixel=128, max_recursion_depth=10, seed=0
+    ).render_framebuffer(world)
+    without = RayTracer(
+        2.0, 8, samples_per_pixel=16384, max_recursion_depth=10, wavefront=True, seed=0
+    ).render_framebuffer(world)
+
+    # THEN both images have the same mean color
+    np.testing.assert_allclose(
+        with_lights.mean(axis=(0, 1)), without.mean(axis=(0, 1)), rtol=0.1
+    )
+
+
+def test_light_sampling_reduces_noise():
+    """Two renders of the same scene differ less with light sampling."""
+    world = scenes.small_light()
+
+    def noise(light_sampling):
+        a, b = (
+            RayTracer(
+                16 / 9,
+                16,
+                samples_per_pixel=8,
+                seed=seed,
+                light_sampling=light_sampling,
+            ).render_framebuffer(world)
+            for seed in (1, 2)
+        )
+        return np.sqrt(((np.sqrt(a) - np.sqrt(b)) ** 2).mean())
+
+    assert noise(True) < 0.4 * noise(False)
+
+
+def test_fresnel_splitting_reduces_glass_noise(mocker):
+    """Splitting at glass is less noisy than choosing a ray, and as bright."""
+    world = scenes.glass_spheres()
+
+    def render(splits):
+        mocker.patch("raytracer.raytracer.FRESNEL_SPLITS", splits)
+        return np.stack(
+            [
+                RayTracer(
+                    16 / 9, 32, samples_per_pixel=8, seed=seed
+                ).render_framebuffer(world)
+                for seed in range(4)
+            ]
+        )
+
+    chosen, split = render(0), render(2)
+
+    assert split.var(axis=0).mean() < 0.85 * chosen.var(axis=0).mean()
+    np.testing.assert_allclose(split.mean(), chosen.mean(), rtol=0.01)
+
+
+@pytest.mark.parametrize("wavefront_mode", [False, True])
+def test_primary_fast_path_renders_the_same_image(wavefront_mode):
+    world = scenes.random_spheres(100)
+    images = [
+        RayTracer(
+            2.0,
+            16,
+            samples_per_pixel=2,
+            max_recursion_depth=3,
+            wavefront=wavefront_mode,
+            seed=0,
+            primary_fast_path=fast_path,
+        ).render_framebuffer(world)
+        for fast_path in (False, True)
+    ]
+
+    np.testing.assert_allclose(images[1], images[0], rtol=1e-9)
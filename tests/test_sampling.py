@@ -0,0 +1,218 @@
+import numpy as np
+import pytest
+
+from raytracer import sampling, scenes
+from raytracer.definitions.material import Lambertian
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.definitions.vector import Color, Vector
+from raytracer.raytracer import RayTracer
+from raytracer.sampling import RandomSampler
+
+
+def test_unit_vectors_are_uniform():
+    """Test that the mapped vectors have unit length and no preferred direction."""
+    # GIVEN
+    u = np.random.default_rng(0).random((100_000, 2))
+
+    # WHEN
+    v = sampling.unit_vectors(u)
+
+    # THEN
+    assert np.linalg.norm(v, axis=1) == pytest.approx(np.ones(len(v)))
+    assert np.abs(v.mean(axis=0)).max() < 0.01
+    # every coordinate of a uniform point on the sphere is uniform in [-1, 1]
+    assert (v**2).mean(axis=0) == pytest.approx([1 / 3] * 3, abs=0.01)
+
+
+def test_sampler_streams_blocks_in_order():
+    """Test that the sampler hands out the mapped blocks of its generator in order."""
+    # GIVEN
+    sampler = RandomSampler(np.random.default_rng(1), block_size=4)
+    expected = sampling.unit_vectors(np.random.default_rng(1).random((8, 2)))
+
+    # WHEN
+    drawn = [sampler.unit_vector() for _ in range(6)]
+
+    # THEN
+    assert np.array(drawn) == pytest.approx(expected[:6])
+
+
+def test_sampler_is_reproducible():
+    """Test that samplers on equally seeded generators draw the same numbers."""
+    # GIVEN
+    a, b = (
+        RandomSampler(np.random.default_rng(2)),
+        RandomSampler(np.random.default_rng(2)),
+    )
+
+    # WHEN / THEN
+    for _ in range(10):
+        assert a.square() == b.square()
+        assert a.uniform() == b.uniform()
+        offset = a.square()
+        assert -0.5 <= offset.x < 0.5 and -0.5 <= offset.y < 0.5 and offset.z == 0
+        b.square()
+
+
+def test_on_hemisphere():
+    """Test that vectors on the hemisphere point along the normal."""
+    # GIVEN
+    sampler = RandomSampler(np.random.default_rng(3))
+    normal = Vec3(0.0, 0.0, -1.0)
+
+    # WHEN / THEN
+    assert all(sampler.on_hemisphere(normal).dot(normal) >= 0 for _ in range(100))
+
+
+def test_material_scatters_with_sampler():
+    """Test that materials draw from the given sampler."""
+    # GIVEN
+    material = Lambertian(Color(Vector([0.5, 0.5, 0.5])))
+    ray = Ray(Vec3(0.0, 0.0, 0.0), Vec3(0.0, 0.0, -1.0))
+    normal, point = Vec3(0.0, 0.0, 1.0), Vec3(0.0, 0.0, -1.0)
+
+    # WHEN
+    scattered = [
+        material.scatter(
+            ray, normal, point, True, RandomSampler(np.random.default_rng(4))
+        )
+        for _ in range(2)
+    ]
+
+    # THEN
+    assert scattered[0].ray.direction == scattered[1].ray.direction
+
+
+def test_radical_inverse():
+    """Test that the digits of the index are mirrored at the radix point."""
+    # GIVEN
+    index = np.arange(5)
+
+    # WHEN / THEN
+    assert sampling.radical_inverse(2, index) == pytest.approx(
+        [0, 1 / 2, 1 / 4, 3 / 4, 1 / 8]
+    )
+    assert sampling.radical_inverse(3, index) == pytest.approx(
+        [0, 1 / 3, 2 / 3, 1 / 9, 4 / 9]
+    )
+
+
+def test_sobol_2d():
+    """Test the first points of the first two Sobol dimensions."""
+    # GIVEN
+    index = np.arange(4, dtype=np.uint32)
+
+    # WHEN
+    u, v = sampling.sobol_2d(index)
+
+    # THEN
+    assert u / 2**32 == pytest.approx([0, 1 / 2, 1 / 4, 3 / 4])
+    assert v / 2**32 == pytest.approx([0, 1 / 2, 3 / 4, 1 / 4])
+
+
+def test_owen_scramble_permutes_strata():
+    """Test that scrambling maps the 2^k strata of [0, 1) onto each other."""
+    # GIVEN
+    x = sampling.reverse_bits(np.arange(16, dtype=np.uint32))
+
+    # WHEN
+    scrambled = sampling.owen_scramble(x, np.uint32(12345))
+
+    # THEN
+    assert sorted((scrambled >> np.uint32(28)).tolist()) == list(range(16))
+
+
+def draw(sampler: sampling.Sampler, count: int, dimensions: int) -> np.ndarray:
+    """The (count, dimensions, 2) 2D dimensions of the samples of a pixel."""
+    sampler.start_pixel(0, 0, count)
+    samples = []
+    for s in range(count):
+        sampler.start_sample(s)
+        samples.append([sampler.uniform_2d() for _ in range(dimensions)])
+    return np.array(samples)
+
+
+@pytest.mark.parametrize("name", ["stratified", "sobol"])
+def test_samplers_stratify_every_dimension(name):
+    """Test that every 2D dimension has one sample per cell of a 4 x 4 grid."""
+    # GIVEN
+    sampler = sampling.SAMPLERS[name](np.random.default_rng(5))
+
+    # WHEN
+    samples = draw(sampler, 16, 20)
+
+    # THEN
+    assert ((0 <= samples) & (samples < 1)).all()
+    for d in range(20):
+        u, v = samples[:, d].T
+        cells = (u * 4).astype(int) * 4 + (v * 4).astype(int)
+        assert sorted(cells.tolist()) == list(range(16))
+        if name == "sobol":
+            # and (0, 2)-sequences also one sample per stratum along an axis
+            assert sorted((u * 16).astype(int).tolist()) == list(range(16))
+
+
+def test_halton_sampler_shifts_halton_points():
+    """Test that the k-th number of the samples is the shifted base p_k sequence."""
+    # GIVEN
+    sampler = sampling.SAMPLERS["halton"](np.random.default_rng(5))
+
+    # WHEN
+    samples = draw(sampler, 16, 3).reshape(16, 6)
+
+    # THEN
+    for k, base in enumerate([2, 3, 5, 7, 11, 13]):
+        shift = (samples[:, k] - sampling.radical_inverse(base, np.arange(16))) % 1
+        assert shift == pytest.approx(np.full(16, shift[0]))
+
+
+@pytest.mark.parametrize("name", ["stratified", "sobol"])
+def test_samplers_decorrelate_dimensions(name):
+    """Test that the samples of a pixel are ordered differently per dimension."""
+    # GIVEN
+    sampler = sampling.SAMPLERS[name](np.random.default_rng(6))
+
+    # WHEN
+    samples = draw(sampler, 64, 2)
+
+    # THEN
+    assert abs(np.corrcoef(samples[:, 0, 0], samples[:, 1, 0])[0, 1]) < 0.5
+
+
+def test_samplers_randomize_pixels():
+    """Test that every pixel gets other samples."""
+    # GIVEN
+    sampler = sampling.SAMPLERS["sobol"](np.random.default_rng(7))
+
+    # WHEN / THEN
+    assert not np.array_equal(draw(sampler, 4, 2), draw(sampler, 4, 2))
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """Nearly converged image of the main scene."""
+    return RayTracer(
+        16 / 9, 24, samples_per_pixel=2048, wavefront=True, seed=0
+    ).render_framebuffer(scenes.four_spheres())
+
+
+@pytest.mark.parametrize("name", ["stratified", "halton", "sobol"])
+def test_low_discrepancy_converges_faster(world, reference, name):
+    """Test that the main scene has a lower error than with random samples."""
+
+    def rmse(sampler):
+        image = RayTracer(
+            16 / 9, 24, samples_per_pixel=16, seed=1, sampler=sampler
+        ).render_framebuffer(world)
+        return np.sqrt(((np.sqrt(image) - np.sqrt(reference)) ** 2).mean())
+
+    # WHEN / THEN
+    assert rmse(name) < 0.85 * rmse("random")
+
+
+def test_wavefront_only_samples_randomly():
+    with pytest.raises(ValueError):
+        RayTracer(2.0, 8, wavefront=True, sampler="sobol")
+    with pytest.raises(ValueError):
+        RayTracer(2.0, 8, sampler="unknown")
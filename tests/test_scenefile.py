@@ -0,0 +1,178 @@
+import math
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from raytracer import bvh, scenefile, scenes
+from raytracer.definitions.material import Lambertian
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Color, Point, Vector
+from raytracer.definitions.world import FrozenWorld, World
+from raytracer.hitable import Sphere
+from raytracer.instance import Instance
+from raytracer.main import app
+from raytracer.mesh import TriangleMesh
+from raytracer.raytracer import RayTracer
+
+
+def test_spheres_round_trip(tmp_path):
+    # GIVEN a scene with a material per sphere
+    world = scenes.random_spheres(50)
+    path = tmp_path / "scene.rts"
+
+    # WHEN saving and loading it
+    scenefile.save(path, world, {"aspect_ratio": 2.0, "image_width": 16})
+    loaded = scenefile.load(path)
+
+    # THEN the spheres are mapped read-only into a single FrozenWorld
+    (frozen,) = loaded.world.hittables
+    assert isinstance(frozen, FrozenWorld)
+    assert not frozen.centers.flags.writeable
+    expected = world.freeze()
+    assert np.array_equal(frozen.centers, expected.centers)
+    assert np.array_equal(frozen.radii, expected.radii)
+    assert np.array_equal(frozen.material_ids, expected.material_ids)
+    assert np.array_equal(frozen.materials.albedo, expected.materials.albedo)
+    assert loaded.camera == {"aspect_ratio": 2.0, "image_width": 16}
+    assert loaded.world.freeze() is frozen
+
+
+@pytest.mark.parametrize("wavefront_mode", [False, True])
+def test_render_matches_original(tmp_path, wavefront_mode):
+    world = scenes.four_spheres()
+    scenefile.save(tmp_path / "scene.rts", world)
+    loaded = scenefile.load(tmp_path / "scene.rts")
+
+    images = [
+        RayTracer(
+            2.0, 12, samples_per_pixel=2, seed=0, wavefront=wavefront_mode
+        ).render_framebuffer(w)
+        for w in (world, loaded.world)
+    ]
+
+    assert np.array_equal(images[0], images[1])
+
+
+def test_lights_are_loaded(tmp_path):
+    scenefile.save(tmp_path / "scene.rts", scenes.small_light())
+
+    loaded = scenefile.load(tmp_path / "scene.rts")
+
+    (light,) = loaded.world.lights
+    assert isinstance(light, Sphere)
+    assert light.radius == 0.2
+    assert list(light.material.emission) == [20.0, 20.0, 20.0]
+
+
+def test_loaded_lights_are_sampled_through_the_bvh(tmp_path):
+    # GIVEN a scene lit by a small light, loaded from a scene file
+    world = scenes.small_light()
+    scenefile.save(tmp_path / "scene.rts", world)
+    loaded = scenefile.load(tmp_path / "scene.rts")
+
+    # WHEN rendering it with and without a BVH
+    images = [
+        RayTracer(1.0, 8, samples_per_pixel=1, seed=0, bvh=use_bvh).render_framebuffer(
+            w
+        )
+        for w, use_bvh in [(world, True), (loaded.world, True), (loaded.world, False)]
+    ]
+
+    # THEN the light inside the FrozenWorld is sampled in all renders
+    assert images[0].mean() > 0.0
+    np.testing.assert_allclose(images[1], images[0])
+    np.testing.assert_allclose(images[1], images[2])
+
+
+def test_meshes_round_trip(tmp_path, mocker):
+    # GIVEN a world with a mesh and a sphere sharing a material
+    material = Lambertian(Color(Vector([0.5, 0.5, 0.5])))
+    mesh = TriangleMesh(
+        [[-1, -1, -2], [1, -1, -2], [1, 1, -2], [-1, 1, -2]],
+        [[0, 1, 2], [0, 2, 3]],
+        material,
+    )
+    world = World().add(mesh).add(Sphere(Point(Vector([0, 0, -1])), 0.2, material))
+
+    # WHEN saving and loading it
+    scenefile.save(tmp_path / "scene.rts", world)
+    build_linear = mocker.spy(bvh, "build_linear")
+    loaded = scenefile.load(tmp_path / "scene.rts").world
+
+    # THEN the mesh and its tree are mapped read-only instead of built again
+    assert [type(h) for h in loaded.hittables] == [FrozenWorld, TriangleMesh]
+    build_linear.assert_not_called()
+    loaded_mesh = loaded.hittables[1]
+    for name, array in loaded_mesh.arrays().items():
+        assert not array.flags.writeable, name
+        np.testing.assert_array_equal(array, mesh.arrays()[name])
+
+    # THEN rays hit the same surfaces
+    rng = np.random.default_rng(0)
+    for direction in rng.uniform(-1, 1, (50, 3)) + [0, 0, -1]:
+        ray = Ray(Point(Vector([0, 0, 0])), Vector(direction))
+        record, expected = (w.hit(ray, 0.001, math.inf) for w in (loaded, world))
+        assert (record is None) == (expected is None)
+        if record is not None:
+            assert record.distance == pytest.approx(expected.distance)
+            assert list(record.material.attentuition) == [0.5, 0.5, 0.5]
+
+
+def test_loaded_scene_can_be_saved_again(tmp_path):
+    # GIVEN a loaded scene with packed spheres, a mesh and a light
+    mesh = TriangleMesh(
+        [[-1, -1, -2], [1, -1, -2], [1, 1, -2]],
+        [[0, 1, 2]],
+        Lambertian(Color(Vector([0.2, 0.4, 0.6]))),
+    )
+    scenefile.save(tmp_path / "first.rts", scenes.small_light().add(mesh))
+    first = scenefile.load(tmp_path / "first.rts").world
+
+    # WHEN saving and loading it again
+    scenefile.save(tmp_path / "second.rts", first)
+    second = scenefile.load(tmp_path / "second.rts").world
+
+    # THEN it renders the same image
+    images = [
+        RayTracer(1.0, 8, samples_per_pixel=1, seed=0).render_framebuffer(w)
+        for w in (first, second)
+    ]
+    assert len(second.lights) == 1
+    np.testing.assert_array_equal(images[0], images[1])
+
+
+def test_unsupported_hittables(tmp_path):
+    sphere = Sphere(Point(Vector([0, 0, -1])), 0.5)
+    world = World().add(Instance(sphere, np.eye(4)))
+
+    with pytest.raises(TypeError):
+        scenefile.save(tmp_path / "scene.rts", world)
+
+
+def test_not_a_scene_file(tmp_path):
+    path = tmp_path / "scene.rts"
+    path.write_bytes(b"P3\n1 1\n255\n0 0 0\n")
+
+    with pytest.raises(ValueError):
+        scenefile.load(path)
+
+
+def test_export_and_render_command(tmp_path):
+    # GIVEN a built-in scene exported to a scene file
+    path, image = tmp_path / "scene.rts", tmp_path / "image.ppm"
+    runner = CliRunner()
+    result = runner.invoke(
+        app, ["export", "four_spheres", str(path), "--image-width", "8"]
+    )
+    assert result.exit_code == 0, result.output
+
+    # WHEN rendering the file
+    result = runner.invoke(
+        app,
+        ["render", str(path), "--samples-per-pixel", "1", "-o", str(image)],
+    )
+
+    # THEN the image has the size stored in the file
+    assert result.exit_code == 0, result.output
+    assert image.read_text().split("\n")[1] == "8 4"
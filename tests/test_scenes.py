@@ -0,0 +1,32 @@
+import pytest
+
+from raytracer import scenes
+
+
+@pytest.mark.parametrize("name", list(scenes.SCENES))
+def test_scenes_freeze(name):
+    """Test that every scene consists of spheres in front of the camera."""
+    # GIVEN
+    world = scenes.SCENES[name]()
+
+    # WHEN
+    frozen = world.freeze()
+
+    # THEN
+    assert len(frozen) == len(world.hittables)
+    assert (frozen.centers[:, 2] < 0).all()
+
+
+def test_random_spheres_is_deterministic():
+    """Test that the random scene only depends on its seed."""
+    # GIVEN / WHEN
+    a, b, c = (
+        scenes.random_spheres(50, seed=1).freeze(),
+        scenes.random_spheres(50, seed=1).freeze(),
+        scenes.random_spheres(50, seed=2).freeze(),
+    )
+
+    # THEN
+    assert len(a) == 50
+    assert (a.centers == b.centers).all()
+    assert (a.centers != c.centers).any()
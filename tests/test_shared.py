@@ -0,0 +1,91 @@
+import math
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from raytracer import scenes, shared
+from raytracer.bvh import BVH
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Point, Vector
+from raytracer.instance import Instance, translation
+from raytracer.mesh import TriangleMesh
+
+
+def test_attach_views_the_shared_scene():
+    # GIVEN a packed scene with a material per sphere and a light
+    frozen = scenes.random_spheres(50).freeze()
+
+    # WHEN sharing it and attaching to the block
+    with shared.share(frozen) as scene:
+        memory, attached = scene.attach()
+
+        # THEN the world views the same read-only arrays and finds the same hits
+        assert not attached.centers.flags.writeable
+        assert np.shares_memory(attached.centers, np.asarray(memory.buf))
+        assert np.array_equal(attached.centers, frozen.centers)
+        assert np.array_equal(attached.material_ids, frozen.material_ids)
+        assert np.array_equal(attached.materials.albedo, frozen.materials.albedo)
+        assert len(attached.lights) == len(frozen.lights)
+        rng = np.random.default_rng(0)
+        for direction in rng.normal(size=(50, 3)):
+            ray = Ray(Point(Vector([13, 2, 3])), Vector(direction))
+            record = attached.hit(ray, 0.001, math.inf)
+            expected = frozen.hit(ray, 0.001, math.inf)
+            assert (record is None) == (expected is None)
+            if record is not None:
+                assert record.distance == expected.distance
+                assert record.material.kind == expected.material.kind
+
+        del attached
+        memory.close()
+
+
+def test_block_is_unlinked_on_error():
+    # GIVEN a shared scene
+    with (
+        pytest.raises(RuntimeError),
+        shared.share(scenes.four_spheres().freeze()) as scene,
+    ):
+        # WHEN the render fails
+        raise RuntimeError("render failed")
+
+    # THEN the block is gone
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(scene.name)
+
+
+def test_meshes_and_trees_are_shared():
+    # GIVEN a BVH over spheres, a mesh and two instances of another mesh
+    rng = np.random.default_rng(0)
+    world = scenes.four_spheres()
+    world.add(
+        TriangleMesh(rng.uniform(-1, 1, (300, 3)), rng.integers(0, 300, (500, 3)))
+    )
+    teapot = TriangleMesh(rng.uniform(-1, 1, (300, 3)), rng.integers(0, 300, (500, 3)))
+    world.add(Instance(teapot, translation([2, 0, 0])))
+    world.add(Instance(teapot, translation([-2, 0, 0])))
+    bvh = BVH.from_world(world)
+
+    # WHEN sharing it and attaching to the block
+    with shared.share(bvh) as scene:
+        memory, attached = scene.attach()
+
+        # THEN the meshes view the block, the instances keep sharing theirs
+        mesh, first, second = attached.hittables[-3:]
+        buffer = np.asarray(memory.buf)
+        assert np.shares_memory(mesh.vertices, buffer)
+        assert np.shares_memory(mesh.nodes.lower, buffer)
+        assert first.child is second.child
+        assert len(scene.pickled) < mesh.nbytes
+        # and it finds the same hits
+        for direction in rng.normal(size=(50, 3)):
+            ray = Ray(Point(Vector([0, 1, 6])), Vector(direction))
+            record = attached.hit(ray, 0.001, math.inf)
+            expected = bvh.hit(ray, 0.001, math.inf)
+            assert (record is None) == (expected is None)
+            if record is not None:
+                assert record.distance == expected.distance
+
+        del attached, mesh, first, second, buffer
+        memory.close()
@@ -0,0 +1,183 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from raytracer import scenes
+from raytracer.color import to_bytes
+from raytracer.image import ImageFormat, png_scanlines, write_image
+from raytracer.main import app
+from raytracer.parallel import split_tiles
+from raytracer.raytracer import RayTracer
+from raytracer.sinks import BufferSink, MemmapSink, StreamSink
+
+
+@pytest.fixture
+def framebuffer() -> np.ndarray:
+    return np.random.default_rng(0).uniform(0.0, 1.2, (7, 5, 3))
+
+
+def write_shuffled(sink, framebuffer: np.ndarray) -> None:
+    """Write the tiles of framebuffer in random order."""
+    tiles = split_tiles(*framebuffer.shape[:2], tile_size=2)
+    for k in np.random.default_rng(1).permutation(len(tiles)):
+        tile = tiles[k]
+        sink.write(tile.rows.start, tile.cols.start, framebuffer[tile.slices])
+
+
+def png_data(png: bytes) -> bytes:
+    """The concatenated IDAT chunks of a png."""
+    data, offset = b"", 8
+    while offset < len(png):
+        (length,) = struct.unpack(">I", png[offset : offset + 4])
+        if png[offset + 4 : offset + 8] == b"IDAT":
+            data += png[offset + 8 : offset + 8 + length]
+        offset += 12 + length
+    return data
+
+
+def test_buffer_sink(framebuffer):
+    with BufferSink(7, 5) as sink:
+        write_shuffled(sink, framebuffer)
+
+    np.testing.assert_array_equal(sink.framebuffer, framebuffer)
+
+
+def test_block_outside_of_image_raises(framebuffer):
+    with pytest.raises(ValueError, match="outside"):
+        BufferSink(7, 5).write(6, 0, framebuffer[:2])
+
+
+@pytest.mark.parametrize("image_format", [ImageFormat.P3, ImageFormat.P6])
+def test_stream_sink_matches_write_image(framebuffer, image_format):
+    stream = io.BytesIO if image_format.binary else io.StringIO
+    expected = stream()
+    write_image(expected, framebuffer, image_format)
+
+    out = stream()
+    with StreamSink(out, 7, 5, image_format) as sink:
+        write_shuffled(sink, framebuffer)
+
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_stream_sink_png_decodes_to_scanlines(framebuffer):
+    out = io.BytesIO()
+    with StreamSink(out, 7, 5, ImageFormat.PNG) as sink:
+        write_shuffled(sink, framebuffer)
+
+    expected = io.BytesIO()
+    write_image(expected, framebuffer, ImageFormat.PNG)
+    # THEN header and image data match the png written at once
+    assert out.getvalue()[:33] == expected.getvalue()[:33]
+    assert out.getvalue().endswith(b"IEND\xae\x42\x60\x82")
+    assert zlib.decompress(png_data(out.getvalue())) == png_scanlines(
+        to_bytes(framebuffer)
+    )
+
+
+def test_stream_sink_writes_rows_once_the_rows_above_are_complete(framebuffer):
+    out = io.BytesIO()
+    sink = StreamSink(out, 7, 5, ImageFormat.P6)
+    header = len(out.getvalue())
+
+    # GIVEN the lower rows complete before the upper ones
+    sink.write(2, 0, framebuffer[2:])
+    assert len(out.getvalue()) == header
+    assert sink.pending_rows == 5
+
+    # WHEN the left half of the upper rows completes
+    sink.write(0, 0, framebuffer[:2, :3])
+    assert len(out.getvalue()) == header
+
+    # THEN all rows are written with the right half
+    sink.write(0, 3, framebuffer[:2, 3:])
+    assert out.getvalue()[header:] == to_bytes(framebuffer).tobytes()
+    assert sink.pending_rows == 0
+    sink.close()
+
+
+def test_stream_sink_raises_on_missing_rows(framebuffer):
+    sink = StreamSink(io.StringIO(), 7, 5)
+    sink.write(0, 0, framebuffer[:6])
+
+    with pytest.raises(ValueError, match="Only 6 of 7 rows"):
+        sink.close()
+    with pytest.raises(ValueError, match="already written"):
+        sink.write(0, 0, framebuffer[:1])
+
+
+def test_stream_sink_rejects_pfm():
+    with pytest.raises(ValueError, match="Can not stream"):
+        StreamSink(io.BytesIO(), 7, 5, ImageFormat.PFM)
+
+
+@pytest.mark.parametrize("suffix", ["ppm", "pfm"])
+def test_memmap_sink_matches_write_image(framebuffer, tmp_path, suffix):
+    path = tmp_path / f"image.{suffix}"
+    image_format = ImageFormat.from_path(path)
+    expected = io.BytesIO()
+    write_image(expected, framebuffer, image_format)
+
+    # GIVEN the file is created with its final size
+    sink = MemmapSink(path, 7, 5)
+    assert path.stat().st_size == len(expected.getvalue())
+
+    with sink:
+        write_shuffled(sink, framebuffer)
+
+    assert path.read_bytes() == expected.getvalue()
+
+
+def test_memmap_sink_rejects_png(tmp_path):
+    with pytest.raises(ValueError, match="in place"):
+        MemmapSink(tmp_path / "image.png", 7, 5)
+
+
+@pytest.mark.parametrize("image_format", [ImageFormat.P3, ImageFormat.PNG])
+def test_tracer_streams_the_rendered_image(world, image_format):
+    tracer = RayTracer(2.0, 8, samples_per_pixel=2, seed=0, tile_size=3)
+    stream = io.BytesIO if image_format.binary else io.StringIO
+    expected = stream()
+    write_image(expected, tracer.render_framebuffer(world), image_format)
+
+    out = stream()
+    tracer.render(world, out, image_format)
+
+    if image_format is ImageFormat.PNG:
+        assert zlib.decompress(png_data(out.getvalue())) == zlib.decompress(
+            png_data(expected.getvalue())
+        )
+    else:
+        assert out.getvalue() == expected.getvalue()
+
+
+def test_render_command_writes_pfm_in_place(tmp_path):
+    image = tmp_path / "image.pfm"
+    result = CliRunner().invoke(
+        app,
+        [
+            "render",
+            "--image-width",
+            "8",
+            "--samples-per-pixel",
+            "1",
+            "--seed",
+            "0",
+            "--format",
+            "pfm",
+            "-o",
+            str(image),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    expected = io.BytesIO()
+    framebuffer = RayTracer(16 / 9, 8, samples_per_pixel=1, seed=0).render_framebuffer(
+        scenes.four_spheres()
+    )
+    write_image(expected, framebuffer, ImageFormat.PFM)
+    assert image.read_bytes() == expected.getvalue()
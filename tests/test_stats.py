@@ -0,0 +1,133 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from raytracer import scenes, stats
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vec3 import Vec3
+from raytracer.raytracer import RayTracer
+from raytracer.stats import RenderStats
+
+
+def test_count_without_collector_is_noop():
+    """Test that nothing is collected unless a collector is active."""
+    # GIVEN
+    collected = RenderStats()
+
+    # WHEN
+    stats.count("rays.primary")
+    with stats.activate(collected):
+        stats.count("rays.primary", 2)
+        with stats.activate(None):
+            stats.count("rays.primary")
+    stats.count("rays.primary")
+
+    # THEN
+    assert collected.counters == {"rays.primary": 2}
+    assert stats.COLLECTOR.get() is None
+
+
+def test_merge_and_summary():
+    """Test that merged stats add up and the summary is JSON serializable."""
+    # GIVEN
+    a, b = RenderStats(), RenderStats()
+    a.count("intersection.tests", 4)
+    a.count("intersection.hits", 1)
+    b.count("intersection.tests", 4)
+    with b.timer("tiles"):
+        pass
+
+    # WHEN
+    a.merge(b)
+
+    # THEN
+    summary = json.loads(a.to_json())
+    assert summary["counters"] == {"intersection.hits": 1, "intersection.tests": 8}
+    assert summary["hit_rate"] == 0.125
+    assert summary["seconds"]["tiles"] >= 0
+
+
+@pytest.mark.parametrize("mode", [{}, {"bvh": True}, {"wavefront": True}])
+def test_render_stats(world, mode):
+    """Test that the counters of a render agree with its path lengths."""
+    # GIVEN
+    tracer = RayTracer(2.0, 8, samples_per_pixel=3, seed=0, collect_stats=True, **mode)
+
+    # WHEN
+    tracer.render_framebuffer(world)
+
+    # THEN
+    counters = tracer.stats.counters
+    bounces = int(tracer.path_lengths @ range(len(tracer.path_lengths)))
+    bounces += counters["split.bounces"]
+    events = sum(
+        n for name, n in counters.items() if name.startswith(("scatter.", "absorb."))
+    )
+    assert counters["rays.primary"] == 8 * 4 * 3
+    assert events == bounces
+    assert 0 < counters["intersection.hits"] <= counters["intersection.tests"]
+    assert {"scene", "render", "tiles"} <= set(tracer.stats.seconds)
+
+
+def test_render_stats_disabled(world):
+    """Test that no stats are kept by default."""
+    # GIVEN
+    tracer = RayTracer(2.0, 4, samples_per_pixel=1, seed=0)
+
+    # WHEN
+    tracer.render_framebuffer(world)
+
+    # THEN
+    assert tracer.stats is None
+
+
+def test_render_stats_are_independent_of_workers(world):
+    """Test that the counters of all worker processes are merged."""
+
+    # GIVEN
+    def counters(workers: int) -> dict:
+        tracer = RayTracer(
+            2.0, 8, samples_per_pixel=2, seed=1, workers=workers, collect_stats=True
+        )
+        # WHEN
+        tracer.render_framebuffer(world)
+        return tracer.stats.counters
+
+    # THEN
+    assert counters(2) == counters(1)
+
+
+def test_closer_hits():
+    inf = float("inf")
+
+    assert stats.closer_hits(np.array([])) == 0
+    assert stats.closer_hits(np.array([inf, 3.0, 4.0, 2.0, inf, 1.0])) == 3
+
+
+def test_hits_agree_on_all_paths():
+    """Test that scalar, batched and per-sphere tests count the same hits."""
+    # GIVEN rays through a random scene, as spheres and packed
+    world = scenes.random_spheres(40)
+    frozen = world.freeze()
+    rng = np.random.default_rng(0)
+    origins = np.zeros((100, 3))
+    directions = rng.uniform(-1, 1, (100, 3)) + [0, 0, -1]
+
+    # WHEN counting hits one ray at a time and as a batch
+    counted = []
+    for intersect in (world.intersect, frozen.intersect):
+        collected = RenderStats()
+        with stats.activate(collected):
+            for d in directions:
+                intersect(Ray(Vec3(0.0, 0.0, 0.0), Vec3(*d)), 0.001, math.inf)
+        counted.append(collected.counters)
+    collected = RenderStats()
+    with stats.activate(collected):
+        frozen.intersect_many(origins, directions, 0.001, math.inf)
+    counted.append(collected.counters)
+
+    # THEN all report the same hit rate
+    assert counted[0]["intersection.hits"] > 0
+    assert counted[0] == counted[1] == counted[2]
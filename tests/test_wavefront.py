@@ -0,0 +1,92 @@
+import io
+import math
+import random
+
+import numpy as np
+import pytest
+
+from raytracer import wavefront
+from raytracer.definitions.ray import Ray
+from raytracer.definitions.vector import Point, Vector
+from raytracer.definitions.world import World
+from raytracer.raytracer import RayTracer, ray_color
+
+
+def test_intersect_matches_world_hit(world):
+    # GIVEN rays from the camera and from inside the glass sphere
+    rng = np.random.default_rng(0)
+    origins = np.array([[0.0, 0.0, 0.0]] * 50 + [[-1.0, 0.0, -1.0]] * 50)
+    directions = rng.uniform(-1, 1, (100, 3))
+
+    # WHEN intersecting them all at once
+    t, index = world.freeze().intersect_many(origins, directions, 0.001, math.inf)
+
+    # THEN every ray agrees with the scalar World.hit
+    for o, d, t_i, index_i in zip(origins, directions, t, index):
+        record = world.hit(Ray(Point(Vector(o)), Vector(d)), 0.001, math.inf)
+        if record is None:
+            assert index_i == -1
+        else:
+            assert t_i == pytest.approx(record.distance)
+            assert world.hittables[index_i].material is record.material
+
+
+def test_trace_without_scene_returns_sky():
+    # GIVEN an empty scene
+    world = World()
+    directions = np.array([[0.0, 1.0, 0.0], [0.0, -1.0, 0.0], [1.0, 0.0, 0.0]])
+
+    # WHEN tracing rays through it
+    colors = wavefront.trace(
+        world.freeze(),
+        np.zeros((3, 3)),
+        directions,
+        np.random.default_rng(0),
+        depth=5,
+    )
+
+    # THEN every ray gets the sky color of ray_color
+    for direction, color in zip(directions, colors):
+        ray = Ray(Point(Vector([0, 0, 0])), Vector(direction))
+        np.testing.assert_allclose(color, ray_color(ray, world, depth=5))
+
+
+def test_render_matches_scalar_path(world):
+    """The wavefront image converges to the same image as ray_color."""
+    # GIVEN a small image rendered by both paths
+    random.seed(0)
+    scalar = RayTracer(2.0, 8, samples_per_pixel=32, max_recursion_depth=8)
+    scalar.initialize()
+    expected = np.array(
+        [
+            [
+                sum(
+                    ray_color(scalar.sample_ray(i, j), world, depth=8)
+                    for _ in range(32)
+                )
+                / 32
+                for i in range(8)
+            ]
+            for j in range(4)
+        ]
+    )
+
+    tracer = RayTracer(2.0, 8, samples_per_pixel=256, max_recursion_depth=8)
+    tracer.initialize()
+    image = wavefront.render(tracer, world.freeze(), np.random.default_rng(0))
+
+    # THEN both images agree up to the Monte Carlo noise
+    assert image.shape == expected.shape
+    np.testing.assert_allclose(
+        image.mean(axis=(0, 1)), expected.mean(axis=(0, 1)), atol=0.02
+    )
+    assert np.abs(image - expected).mean() < 0.05
+
+
+def test_render_writes_ppm(world):
+    out = io.StringIO()
+    RayTracer(2.0, 4, samples_per_pixel=2, wavefront=True, seed=1).render(world, out)
+
+    lines = out.getvalue().splitlines()
+    assert lines[:3] == ["P3", "4 2", "255"]
+    assert len(lines) == 3 + 8